@@ -3,13 +3,29 @@ from llm.gemini_llm import get_gemini_llm
 import json
 from prompts.prompts import CLASSIFIER_PROMPT
 from langchain_core.messages import HumanMessage
+from config.config import FASTPATH_ENABLED
+from utils.concurrency import DependencyBusy
+from utils.fast_classifier import FastPathClassifier
+from utils.local_embedder import get_embedding
 import re
 
 class ClassifierAgent(BaseAgent):
     def __init__(self):
-        self.llm = get_gemini_llm()
+        self.llm = get_gemini_llm("classifier")
+        self.fast_path = FastPathClassifier() if FASTPATH_ENABLED else None
 
     def run(self, input_text: str) -> dict:
+        if self.fast_path:
+            try:
+                fast = self.fast_path.classify(input_text, embed=get_embedding)
+            except DependencyBusy:
+                fast = self.fast_path.classify(input_text)
+            if fast.decision:
+                return {"decision": fast.decision, "questions": [], "source": "fast_path"}
+
+        return self.run_llm(input_text)
+
+    def run_llm(self, input_text: str) -> dict:
         prompt = CLASSIFIER_PROMPT.format(input_text=input_text)
 
         try:
@@ -19,7 +35,7 @@ class ClassifierAgent(BaseAgent):
 
             if not response or not response.content.strip():
                 print("Warning: Empty response from LLM.")
-                return {"decision": "Not Relevant", "questions": []}
+                return {"decision": "Not Relevant", "questions": [], "source": "fallback"}
             
             content = response.content.strip()
 
@@ -28,11 +44,13 @@ class ClassifierAgent(BaseAgent):
 
             return json.loads(content)
 
+        except DependencyBusy:
+            raise
         except json.JSONDecodeError:
             print(f"JSONDecodeError: Could not parse LLM response: {response.content}")
-            return {"decision": "Not Relevant", "questions": []}
+            return {"decision": "Not Relevant", "questions": [], "source": "fallback"}
         except Exception as e:
             print(f"An unexpected error occurred: {e}")
-            return {"decision": "Not Relevant", "questions": []}
+            return {"decision": "Not Relevant", "questions": [], "source": "fallback"}
 
 
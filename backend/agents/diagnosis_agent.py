@@ -1,33 +1,54 @@
 from llm.gemini_llm import get_gemini_llm
 from prompts.prompts import DIAGNOSIS_PROMPT
 from langchain_core.messages import HumanMessage
+from utils.concurrency import DependencyBusy
+from utils.context_builder import get_context_builder, report_prompt_size
+
+DIAGNOSIS_ERROR_MESSAGE = "There was an error generating the diagnosis."
+
+
+def format_chunk(chunk: dict) -> str:
+    """Render a ranked result (a knowledge base row or a parsed web result) as reference text"""
+    lines = [f"Name: {chunk.get('Name', 'Unknown')}"]
+    if chunk.get("Code"):
+        lines.append(f"Code: {chunk['Code']}")
+    lines.append(f"Symptoms: {chunk.get('Symptoms', 'Not available')}")
+    lines.append(f"Treatments: {chunk.get('Treatments', 'Not available')}")
+    return "\n".join(lines)
+
+
+def format_past_case(similar_case) -> str:
+    """Render a similar past case as lower-priority reference text"""
+    case = similar_case.case
+    return (
+        f"Similar past case (similarity {similar_case.similarity:.2f}):\n"
+        f"Patient said: {case.complaint}\n"
+        f"Outcome: {case.diagnosis}"
+    )
+
 
 class DiagnosisAgent:
     def __init__(self):
-        self.llm = get_gemini_llm()
-
-    def run(self, user_symptoms: str, chunks: list[dict]) -> str:
-        formatted_chunks = []
-        for chunk in chunks:
-            meta = chunk.get("metadata", {})
-            content = chunk.get("page_content", "")
-            entry = (
-                f"Name: {meta.get('name', 'Unknown')}\n"
-                f"Code: {meta.get('code', 'N/A')}\n"
-                f"Symptoms: {content}\n"
-                f"Treatments: {meta.get('treatment', 'Not available')}"
-            )
-            formatted_chunks.append(entry)
-
-        joined_chunks = "\n\n".join(formatted_chunks)
-
-        prompt = DIAGNOSIS_PROMPT.format(user_symptoms=user_symptoms, chunks=joined_chunks)
+        self.llm = get_gemini_llm("diagnosis")
+        self.context_builder = get_context_builder("diagnosis")
+
+    def run(self, user_symptoms: str, chunks: list[dict], past_cases: list = None) -> str:
+        # Chunks arrive in fused rank order, so the builder keeps the best matches when space runs out;
+        # past cases go last and are the first to be cut
+        formatted_chunks = [format_chunk(chunk) for chunk in chunks]
+        formatted_chunks += [format_past_case(case) for case in past_cases or []]
+        context = self.context_builder.build(formatted_chunks)
+
+        prompt = DIAGNOSIS_PROMPT.format(user_symptoms=user_symptoms, chunks=context.text)
+        report_prompt_size("diagnosis", prompt, context)
         messages = [HumanMessage(content=prompt)]
 
         try:
             response = self.llm.invoke(messages)
             return response.content
+        except DependencyBusy:
+            raise
         except Exception as e:
             print(f"Diagnosis Agent Error: {e}")
-            return "There was an error generating the diagnosis."
+            return DIAGNOSIS_ERROR_MESSAGE
 
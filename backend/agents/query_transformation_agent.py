@@ -1,14 +1,32 @@
 from llm.gemini_llm import get_gemini_llm
 from langchain_core.messages import HumanMessage
 from prompts.prompts import TRANSFORM_QUERY_PROMPT
+from config.config import LOCAL_EXTRACTION_ENABLED, LOCAL_EXTRACTION_MIN_COVERAGE, LOCAL_EXTRACTION_MIN_SYMPTOMS
+from utils.metrics import metrics
+from utils.symptom_extractor import extract_symptoms, build_search_query
 import re
 import json
 
 class QueryTransformationAgent:
     def __init__(self):
-        self.llm = get_gemini_llm()
+        self.llm = get_gemini_llm("query_transformation")
 
     def transform(self, user_input: str) -> dict:
+        if LOCAL_EXTRACTION_ENABLED:
+            extraction = extract_symptoms(user_input)
+            if (len(extraction.symptoms) >= LOCAL_EXTRACTION_MIN_SYMPTOMS
+                    and extraction.coverage >= LOCAL_EXTRACTION_MIN_COVERAGE):
+                metrics.counter("query_transformation_total", source="local").inc()
+                return {
+                    "symptoms": extraction.symptoms,
+                    "search_query": build_search_query(extraction.symptoms),
+                    "source": "local",
+                }
+
+        metrics.counter("query_transformation_total", source="llm").inc()
+        return self.transform_llm(user_input)
+
+    def transform_llm(self, user_input: str) -> dict:
         prompt = TRANSFORM_QUERY_PROMPT.format(user_input=user_input)
         response = self.llm.invoke([HumanMessage(content=prompt)])
         content = response.content.strip()
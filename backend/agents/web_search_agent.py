@@ -1,13 +1,27 @@
+import contextvars
 import os
+import re
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from langchain_tavily import TavilySearch
 import json
 from llm.gemini_llm import get_gemini_llm
 from prompts.prompts import WEB_SEARCH_PARSE_PROMPT
 from langchain_core.messages import HumanMessage
+from config.config import SEARCH_RECORD_PATH, WEB_PARSE_SHARD_SIZE, WEB_PARSE_MAX_PARALLEL
+from utils.concurrency import get_limiter
+from utils.context_builder import ContextBuilder, get_context_builder, report_prompt_size
+from utils.metrics import metrics
 
 load_dotenv()
 
+parse_executor = ThreadPoolExecutor(max_workers=WEB_PARSE_MAX_PARALLEL, thread_name_prefix="web-parse")
+
+
+class WebParseError(ValueError):
+    """The parse LLM answered, but not with a JSON list"""
+
+
 class WebSearchAgent:
     def __init__(self):
         api_key = os.getenv("TAVILY_API_KEY")
@@ -16,26 +30,122 @@ class WebSearchAgent:
         os.environ["TAVILY_API_KEY"] = api_key  
 
         self.search = TavilySearch(k=10)
+        self.limiter = get_limiter("tavily")
 
     def run(self, query: str) -> list[str]:
-        results = self.search.run(query)
+        with self.limiter.acquire():
+            results = self.search.run(query)
         contents = [r["content"] for r in results.get("results", []) if r.get("content")]
+        if SEARCH_RECORD_PATH:
+            record_search(query, contents)
         return contents
 
+
+def record_search(query: str, contents: list[str]):
+    """Append raw search results to SEARCH_RECORD_PATH so compression can be benchmarked offline"""
+    os.makedirs(os.path.dirname(SEARCH_RECORD_PATH) or ".", exist_ok=True)
+    with open(SEARCH_RECORD_PATH, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"query": query, "results": contents}) + "\n")
+
+
 class WebSearchParseAgent:
     def __init__(self):
-        self.llm = get_gemini_llm()
+        self.llm = get_gemini_llm("web_parser")
+        self.context_builder = get_context_builder("web_parser")
 
     def parse(self, search_results: list[str]) -> list[dict]:
-        joined_results = "\n".join(search_results)
-        prompt = WEB_SEARCH_PARSE_PROMPT + f"\nSearch Results:\n{joined_results}"
+        if WEB_PARSE_SHARD_SIZE <= 0 or len(search_results) <= WEB_PARSE_SHARD_SIZE:
+            try:
+                return self._parse_shard(search_results, self.context_builder)
+            except WebParseError:
+                return []
+
+        # Contiguous shards keep the best-ranked snippets together in the first shard
+        shards = [search_results[i:i + WEB_PARSE_SHARD_SIZE]
+                  for i in range(0, len(search_results), WEB_PARSE_SHARD_SIZE)]
+        # Together the shards get the single call's context budget, not one budget each
+        shard_budget = self.context_builder.budget // len(shards)
+        shard_builder = ContextBuilder(
+            self.context_builder.agent, shard_budget, min(self.context_builder.per_source, shard_budget)
+        )
+        futures = [
+            parse_executor.submit(contextvars.copy_context().run, self._parse_shard, shard, shard_builder)
+            for shard in shards
+        ]
+        parsed, errors = [], []
+        for future in futures:
+            try:
+                parsed.append(future.result())
+            except Exception as e:
+                errors.append(e)
+        metrics.counter("web_parse_shards_total").inc(len(shards))
+        if errors:
+            metrics.counter("web_parse_shard_failures_total").inc(len(errors))
+        if not parsed:
+            # Unparseable output everywhere reads as "nothing found", as in the single call
+            call_errors = [e for e in errors if not isinstance(e, WebParseError)]
+            if call_errors:
+                raise call_errors[0]
+            return []
+        return merge_parsed_results(parsed)
+
+    def _parse_shard(self, search_results: list[str], context_builder: ContextBuilder) -> list[dict]:
+        """Parse one batch of snippets; raises WebParseError when the model's output is not a JSON list"""
+        # Tavily returns results by relevance, so the builder keeps the top snippets when space runs out
+        context = context_builder.build(search_results)
+        prompt = WEB_SEARCH_PARSE_PROMPT + f"\nSearch Results:\n{context.text}"
+        report_prompt_size("web_parser", prompt, context)
         response = self.llm.invoke([HumanMessage(content=prompt)])
         content = response.content.strip()
         content = content.replace('```json', '').replace('```', '').strip()
         try:
-            return json.loads(content)
-        except Exception:
-            return []
+            parsed = json.loads(content)
+        except ValueError as e:
+            raise WebParseError(f"Web parse output is not JSON: {e}") from e
+        if not isinstance(parsed, list):
+            raise WebParseError("Web parse output is not a JSON list")
+        return parsed
+
+
+def _normalize_name(name: str) -> str:
+    name = re.sub(r"\(.*?\)", " ", name.lower())
+    name = re.sub(r"[^a-z0-9 ]+", " ", name)
+    return " ".join(w[:-1] if w.endswith("s") and len(w) > 3 else w for w in name.split())
+
+
+def _merge_terms(existing: str, extra: str) -> str:
+    terms = [t.strip() for t in existing.split(",") if t.strip()]
+    seen = {t.lower() for t in terms}
+    for term in (t.strip() for t in extra.split(",")):
+        if term and term.lower() not in seen:
+            seen.add(term.lower())
+            terms.append(term)
+    return ", ".join(terms)
+
 
+def merge_parsed_results(parsed_shards: list[list[dict]]) -> list[dict]:
+    """
+    Merge per-shard parse output into one list in the single-call shape
 
+    Conditions are matched by normalized name; their symptom and treatment lists are unioned.
+    Conditions named by more shards rank first, ties keep the order of first appearance.
+    """
+    merged: dict[str, dict] = {}
+    support: dict[str, int] = {}
+    for shard in parsed_shards:
+        for item in shard:
+            if not isinstance(item, dict) or not item.get("Name"):
+                continue
+            key = _normalize_name(str(item["Name"]))
+            if key not in merged:
+                merged[key] = dict(item)
+                support[key] = 1
+                continue
+            support[key] += 1
+            for field in ("Symptoms", "Treatments"):
+                if item.get(field):
+                    merged[key][field] = _merge_terms(str(merged[key].get(field, "")), str(item[field]))
 
+    order = {key: i for i, key in enumerate(merged)}
+    ranked = sorted(merged, key=lambda key: (-support[key], order[key]))
+    return [merged[key] for key in ranked]
@@ -0,0 +1,252 @@
+from fastapi import WebSocket, WebSocketDisconnect, HTTPException
+from collections import deque
+import asyncio
+import json
+import logging
+import uuid
+from typing import Any, Dict, Optional
+from config.config import (
+    PIPELINE_BUDGETS,
+    DIAGNOSIS_BUDGET_SHARE,
+    RETRIEVAL_BUDGET_SHARE,
+    STREAM_STABLE_PARTIALS,
+    STREAM_SPECULATE_MIN_WORDS,
+    STREAM_SPECULATE_MIN_NEW_WORDS,
+)
+from stt.streaming import StreamingSTTSession, open_streaming_stt
+from workflows.diagnosis_pipeline import (
+    classify_input,
+    run_diagnosis_pipeline,
+    run_followup_pipeline,
+    session_filter,
+    prefetch_retrieval,
+    classify_turn,
+    set_aside_turn,
+    fresh_diagnosis,
+    save_case,
+)
+from utils.chat_session import ChatSession
+from utils.concurrency import DependencyBusy
+from utils.deadline import Deadline, current_deadline, start_deadline
+from utils.metrics import metrics
+from utils.usage import set_usage_context
+
+logger = logging.getLogger(__name__)
+
+
+class StablePrefix:
+    """The words every one of the last few partial transcripts agrees on"""
+
+    def __init__(self, partials: int = STREAM_STABLE_PARTIALS):
+        self.history = deque(maxlen=partials)
+
+    def update(self, text: str) -> str:
+        self.history.append(text.split())
+        if len(self.history) < self.history.maxlen:
+            return ""
+        prefix = []
+        for words in zip(*self.history):
+            if any(word.lower() != words[0].lower() for word in words):
+                break
+            prefix.append(words[0])
+        return " ".join(prefix)
+
+
+class Utterance:
+    """
+    One recording streamed over the socket: forwards partial transcripts to the client and, once a
+    prefix of them is stable, classifies it and prefetches retrieval for its symptoms speculatively
+    """
+
+    def __init__(self, websocket: WebSocket, session: ChatSession):
+        self.websocket = websocket
+        self.session = session
+        self.stt: StreamingSTTSession = open_streaming_stt()
+        self.stable = StablePrefix()
+        self.speculated_words = 0
+        self.speculation: Optional[asyncio.Task] = None
+        self.speculative_classification: Optional[tuple] = None
+        self.consumer = asyncio.create_task(self._consume())
+
+    async def _consume(self) -> str:
+        async for event in self.stt.events():
+            if event.is_final:
+                return event.text
+            await self.websocket.send_json({"type": "partial", "text": event.text})
+            stable_text = self.stable.update(event.text)
+            n_words = len(stable_text.split())
+            idle = self.speculation is None or self.speculation.done()
+            if (idle and n_words >= STREAM_SPECULATE_MIN_WORDS
+                    and n_words - self.speculated_words >= STREAM_SPECULATE_MIN_NEW_WORDS):
+                self.speculated_words = n_words
+                self.speculation = asyncio.create_task(self._speculate(stable_text))
+        return ""
+
+    async def _speculate(self, text: str):
+        # A separate budget: speculative work must not eat into the answer's deadline
+        deadline = Deadline(PIPELINE_BUDGETS["voice"], "voice_speculative")
+        current_deadline.set(deadline)
+        try:
+            if not self.session.health_related:
+                classification = await classify_input(text, deadline)
+                self.speculative_classification = (text, classification)
+                if classification.get("status") != "completed":
+                    return
+            await prefetch_retrieval(self.session, text, deadline)
+        except (asyncio.TimeoutError, DependencyBusy) as e:
+            logger.info(f"Speculative work on partial transcript stopped: {e!r}")
+        except Exception as e:
+            # Nothing awaits this task, and the real turn redoes whatever speculation did not finish
+            logger.warning(f"Speculative work on partial transcript failed: {e!r}")
+
+    async def finish(self, deadline: Deadline) -> str:
+        try:
+            await self.stt.finish(deadline.stage_timeout(RETRIEVAL_BUDGET_SHARE + DIAGNOSIS_BUDGET_SHARE))
+        except asyncio.TimeoutError:
+            raise RuntimeError("Transcription timed out")
+        final_text = await self.consumer
+        # Speculative retrieval still running may finish while it leaves the diagnosis share intact;
+        # after that it is cancelled so it cannot change the session under the real turn
+        if self.speculation and not self.speculation.done():
+            await asyncio.wait({self.speculation}, timeout=deadline.stage_timeout(DIAGNOSIS_BUDGET_SHARE))
+            self.speculation.cancel()
+        return final_text
+
+    def reusable_classification(self, final_text: str) -> Optional[Dict[str, Any]]:
+        """The speculative classification, if it said health related and the final text extends its input"""
+        if self.speculative_classification is None:
+            return None
+        text, classification = self.speculative_classification
+        if classification.get("status") == "completed" and final_text.lower().startswith(text.lower()):
+            return classification
+        return None
+
+    async def close(self):
+        for task in (self.consumer, self.speculation):
+            if task is not None and not task.done():
+                task.cancel()
+        await self.stt.close()
+
+
+async def respond(
+    websocket: WebSocket, session: ChatSession, utterance: Utterance, final_text: str, deadline: Deadline
+):
+    await websocket.send_json({"type": "final", "text": final_text})
+    if not final_text.strip():
+        await websocket.send_json({"type": "error", "message": "No speech was recognised."})
+        return
+
+    session.add_turn(final_text)
+    reused = None if session.health_related else utterance.reusable_classification(final_text)
+    classification_result = reused or await classify_turn(session, final_text, deadline)
+    metrics.counter("stream_classification_total", reused=str(reused is not None).lower()).inc()
+    status = classification_result.get("status")
+    speculative = {
+        "classification_reused": reused is not None,
+        "prefetched_symptoms": sorted(session.searched),
+    }
+
+    if status == "warning":
+        set_aside_turn(session, classification_result, "voice_stream")
+        await websocket.send_json({
+            "type": "info",
+            "message": classification_result.get("message", "This query does not appear to be health related."),
+            "transcribed_text": final_text
+        })
+
+    elif status == "followup":
+        await websocket.send_json({
+            "type": "followup",
+            "message": "I need a bit more info to help you. Please answer:",
+            "questions": classification_result.get("questions", []),
+            "transcribed_text": final_text
+        })
+
+    elif status == "completed":
+        session.health_related = True
+        retrieval_filter = session_filter(session, final_text)
+        if session.has_results:
+            result = await run_followup_pipeline(session, final_text, deadline, retrieval_filter)
+        else:
+            result = await run_diagnosis_pipeline(session.context_text(), deadline, retrieval_filter, session=session)
+        session.diagnosis = fresh_diagnosis(result) or session.diagnosis
+        await websocket.send_json({
+            "type": "diagnosis",
+            "message": result["message"],
+            "transcribed_text": final_text,
+            "query_transformation": result["query_transformation"],
+            "web_results": result["web_results"],
+            "structured_results": result["structured_results"],
+            "degradations": result["degradations"],
+            "speculative": speculative,
+        })
+
+    else:
+        await websocket.send_json({
+            "type": "error",
+            "message": classification_result.get("message", "An unknown error occurred."),
+            "transcribed_text": final_text
+        })
+
+
+async def audio_stream_endpoint(websocket: WebSocket):
+    """
+    Streaming voice input. The client sends binary audio frames while recording and {"type": "end"}
+    when the utterance is over; the server replies with "partial" transcripts as they arrive, a
+    "final" transcript, and then the same diagnosis/followup/info message as /ws/chat. Several
+    utterances may be sent over one connection; later ones are handled as follow-up turns. Frames
+    are whatever STREAMING_STT_BACKEND expects: any recording format for "batch", raw 16-bit mono PCM
+    for "assemblyai". Partials, and the speculative work they allow, only come from the latter.
+    """
+    await websocket.accept()
+    set_usage_context("ws_audio", session_id=str(uuid.uuid4()))
+    session = ChatSession()
+    utterance: Optional[Utterance] = None
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+
+            if message.get("bytes"):
+                if utterance is None:
+                    utterance = Utterance(websocket, session)
+                try:
+                    await utterance.stt.feed(message["bytes"])
+                except (HTTPException, RuntimeError) as e:
+                    await websocket.send_json({"type": "error", "message": getattr(e, "detail", str(e))})
+                    await utterance.close()
+                    utterance = None
+                continue
+
+            try:
+                data = json.loads(message.get("text") or "{}")
+            except ValueError:
+                await websocket.send_json({"type": "error", "message": "Control messages must be JSON."})
+                continue
+            if not isinstance(data, dict) or data.get("type") != "end" or utterance is None:
+                continue
+
+            try:
+                with start_deadline("voice") as deadline:
+                    final_text = await utterance.finish(deadline)
+                    await respond(websocket, session, utterance, final_text, deadline)
+            except DependencyBusy as e:
+                await websocket.send_json({
+                    "type": "busy",
+                    "message": "The assistant is handling a lot of requests right now. Please try again in a moment.",
+                    "retry_after": e.retry_after
+                })
+            except RuntimeError as e:
+                await websocket.send_json({"type": "error", "message": str(e)})
+            finally:
+                await utterance.close()
+                utterance = None
+
+    except WebSocketDisconnect:
+        logger.info("Audio stream disconnected")
+    finally:
+        if utterance is not None:
+            await utterance.close()
+        session.close()
+        save_case(session.turns, session.diagnosis, "voice_stream")
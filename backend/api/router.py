@@ -1,21 +1,58 @@
-from fastapi import APIRouter, WebSocket, UploadFile, File
+from fastapi import APIRouter, WebSocket, Request
 from .websocket_chat import websocket_endpoint
 from .audio_processing import process_audio
-from .transcription import transcribe
+from .audio_stream import audio_stream_endpoint
+from .transcription import transcribe, submit_transcription, get_transcription, transcription_updates
+from utils.profiler import request_profiler
 
 router = APIRouter()
 
+# Uploads are parsed off the request stream by the handlers, so the form is described here for the docs
+AUDIO_UPLOAD_FORM = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["audio"],
+                    "properties": {"audio": {"type": "string", "format": "binary"}},
+                }
+            }
+        },
+    }
+}
+
 # WebSocket endpoint
 @router.websocket("/ws/chat")
 async def websocket_chat(websocket: WebSocket):
     return await websocket_endpoint(websocket)
 
+# Streaming audio: frames in while recording, partial and final transcripts and the answer out
+@router.websocket("/ws/audio")
+async def audio_stream(websocket: WebSocket):
+    return await audio_stream_endpoint(websocket)
+
 # Audio processing endpoint
-@router.post("/api/audio")
-async def audio_processing(audio: UploadFile = File(...)):
-    return await process_audio(audio)
+@router.post("/api/audio", openapi_extra=AUDIO_UPLOAD_FORM)
+async def audio_processing(request: Request):
+    with request_profiler(request, "audio"):
+        return await process_audio(request)
 
 # Simple transcription endpoint
-@router.post("/transcribe")
-async def transcription(audio: UploadFile = File(...)):
-    return await transcribe(audio) 
\ No newline at end of file
+@router.post("/transcribe", openapi_extra=AUDIO_UPLOAD_FORM)
+async def transcription(request: Request):
+    return await transcribe(request)
+
+# Asynchronous transcription jobs: submit, poll, or wait on a websocket
+@router.post("/transcriptions", status_code=202, openapi_extra=AUDIO_UPLOAD_FORM)
+async def transcription_job_submit(request: Request):
+    return await submit_transcription(request)
+
+@router.get("/transcriptions/{job_id}")
+async def transcription_job_status(job_id: str):
+    return await get_transcription(job_id)
+
+@router.websocket("/ws/transcriptions/{job_id}")
+async def transcription_job_updates(websocket: WebSocket, job_id: str):
+    return await transcription_updates(websocket, job_id)
\ No newline at end of file
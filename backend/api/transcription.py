@@ -1,30 +1,59 @@
-from fastapi import UploadFile, File, HTTPException
-import os
-import shutil
-import assemblyai as aai
+from fastapi import HTTPException, Request, WebSocket, WebSocketDisconnect
+from utils.audio_upload import spool_request
+from utils.concurrency import DependencyBusy
+from utils.transcription_jobs import transcription_jobs
 
-async def transcribe(audio: UploadFile = File(...)):
-    if not audio:
-        raise HTTPException(status_code=400, detail="No audio file provided")
-
-    temp_path = f"temp_{audio.filename}"
-    with open(temp_path, "wb") as buffer:
-        shutil.copyfileobj(audio.file, buffer)
+async def transcribe(request: Request):
+    buffer = await spool_request(request)
 
     try:
-        config = aai.TranscriptionConfig(speech_model=aai.SpeechModel.best)
+        # The job closes the buffer when it finishes
+        job = await transcription_jobs.submit(buffer)
+        await transcription_jobs.wait(job)
+
+        if job.status != "completed":
+            raise HTTPException(status_code=500, detail=f"Transcription failed: {job.error}")
 
-        transcriber = aai.Transcriber(config=config)
-        transcript = transcriber.transcribe(temp_path)
+        return {"text": job.text}
 
-        if transcript.status == "error":
-            raise HTTPException(status_code=500, detail=f"Transcription failed: {transcript.error}")
+    except DependencyBusy as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
 
-        return {"text": transcript.text}
+    except HTTPException:
+        raise
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-    finally:
-        if os.path.exists(temp_path):
-            os.remove(temp_path) 
\ No newline at end of file
+async def submit_transcription(request: Request):
+    """Queue a transcription and return its job id straight away"""
+    # The job owns the spooled buffer and may outlive this request
+    buffer = await spool_request(request)
+    try:
+        job = await transcription_jobs.submit(buffer)
+    except DependencyBusy as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    return job.to_dict()
+
+async def get_transcription(job_id: str):
+    job = transcription_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown or expired transcription job {job_id}")
+    return job.to_dict()
+
+async def transcription_updates(websocket: WebSocket, job_id: str):
+    """Send the job's state once it finishes, then close"""
+    await websocket.accept()
+    job = transcription_jobs.get(job_id)
+    if job is None:
+        await websocket.send_json({"job_id": job_id, "status": "unknown", "error": "Unknown or expired job"})
+        await websocket.close()
+        return
+    try:
+        await websocket.send_json(job.to_dict())
+        if not job.finished:
+            await transcription_jobs.wait(job)
+            await websocket.send_json(job.to_dict())
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
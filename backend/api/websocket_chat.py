@@ -1,15 +1,24 @@
 from fastapi import WebSocket, WebSocketDisconnect
-from workflows.proccess_workflow import process_workflow
-from workflows.query_transformation_workflow import query_transformation_workflow
-from workflows.websearch_workflow import websearch_workflow
-from utils.rrf_ranking import get_top_results
-from agents.diagnosis_agent import DiagnosisAgent
-from workflows.retrieval_workflow import retrieval_workflow
-
-diagnosis_agent = DiagnosisAgent()
+import uuid
+from workflows.diagnosis_pipeline import (
+    run_diagnosis_pipeline,
+    run_followup_pipeline,
+    session_filter,
+    classify_turn,
+    set_aside_turn,
+    fresh_diagnosis,
+    save_case,
+)
+from utils.chat_session import ChatSession
+from utils.profiler import request_profiler
+from utils.concurrency import DependencyBusy
+from utils.deadline import start_deadline
+from utils.usage import set_usage_context
 
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
+    set_usage_context("ws_chat", session_id=str(uuid.uuid4()))
+    session = ChatSession()
     try:
         while True:
             data = await websocket.receive_json()
@@ -19,56 +28,60 @@ async def websocket_endpoint(websocket: WebSocket):
                 await websocket.send_json({"error": "No input received."})
                 continue
 
-            classification_result = await process_workflow.ainvoke({"text": user_text})
-            status = classification_result.get("status")
-
-            if status == "warning":
-                await websocket.send_json({
-                    "type": "info",
-                    "message": classification_result.get("message", "This query does not appear to be health related.")
-                })
+            try:
+                with request_profiler(websocket, "ws_chat"), start_deadline("chat") as deadline:
+                    session.add_turn(user_text)
+                    classification_result = await classify_turn(session, user_text, deadline)
+                    status = classification_result.get("status")
 
-            elif status == "followup":
-                await websocket.send_json({
-                    "type": "followup",
-                    "message": "I need a bit more info to help you. Please answer:",
-                    "questions": classification_result.get("questions", [])
-                })
+                    if status == "warning":
+                        # Unrelated input must not leak into the next classification or diagnosis
+                        set_aside_turn(session, classification_result, "chat")
+                        await websocket.send_json({
+                            "type": "info",
+                            "message": classification_result.get("message", "This query does not appear to be health related.")
+                        })
 
-            elif status == "completed":
-                query_transform_result = await query_transformation_workflow.ainvoke({"text": user_text})
-                transformed_query = query_transform_result.get("search_query", "")
-                symptoms = query_transform_result.get("symptoms", [])
+                    elif status == "followup":
+                        await websocket.send_json({
+                            "type": "followup",
+                            "message": "I need a bit more info to help you. Please answer:",
+                            "questions": classification_result.get("questions", [])
+                        })
 
-                vector_results = await retrieval_workflow.ainvoke(transformed_query)
+                    elif status == "completed":
+                        session.health_related = True
+                        retrieval_filter = session_filter(session, user_text)
+                        if session.has_results:
+                            result = await run_followup_pipeline(session, user_text, deadline, retrieval_filter)
+                        else:
+                            result = await run_diagnosis_pipeline(session.context_text(), deadline, retrieval_filter, session=session)
+                        session.diagnosis = fresh_diagnosis(result) or session.diagnosis
 
-                web_results = await websearch_workflow.ainvoke({"query": transformed_query})
+                        await websocket.send_json({
+                            "type": "diagnosis",
+                            "message": result["message"],
+                            "query_transformation": result["query_transformation"],
+                            "web_results": result["web_results"],
+                            "structured_results": result["structured_results"],
+                            "degradations": result["degradations"]
+                        })
 
-                structured_results = get_top_results(
-                    vector_results=vector_results,
-                    web_results=web_results,
-                    top_k=3
-                )
-
-
-                diagnosis = diagnosis_agent.run(user_symptoms=user_text, chunks=structured_results)
-
-                await websocket.send_json({
-                    "type": "diagnosis",
-                    "message": diagnosis,
-                    "query_transformation": {
-                        "symptoms": symptoms,
-                        "search_query": transformed_query
-                    },
-                    "web_results": web_results,
-                    "structured_results": structured_results
-                })
+                    else:
+                        await websocket.send_json({
+                            "type": "error",
+                            "message": classification_result.get("message", "An unknown error occurred.")
+                        })
 
-            else:
+            except DependencyBusy as e:
                 await websocket.send_json({
-                    "type": "error",
-                    "message": classification_result.get("message", "An unknown error occurred.")
+                    "type": "busy",
+                    "message": "The assistant is handling a lot of requests right now. Please try again in a moment.",
+                    "retry_after": e.retry_after
                 })
 
     except WebSocketDisconnect:
-        print("WebSocket disconnected.") 
\ No newline at end of file
+        print("WebSocket disconnected.")
+    finally:
+        session.close()
+        save_case(session.turns, session.diagnosis, "chat")
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Fast-Path Classifier Agreement Report
+Compares local fast-path decisions with labels (and optionally the Gemini classifier) on a labeled set
+
+    python -m benchmarks.classifier_agreement [benchmarks/classifier_labeled.jsonl] [--live] [--no-embed]
+"""
+
+import argparse
+import json
+import os
+import time
+from collections import Counter
+
+from utils.fast_classifier import FastPathClassifier
+
+DEFAULT_LABELS = os.path.join(os.path.dirname(__file__), "classifier_labeled.jsonl")
+
+
+def load_labeled(path: str) -> list[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("labeled", nargs="?", default=DEFAULT_LABELS, help="JSONL of {text, label}")
+    parser.add_argument("--live", action="store_true", help="Also run the Gemini classifier on every input")
+    parser.add_argument("--no-embed", action="store_true", help="Lexicon only, without the embedding server")
+    args = parser.parse_args()
+
+    examples = load_labeled(args.labeled)
+    fast_path = FastPathClassifier()
+    embed = None
+    if not args.no_embed:
+        from utils.local_embedder import get_embedding
+        embed = get_embedding
+
+    llm_classifier = None
+    if args.live:
+        from agents.classifier_agent import ClassifierAgent
+        llm_classifier = ClassifierAgent()
+
+    decided = agree_label = agree_llm = llm_total = 0
+    confusion = Counter()
+    fast_ms = []
+    for example in examples:
+        started = time.perf_counter()
+        fast = fast_path.classify(example["text"], embed=embed)
+        fast_ms.append((time.perf_counter() - started) * 1000)
+
+        llm_decision = None
+        if llm_classifier:
+            llm_decision = llm_classifier.run_llm(example["text"]).get("decision")
+
+        if fast.decision:
+            decided += 1
+            agree_label += fast.decision == example["label"]
+            confusion[(example["label"], fast.decision)] += 1
+            if llm_decision:
+                llm_total += 1
+                agree_llm += fast.decision == llm_decision
+        similarity = f"{fast.similarity:.3f}" if fast.similarity is not None else "  -  "
+        print(f"{example['text'][:50]:50} label={example['label']:18} fast={str(fast.decision):12} "
+              f"sim={similarity} terms={fast.terms}" + (f" llm={llm_decision}" if llm_classifier else ""))
+
+    total = len(examples)
+    print(f"\nFast path decided {decided}/{total} inputs ({100 * decided / max(total, 1):.0f}% skip the LLM)")
+    print(f"Agreement with labels on decided inputs: {agree_label}/{decided}")
+    if llm_total:
+        print(f"Agreement with the LLM classifier on decided inputs: {agree_llm}/{llm_total}")
+    for (label, decision), count in sorted(confusion.items()):
+        print(f"  label {label:18} -> fast {decision:12} x{count}")
+    print(f"Fast path latency: mean {sum(fast_ms) / max(len(fast_ms), 1):.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
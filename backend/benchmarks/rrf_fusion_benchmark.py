@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+RRF Fusion Microbenchmark
+Times n-way fuse_rankings against the previous two-list, full-sort fusion and a NumPy-scored variant,
+at realistic and large sizes
+
+    python -m benchmarks.rrf_fusion_benchmark
+"""
+
+import random
+import timeit
+
+import numpy as np
+
+from utils.rrf_ranking import fuse_rankings, normalize_name
+
+# (description, number of lists, results per list, top_k)
+CASES = [
+    ("pipeline today: vector 2 + web 5", 2, 5, 3),
+    ("long chat session (CHAT_SESSION_MAX_LISTS)", 12, 5, 3),
+    ("per-symptom dense + lexical + web", 5, 20, 3),
+    ("large candidate pools", 5, 2000, 10),
+]
+
+
+def legacy_two_list(vector_results, web_results, k=60.0, top_k=3):
+    """The fusion used before fuse_rankings, kept here as the baseline"""
+    combined = {}
+    for rank, result in enumerate(vector_results, 1):
+        combined[result["Name"].lower().replace(" ", "_")] = {"result": result, "score": 1.0 / (k + rank)}
+    for rank, result in enumerate(web_results, 1):
+        key = result["Name"].lower().replace(" ", "_")
+        if key in combined:
+            combined[key]["score"] += 1.0 / (k + rank)
+        else:
+            combined[key] = {"result": result, "score": 1.0 / (k + rank)}
+    ranked = sorted(combined.values(), key=lambda x: x["score"], reverse=True)
+    return [item["result"] for item in ranked][:top_k]
+
+
+def numpy_fusion(rankings, k=60.0, top_k=3):
+    """
+    fuse_rankings with the scoring vectorized: keys are still built per result in Python, then ranks
+    go into a sources x keys matrix whose weighted reciprocals are summed and top_k is partitioned out
+    """
+    index, first_seen, rows = {}, [], []
+    for source, results in rankings.items():
+        columns = np.empty(len(results), dtype=np.int64)
+        for rank, result in enumerate(results):
+            key = normalize_name(result["Name"])
+            column = index.get(key)
+            if column is None:
+                column = index[key] = len(first_seen)
+                first_seen.append(result)
+            columns[rank] = column
+        rows.append(columns)
+    ranks = np.full((len(rows), len(first_seen)), np.inf)
+    for i, columns in enumerate(rows):
+        ranks[i, columns[::-1]] = np.arange(len(columns), 0, -1)
+    scores = (1.0 / (k + ranks)).sum(axis=0)
+    # Everything tied with the top_k-th score stays a candidate, so ties keep first-seen order
+    threshold = -np.partition(-scores, min(top_k, len(scores)) - 1)[min(top_k, len(scores)) - 1]
+    top = np.flatnonzero(scores >= threshold)
+    top = top[np.lexsort((top, -scores[top]))][:top_k]
+    return [first_seen[i] for i in top]
+
+
+def make_lists(n_lists, size, vocabulary, rng):
+    return {
+        f"source_{i}": [{"Name": name, "Symptoms": "", "Treatments": ""} for name in rng.sample(vocabulary, size)]
+        for i in range(n_lists)
+    }
+
+
+def main():
+    rng = random.Random(7)
+    for description, n_lists, size, top_k in CASES:
+        vocabulary = [f"Condition {i}" for i in range(max(size * 3, 400))]
+        rankings = make_lists(n_lists, size, vocabulary, rng)
+        repeats = max(10, 20000 // (n_lists * size))
+
+        fused = timeit.timeit(lambda: fuse_rankings(rankings, top_k=top_k), number=repeats) / repeats
+        vectorized = timeit.timeit(lambda: numpy_fusion(rankings, top_k=top_k), number=repeats) / repeats
+        line = (f"{description:44} {n_lists} x {size:5}  fuse_rankings {fused * 1e6:9.1f} us"
+                f"  numpy {vectorized * 1e6:9.1f} us")
+        if n_lists == 2:
+            lists = list(rankings.values())
+            legacy = timeit.timeit(lambda: legacy_two_list(*lists, top_k=top_k), number=repeats) / repeats
+            line += f"  legacy {legacy * 1e6:9.1f} us"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
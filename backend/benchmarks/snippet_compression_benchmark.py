@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Snippet Compression Benchmark
+Measures parse-prompt size reduction, and optionally parse LLM latency, on recorded Tavily results
+
+Runs on benchmarks/search_results_sample.jsonl by default: six symptom queries with 6-10 results each in
+the recorded format, including syndicated near-copies, boilerplate and off-topic ads.
+
+Record your own results by running the backend with SEARCH_RECORD_PATH=benchmarks/search_results.jsonl, then:
+    python -m benchmarks.snippet_compression_benchmark benchmarks/search_results.jsonl [--live]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+
+from prompts.prompts import WEB_SEARCH_PARSE_PROMPT
+from utils.context_builder import estimate_tokens, get_context_builder
+from utils.snippet_compression import compress_snippets
+
+SAMPLE_RECORDINGS = os.path.join(os.path.dirname(__file__), "search_results_sample.jsonl")
+
+
+def load_recordings(path: str) -> list[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def prompt_tokens(snippets: list[str]) -> int:
+    context = get_context_builder("web_parser").build(snippets)
+    return estimate_tokens(WEB_SEARCH_PARSE_PROMPT + f"\nSearch Results:\n{context.text}")
+
+
+def timed_parse(parse_agent, snippets: list[str]) -> float:
+    started = time.perf_counter()
+    parse_agent.parse(snippets)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("recordings", nargs="?", default=SAMPLE_RECORDINGS,
+                        help="JSONL file of {query, results} written via SEARCH_RECORD_PATH (default: the checked-in sample)")
+    parser.add_argument("--live", action="store_true", help="Also call the parse LLM on raw and compressed input")
+    args = parser.parse_args()
+
+    recordings = load_recordings(args.recordings)
+    parse_agent = None
+    if args.live:
+        from agents.web_search_agent import WebSearchParseAgent
+        parse_agent = WebSearchParseAgent()
+
+    raw_tokens, compressed_tokens, compress_ms = [], [], []
+    raw_latency, compressed_latency = [], []
+    total_snippets = kept_snippets = 0
+    for recording in recordings:
+        raw = recording["results"]
+        started = time.perf_counter()
+        compressed = compress_snippets(raw, recording["query"])
+        compress_ms.append((time.perf_counter() - started) * 1000)
+        total_snippets += len(raw)
+        kept_snippets += len(compressed)
+
+        raw_tokens.append(prompt_tokens(raw))
+        compressed_tokens.append(prompt_tokens(compressed))
+        print(f"{recording['query'][:60]:60} {len(raw):2} -> {len(compressed):2} snippets, "
+              f"{raw_tokens[-1]:5} -> {compressed_tokens[-1]:5} prompt tokens")
+
+        if parse_agent:
+            raw_latency.append(timed_parse(parse_agent, raw))
+            compressed_latency.append(timed_parse(parse_agent, compressed))
+
+    if not recordings:
+        print("No recordings found")
+        return
+
+    total_raw, total_compressed = sum(raw_tokens), sum(compressed_tokens)
+    print(f"\n{len(recordings)} searches")
+    print(f"Snippets: {total_snippets} -> {kept_snippets}")
+    print(f"Prompt tokens: {total_raw} -> {total_compressed} "
+          f"({100 * (1 - total_compressed / max(total_raw, 1)):.1f}% smaller)")
+    print(f"Compression time: median {statistics.median(compress_ms):.2f} ms, max {max(compress_ms):.2f} ms")
+    if parse_agent:
+        print(f"Parse latency: median {statistics.median(raw_latency):.2f}s raw, "
+              f"{statistics.median(compressed_latency):.2f}s compressed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Symptom Extraction Check
+Compares local extraction (affirmed and negated symptoms) with expected output on a labeled set
+
+    python -m benchmarks.symptom_extraction_check [benchmarks/symptom_extraction_cases.jsonl]
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from utils.symptom_extractor import extract_symptoms
+
+DEFAULT_CASES = os.path.join(os.path.dirname(__file__), "symptom_extraction_cases.jsonl")
+
+
+def load_cases(path: str) -> list[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("cases", nargs="?", default=DEFAULT_CASES, help="JSONL of {text, symptoms, negated}")
+    args = parser.parse_args()
+
+    cases = load_cases(args.cases)
+    failures = 0
+    for case in cases:
+        extraction = extract_symptoms(case["text"])
+        ok = extraction.symptoms == case["symptoms"] and extraction.negated == case["negated"]
+        failures += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {case['text'][:50]:50} symptoms={extraction.symptoms} "
+              f"negated={extraction.negated} coverage={extraction.coverage:.2f}")
+        if not ok:
+            print(f"     expected symptoms={case['symptoms']} negated={case['negated']}")
+
+    print(f"\n{len(cases) - failures}/{len(cases)} cases match")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
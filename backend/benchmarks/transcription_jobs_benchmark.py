@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Transcription Job Benchmark
+Runs a burst of uploads through the transcription job manager with the fake STT backend and reports
+throughput, job latency and event loop lag, against transcribing inline on the event loop
+
+    python -m benchmarks.transcription_jobs_benchmark --jobs 32 --workers 4 --latency 0.5
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import time
+
+import numpy as np
+
+from stt.backends import FakeSTTBackend
+from utils.transcription_jobs import TranscriptionJobManager
+
+
+async def probe_lag(stop: asyncio.Event, interval: float = 0.01) -> list:
+    """Record how late each short sleep wakes up"""
+    lags = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+    return lags
+
+
+RUN_ID = os.urandom(8)
+
+
+def upload(i: int) -> io.BytesIO:
+    """Distinct bytes per job and per run, so the transcript cache neither answers nor merges them"""
+    return io.BytesIO(RUN_ID + i.to_bytes(8, "big") + b"\0" * 1008)
+
+
+async def run_inline(backend, n_jobs):
+    """The old behaviour: the blocking call made directly inside the request handler"""
+    for i in range(n_jobs):
+        backend.transcribe(upload(i))
+
+
+async def run_jobs(backend, n_jobs, workers):
+    manager = TranscriptionJobManager(backend=backend, workers=workers, queue_size=n_jobs)
+    await manager.start()
+    jobs = [await manager.submit(upload(i)) for i in range(n_jobs)]
+    await asyncio.gather(*(manager.wait(job) for job in jobs))
+    await manager.stop()
+    return [job.finished_at - job.created_at for job in jobs]
+
+
+async def measure(label, coroutine, n_jobs):
+    stop = asyncio.Event()
+    probe = asyncio.create_task(probe_lag(stop))
+    started = time.perf_counter()
+    latencies = await coroutine
+    elapsed = time.perf_counter() - started
+    stop.set()
+    lags = await probe
+    line = f"{label:8} {n_jobs / elapsed:6.1f} jobs/s  max loop lag {max(lags or [elapsed]) * 1000:8.1f} ms"
+    if latencies:
+        line += f"  job latency p50 {np.percentile(latencies, 50):.2f}s p95 {np.percentile(latencies, 95):.2f}s"
+    print(line)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.5, help="Simulated seconds per transcription")
+    parser.add_argument("--skip-inline", action="store_true", help="Skip the inline baseline")
+    args = parser.parse_args()
+
+    backend = FakeSTTBackend(latency=args.latency)
+    if not args.skip_inline:
+        await measure("inline", run_inline(backend, args.jobs), args.jobs)
+    await measure("jobs", run_jobs(backend, args.jobs, args.workers), args.jobs)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,7 +1,280 @@
 import os
+import json
 from dotenv import load_dotenv
 
 load_dotenv()
 
 ASSEMBLYAI_API_KEY = os.getenv("ASSEMBLYAI_API_KEY")
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+
+# On-demand request profiling (disabled unless an admin token is configured)
+PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.001"))
+
+# Event loop lag monitoring
+LOOP_MONITOR_ENABLED = os.getenv("LOOP_MONITOR_ENABLED", "true").lower() == "true"
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "0.05"))
+LOOP_LAG_THRESHOLD = float(os.getenv("LOOP_LAG_THRESHOLD", "0.1"))
+
+# Per-dependency adaptive concurrency limits, overridable as <DEPENDENCY>_CONCURRENCY etc.
+def _dependency_limits(name: str, initial: int, maximum: int, queue: int, latency_target: float) -> dict:
+    prefix = name.upper()
+    return {
+        "initial_limit": int(os.getenv(f"{prefix}_CONCURRENCY", initial)),
+        "max_limit": int(os.getenv(f"{prefix}_MAX_CONCURRENCY", maximum)),
+        "max_queue": int(os.getenv(f"{prefix}_QUEUE_SIZE", queue)),
+        "queue_timeout": float(os.getenv(f"{prefix}_QUEUE_TIMEOUT", "10")),
+        "latency_target": float(os.getenv(f"{prefix}_LATENCY_TARGET", latency_target)),
+    }
+
+DEPENDENCY_LIMITS = {
+    "gemini": _dependency_limits("gemini", 8, 32, 64, 8.0),
+    "tavily": _dependency_limits("tavily", 4, 16, 32, 5.0),
+    "embedding": _dependency_limits("embedding", 8, 32, 64, 1.0),
+    "assemblyai": _dependency_limits("assemblyai", 4, 8, 16, 30.0),
+}
+
+# Share of each dependency's concurrency limit that background (batch/analytics) work may use
+BACKGROUND_CAPACITY_SHARE = float(os.getenv("BACKGROUND_CAPACITY_SHARE", "0.5"))
+
+# End-to-end time budgets (seconds) per product and how they are sliced between pipeline stages
+PIPELINE_BUDGETS = {
+    "voice": float(os.getenv("VOICE_PIPELINE_BUDGET", "15")),
+    "chat": float(os.getenv("CHAT_PIPELINE_BUDGET", "20")),
+    "demo": float(os.getenv("DEMO_PIPELINE_BUDGET", "20")),
+    "default": float(os.getenv("PIPELINE_BUDGET", "20")),
+}
+# Fraction of the budget reserved for the diagnosis LLM call and for retrieval/web search
+DIAGNOSIS_BUDGET_SHARE = float(os.getenv("DIAGNOSIS_BUDGET_SHARE", "0.35"))
+RETRIEVAL_BUDGET_SHARE = float(os.getenv("RETRIEVAL_BUDGET_SHARE", "0.35"))
+
+# Request hedging for idempotent calls (opt-in per dependency, e.g. HEDGED_DEPENDENCIES=gemini,embedding)
+HEDGED_DEPENDENCIES = {d.strip() for d in os.getenv("HEDGED_DEPENDENCIES", "").split(",") if d.strip()}
+HEDGE_BUDGET_RATIO = float(os.getenv("HEDGE_BUDGET_RATIO", "0.05"))
+HEDGE_MAX_TOKENS = float(os.getenv("HEDGE_MAX_TOKENS", "10"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "0.05"))
+HEDGE_WORKERS = int(os.getenv("HEDGE_WORKERS", "32"))
+
+# Per-agent LLM routing: model, sampling, output cap, request timeout and fallback chain.
+# LLM_ROUTING_FILE may point at a JSON file whose entries override these per agent.
+LLM_ROUTES = {
+    "default": {
+        "model": "gemini-2.0-flash",
+        "temperature": 0.7,
+        "max_output_tokens": None,
+        "timeout": 30.0,
+        "max_retries": 1,
+        "fallbacks": [],
+    },
+    "classifier": {
+        "model": "gemini-2.0-flash-lite",
+        "temperature": 0.0,
+        "max_output_tokens": 256,
+        "timeout": 5.0,
+        "fallbacks": ["gemini-2.0-flash"],
+    },
+    "query_transformation": {
+        "model": "gemini-2.0-flash-lite",
+        "temperature": 0.0,
+        "max_output_tokens": 256,
+        "timeout": 5.0,
+        "fallbacks": ["gemini-2.0-flash"],
+    },
+    "web_parser": {
+        "model": "gemini-2.0-flash",
+        "temperature": 0.2,
+        "max_output_tokens": 1024,
+        "timeout": 10.0,
+        "fallbacks": ["gemini-2.0-flash-lite"],
+    },
+    "diagnosis": {
+        "model": "gemini-2.0-flash",
+        "temperature": 0.7,
+        "max_output_tokens": None,
+        "timeout": 20.0,
+        "fallbacks": ["gemini-2.0-flash-lite"],
+    },
+}
+
+LLM_ROUTING_FILE = os.getenv("LLM_ROUTING_FILE")
+if LLM_ROUTING_FILE:
+    with open(LLM_ROUTING_FILE, "r", encoding="utf-8") as f:
+        for _agent, _overrides in json.load(f).items():
+            LLM_ROUTES.setdefault(_agent, {}).update(_overrides)
+
+# LLM usage accounting: USD list prices per million tokens, retention and the cross-process spool file
+LLM_PRICING = {
+    "gemini-2.0-flash": {"input": 0.10, "output": 0.40},
+    "gemini-2.0-flash-lite": {"input": 0.075, "output": 0.30},
+    "gemini-2.0-flash-live-001": {"input": 0.35, "output": 1.50},
+}
+if os.getenv("LLM_PRICING_FILE"):
+    with open(os.getenv("LLM_PRICING_FILE"), "r", encoding="utf-8") as f:
+        LLM_PRICING.update(json.load(f))
+USAGE_RETENTION_SECONDS = float(os.getenv("USAGE_RETENTION_SECONDS", "86400"))
+USAGE_SPOOL_PATH = os.getenv("USAGE_SPOOL_PATH", os.path.join("usage", "llm_usage.jsonl"))
+USAGE_SPOOL_MAX_BYTES = int(os.getenv("USAGE_SPOOL_MAX_BYTES", str(5 * 1024 * 1024)))
+
+# Prompt context budgets (estimated tokens) for the reference material each agent receives,
+# and the most any single source may contribute
+CONTEXT_BUDGETS = {
+    "diagnosis": {
+        "budget": int(os.getenv("DIAGNOSIS_CONTEXT_TOKENS", "1200")),
+        "per_source": int(os.getenv("DIAGNOSIS_SOURCE_TOKENS", "300")),
+    },
+    "web_parser": {
+        "budget": int(os.getenv("WEB_PARSER_CONTEXT_TOKENS", "2500")),
+        "per_source": int(os.getenv("WEB_PARSER_SOURCE_TOKENS", "400")),
+    },
+}
+CHARS_PER_TOKEN = float(os.getenv("CHARS_PER_TOKEN", "4"))
+
+# Web snippet compression before the parse LLM: on/off, MinHash size, near-duplicate Jaccard threshold
+# and the share of query terms a snippet must mention to be kept
+SNIPPET_COMPRESSION_ENABLED = os.getenv("SNIPPET_COMPRESSION_ENABLED", "true").lower() == "true"
+SNIPPET_MINHASH_PERMUTATIONS = int(os.getenv("SNIPPET_MINHASH_PERMUTATIONS", "64"))
+SNIPPET_NEAR_DUPLICATE_THRESHOLD = float(os.getenv("SNIPPET_NEAR_DUPLICATE_THRESHOLD", "0.6"))
+SNIPPET_MIN_RELEVANCE = float(os.getenv("SNIPPET_MIN_RELEVANCE", "0.2"))
+# Append raw search results as JSONL here (for benchmarks/snippet_compression_benchmark.py)
+SEARCH_RECORD_PATH = os.getenv("SEARCH_RECORD_PATH")
+
+# Sharded web result parsing: snippets per parse call (0, the default, parses in one call) and
+# concurrent parse calls. Shards split the web_parser context budget between them.
+WEB_PARSE_SHARD_SIZE = int(os.getenv("WEB_PARSE_SHARD_SIZE", "0"))
+WEB_PARSE_MAX_PARALLEL = int(os.getenv("WEB_PARSE_MAX_PARALLEL", "4"))
+
+# Local fast-path classification: inputs are decided without the LLM when the symptom lexicon and
+# the similarity to the nearest knowledge-base centroid clearly agree; anything in between goes to Gemini
+FASTPATH_ENABLED = os.getenv("FASTPATH_ENABLED", "true").lower() == "true"
+FASTPATH_CENTROIDS = int(os.getenv("FASTPATH_CENTROIDS", "8"))
+FASTPATH_RELEVANT_SIMILARITY = float(os.getenv("FASTPATH_RELEVANT_SIMILARITY", "0.45"))
+FASTPATH_STRONG_SIMILARITY = float(os.getenv("FASTPATH_STRONG_SIMILARITY", "0.6"))
+FASTPATH_IRRELEVANT_SIMILARITY = float(os.getenv("FASTPATH_IRRELEVANT_SIMILARITY", "0.2"))
+FASTPATH_MIN_TERMS = int(os.getenv("FASTPATH_MIN_TERMS", "2"))
+
+# Local symptom extraction: the query transformation LLM is skipped when at least this many symptoms
+# are found and they account for this share of the informative words in the input
+LOCAL_EXTRACTION_ENABLED = os.getenv("LOCAL_EXTRACTION_ENABLED", "true").lower() == "true"
+LOCAL_EXTRACTION_MIN_COVERAGE = float(os.getenv("LOCAL_EXTRACTION_MIN_COVERAGE", "0.5"))
+LOCAL_EXTRACTION_MIN_SYMPTOMS = int(os.getenv("LOCAL_EXTRACTION_MIN_SYMPTOMS", "1"))
+
+# Reciprocal rank fusion: per-source weights (e.g. RRF_SOURCE_WEIGHTS=vector=1.0,web=0.8) and an
+# optional JSON file mapping normalized condition names onto a canonical name
+RRF_SOURCE_WEIGHTS = {
+    source.strip(): float(weight)
+    for source, _, weight in (
+        item.partition("=") for item in os.getenv("RRF_SOURCE_WEIGHTS", "vector=1.0,web=1.0").split(",")
+    )
+    if source.strip() and weight
+}
+RRF_ALIASES = {}
+if os.getenv("RRF_ALIASES_FILE"):
+    with open(os.getenv("RRF_ALIASES_FILE"), "r", encoding="utf-8") as f:
+        RRF_ALIASES = json.load(f)
+
+# Symptom-overlap reranking after fusion: how many fused candidates to rerank and the share of the
+# final score taken from symptom overlap (the rest is the normalized fused score)
+RERANK_POOL = int(os.getenv("RERANK_POOL", "10"))
+RERANK_OVERLAP_WEIGHT = float(os.getenv("RERANK_OVERLAP_WEIGHT", "0.5"))
+
+# Retrieval filters: conditions the clinical team has disabled (codes or names, from a JSON list file or
+# DISABLED_CONDITION_CODES=12,40) and the optional metadata columns used for urgent-care and category filters
+DISABLED_CONDITIONS = set()
+if os.getenv("DISABLED_CONDITIONS_FILE"):
+    with open(os.getenv("DISABLED_CONDITIONS_FILE"), "r", encoding="utf-8") as f:
+        DISABLED_CONDITIONS.update(json.load(f))
+DISABLED_CONDITIONS.update(int(c) for c in os.getenv("DISABLED_CONDITION_CODES", "").split(",") if c.strip())
+FILTER_URGENT_COLUMN = os.getenv("FILTER_URGENT_COLUMN", "Urgent")
+FILTER_CATEGORY_COLUMN = os.getenv("FILTER_CATEGORY_COLUMN", "Category")
+
+# Chat sessions rule a condition out of retrieval once the user has denied at least this share of its
+# listed symptoms (IDF-weighted) and denied more of them than they reported
+RULE_OUT_DENIED_SHARE = float(os.getenv("RULE_OUT_DENIED_SHARE", "0.5"))
+
+# Semantic result cache: cosine similarity a cached query must reach, entry lifetime and count, and the
+# share of hits re-run through the full pipeline to measure how often a hit matches fresh results
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "3600"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1000"))
+SEMANTIC_CACHE_AUDIT_RATE = float(os.getenv("SEMANTIC_CACHE_AUDIT_RATE", "0.05"))
+
+# Diagnosis cache keyed by the canonical symptom set and the top fused conditions
+DIAGNOSIS_CACHE_ENABLED = os.getenv("DIAGNOSIS_CACHE_ENABLED", "true").lower() == "true"
+DIAGNOSIS_CACHE_TTL = float(os.getenv("DIAGNOSIS_CACHE_TTL", "21600"))
+DIAGNOSIS_CACHE_MAX_ENTRIES = int(os.getenv("DIAGNOSIS_CACHE_MAX_ENTRIES", "2000"))
+
+# Past case index over completed, diagnosed sessions: size bound, tombstones tolerated before compaction,
+# maintenance period (ingest new session files, compact), and the similarity at which a past case is
+# added to the diagnosis context or its diagnosis is reused outright
+CASE_INDEX_ENABLED = os.getenv("CASE_INDEX_ENABLED", "true").lower() == "true"
+CASE_INDEX_MAX_CASES = int(os.getenv("CASE_INDEX_MAX_CASES", "5000"))
+CASE_INDEX_COMPACT_THRESHOLD = int(os.getenv("CASE_INDEX_COMPACT_THRESHOLD", "256"))
+CASE_INDEX_MAINTENANCE_INTERVAL = float(os.getenv("CASE_INDEX_MAINTENANCE_INTERVAL", "300"))
+CASE_INDEX_MAX_CHARS = int(os.getenv("CASE_INDEX_MAX_CHARS", "2000"))
+CASE_CONTEXT_SIMILARITY = float(os.getenv("CASE_CONTEXT_SIMILARITY", "0.8"))
+CASE_SHORTCUT_SIMILARITY = float(os.getenv("CASE_SHORTCUT_SIMILARITY", "0.96"))
+
+# Multi-turn /ws/chat sessions: how many of the user's most recent turns make up the conversation
+# the diagnosis sees
+CHAT_SESSION_MAX_TURNS = int(os.getenv("CHAT_SESSION_MAX_TURNS", "8"))
+# ...and how many ranked result lists and symptoms it keeps; the oldest are dropped first
+CHAT_SESSION_MAX_LISTS = int(os.getenv("CHAT_SESSION_MAX_LISTS", "12"))
+CHAT_SESSION_MAX_SYMPTOMS = int(os.getenv("CHAT_SESSION_MAX_SYMPTOMS", "24"))
+
+# Transcription jobs: speech-to-text backend ("assemblyai" or "fake"), concurrent transcriptions,
+# jobs allowed to wait in the queue before new ones are shed, and how long finished jobs stay pollable
+STT_BACKEND = os.getenv("STT_BACKEND", "assemblyai")
+TRANSCRIPTION_WORKERS = int(os.getenv("TRANSCRIPTION_WORKERS", "4"))
+TRANSCRIPTION_QUEUE_SIZE = int(os.getenv("TRANSCRIPTION_QUEUE_SIZE", "32"))
+TRANSCRIPTION_JOB_TTL = float(os.getenv("TRANSCRIPTION_JOB_TTL", "600"))
+# The fake backend's simulated latency (seconds) and returned text
+FAKE_STT_LATENCY = float(os.getenv("FAKE_STT_LATENCY", "1.0"))
+FAKE_STT_TEXT = os.getenv("FAKE_STT_TEXT", "I have had a headache and a fever since yesterday")
+
+# Audio uploads are parsed off the request stream into a spooled buffer: largest accepted upload, bytes
+# kept in memory before spilling to an anonymous temp file (in AUDIO_SPOOL_DIR, default the system temp
+# dir) and how much multipart framing and other form fields a request body may add around the audio
+AUDIO_UPLOAD_MAX_BYTES = int(os.getenv("AUDIO_UPLOAD_MAX_BYTES", str(25 * 1024 * 1024)))
+AUDIO_SPOOL_MEMORY_BYTES = int(os.getenv("AUDIO_SPOOL_MEMORY_BYTES", str(2 * 1024 * 1024)))
+AUDIO_MULTIPART_OVERHEAD_BYTES = int(os.getenv("AUDIO_MULTIPART_OVERHEAD_BYTES", str(64 * 1024)))
+AUDIO_SPOOL_DIR = os.getenv("AUDIO_SPOOL_DIR") or None
+
+# Audio normalization before transcription: target sample rate, energy VAD frame length, absolute
+# speech floor (dBFS) and margin over the clip's noise floor, speech padding kept around trims, longest
+# pause kept inside a clip, and the duration saving that justifies sending a larger lossless file
+AUDIO_NORMALIZATION_ENABLED = os.getenv("AUDIO_NORMALIZATION_ENABLED", "true").lower() == "true"
+AUDIO_TARGET_SAMPLE_RATE = int(os.getenv("AUDIO_TARGET_SAMPLE_RATE", "16000"))
+AUDIO_VAD_FRAME_MS = int(os.getenv("AUDIO_VAD_FRAME_MS", "30"))
+AUDIO_VAD_MIN_DBFS = float(os.getenv("AUDIO_VAD_MIN_DBFS", "-50"))
+AUDIO_VAD_MARGIN_DB = float(os.getenv("AUDIO_VAD_MARGIN_DB", "12"))
+AUDIO_VAD_PADDING_MS = int(os.getenv("AUDIO_VAD_PADDING_MS", "240"))
+AUDIO_VAD_MAX_PAUSE_MS = int(os.getenv("AUDIO_VAD_MAX_PAUSE_MS", "900"))
+AUDIO_MIN_SECONDS_SAVED = float(os.getenv("AUDIO_MIN_SECONDS_SAVED", "1.0"))
+
+# Transcript cache keyed by the audio content hash and STT config: in-memory entries, on-disk directory
+# (empty disables the disk tier), entry lifetime, how often expired disk entries are deleted, and the
+# demo audio whose known transcripts are preloaded
+TRANSCRIPT_CACHE_ENABLED = os.getenv("TRANSCRIPT_CACHE_ENABLED", "true").lower() == "true"
+TRANSCRIPT_CACHE_MEMORY_ENTRIES = int(os.getenv("TRANSCRIPT_CACHE_MEMORY_ENTRIES", "512"))
+TRANSCRIPT_CACHE_DIR = os.getenv("TRANSCRIPT_CACHE_DIR", os.path.join("cache", "transcripts"))
+TRANSCRIPT_CACHE_TTL = float(os.getenv("TRANSCRIPT_CACHE_TTL", str(30 * 24 * 3600)))
+TRANSCRIPT_CACHE_PRUNE_INTERVAL = float(os.getenv("TRANSCRIPT_CACHE_PRUNE_INTERVAL", "3600"))
+DEMO_AUDIO_DIR = os.getenv(
+    "DEMO_AUDIO_DIR", os.path.join(os.path.dirname(__file__), "..", "..", "frontend", "public", "audio", "demo")
+)
+
+# Streaming audio over /api/ws/audio: streaming STT backend, consecutive partials a word prefix must
+# survive to count as stable, and the stable words needed (and gained since the last run) before
+# speculative work starts. Only "assemblyai" (AssemblyAI realtime; clients send raw 16-bit mono PCM at
+# ASSEMBLYAI_STREAMING_SAMPLE_RATE) and "fake" (canned text) produce partials. "batch", the default,
+# accepts any audio format but transcribes on "end" through the transcription jobs, so with it there
+# is no early classification or speculative retrieval at all
+STREAMING_STT_BACKEND = os.getenv("STREAMING_STT_BACKEND", "batch")
+ASSEMBLYAI_STREAMING_SAMPLE_RATE = int(os.getenv("ASSEMBLYAI_STREAMING_SAMPLE_RATE", "16000"))
+FAKE_STREAMING_BYTES_PER_WORD = int(os.getenv("FAKE_STREAMING_BYTES_PER_WORD", "4000"))
+STREAM_STABLE_PARTIALS = int(os.getenv("STREAM_STABLE_PARTIALS", "2"))
+STREAM_SPECULATE_MIN_WORDS = int(os.getenv("STREAM_SPECULATE_MIN_WORDS", "4"))
+STREAM_SPECULATE_MIN_NEW_WORDS = int(os.getenv("STREAM_SPECULATE_MIN_NEW_WORDS", "3"))
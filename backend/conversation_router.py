@@ -6,6 +6,7 @@ Provides endpoints for retrieving conversation history and generating health ins
 from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import JSONResponse
 from typing import Dict, Any, List, Optional
+import asyncio
 import os
 import json
 from datetime import datetime
@@ -102,7 +103,7 @@ async def update_session_summary(session_id: str, request: Request) -> Dict[Any,
         if not summary:
             raise HTTPException(status_code=400, detail="Summary is required")
         
-        conversation_storage.update_session_summary(session_id, summary)
+        await asyncio.to_thread(conversation_storage.update_session_summary, session_id, summary)
         
         return {
             "session_id": session_id,
@@ -124,7 +125,7 @@ async def update_health_insights(session_id: str, request: Request) -> Dict[Any,
         if not insights:
             raise HTTPException(status_code=400, detail="Insights are required")
         
-        conversation_storage.update_health_insights(session_id, insights)
+        await asyncio.to_thread(conversation_storage.update_health_insights, session_id, insights)
         
         return {
             "session_id": session_id,
@@ -3,14 +3,14 @@ Demo Voice Router
 Handles demo voice processing by ID and runs through the same workflow as regular chat
 """
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
 from utils.demo_voices import get_demo_voice_by_id, validate_demo_voice_id
-from workflows.query_transformation_workflow import query_transformation_workflow
-from workflows.retrieval_workflow import retrieval_workflow
-from workflows.websearch_workflow import websearch_workflow
-from utils.rrf_ranking import get_top_results
-from agents.diagnosis_agent import DiagnosisAgent
+from workflows.diagnosis_pipeline import run_diagnosis_pipeline
+from utils.profiler import request_profiler
+from utils.concurrency import DependencyBusy, Priority, priority_scope
+from utils.deadline import start_deadline
+from utils.usage import set_usage_context
 import logging
 
 # Configure logging
@@ -22,7 +22,7 @@ class DemoVoiceRequest(BaseModel):
     demo_voice_id: str
 
 @router.post("/api/demo")
-async def process_demo_voice(request: DemoVoiceRequest):
+async def process_demo_voice(request: DemoVoiceRequest, http_request: Request):
     """
     Process demo voice by ID: get transcript and run through AI workflow
     """
@@ -41,50 +41,32 @@ async def process_demo_voice(request: DemoVoiceRequest):
     user_text = demo_voice.transcript
     logger.info(f"Processing transcript for {demo_voice.speaker}: {user_text}")
     
-    try:
-        logger.info("Starting query transformation workflow...")
-        query_transform_result = await query_transformation_workflow.ainvoke({"text": user_text})
-        transformed_query = query_transform_result.get("search_query", "")
-        symptoms = query_transform_result.get("symptoms", [])
-        logger.info(f"Query transformation result: {transformed_query}, symptoms: {symptoms}")
+    with request_profiler(http_request, "demo"), priority_scope(Priority.DEMO), start_deadline("demo") as deadline:
+        try:
+            set_usage_context("demo", session_id=demo_voice_id)
+            logger.info("Running diagnosis pipeline...")
+            result = await run_diagnosis_pipeline(user_text, deadline)
+            logger.info(f"Diagnosis complete in {deadline.elapsed():.2f}s, degradations: {result['degradations']}")
         
-        logger.info("Starting vector retrieval workflow...")
-        vector_results = await retrieval_workflow.ainvoke(transformed_query)
-        logger.info("Vector retrieval complete.")
-        
-        logger.info("Starting web search workflow...")
-        web_results = await websearch_workflow.ainvoke({"query": transformed_query})
-        logger.info("Web search complete.")
-        
-        logger.info("Ranking and structuring results...")
-        structured_results = get_top_results(
-            vector_results=vector_results,
-            web_results=web_results,
-            top_k=3
-        )
-        logger.info("Structured results ready.")
-        
-        logger.info("Running diagnosis agent...")
-        diagnosis = DiagnosisAgent().run(user_symptoms=user_text, chunks=structured_results)
-        logger.info("Diagnosis complete.")
-        
-        return {
-            "type": "diagnosis",
-            "message": diagnosis,
-            "transcribed_text": user_text,
-            "query_transformation": {
-                "symptoms": symptoms,
-                "search_query": transformed_query
-            },
-            "web_results": web_results,
-            "structured_results": structured_results,
-            "demo_info": {
-                "voice_id": demo_voice.voice_id,
-                "speaker": demo_voice.speaker,
-                "original_transcript": user_text
+            return {
+                "type": "diagnosis",
+                "message": result["message"],
+                "transcribed_text": user_text,
+                "query_transformation": result["query_transformation"],
+                "web_results": result["web_results"],
+                "structured_results": result["structured_results"],
+                "degradations": result["degradations"],
+                "demo_info": {
+                    "voice_id": demo_voice.voice_id,
+                    "speaker": demo_voice.speaker,
+                    "original_transcript": user_text
+                }
             }
-        }
             
-    except Exception as e:
-        logger.error(f"Exception during demo processing: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error processing demo voice: {str(e)}") 
\ No newline at end of file
+        except DependencyBusy as e:
+            logger.warning(f"Shedding demo request: {str(e)}")
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+        except Exception as e:
+            logger.error(f"Exception during demo processing: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Error processing demo voice: {str(e)}") 
\ No newline at end of file
@@ -1,6 +1,77 @@
+import logging
+import time
 from langchain_google_genai import ChatGoogleGenerativeAI
-from config.config import GOOGLE_API_KEY
+from config.config import GOOGLE_API_KEY, LLM_ROUTES
+from utils.concurrency import DependencyBusy, get_limiter
+from utils.hedging import get_hedger
+from utils.metrics import metrics
+from utils.usage import usage_tracker
 
-def get_gemini_llm():
-    return ChatGoogleGenerativeAI(model="gemini-2.0-flash", google_api_key=GOOGLE_API_KEY)
+logger = logging.getLogger(__name__)
 
+
+class RoutedChatModel:
+    """
+    Chat model for one agent's route. Each call goes through the shared Gemini
+    limiter and hedger, and falls through the route's fallback chain when a model
+    errors or exceeds its timeout.
+    """
+
+    def __init__(self, agent: str, chain: list, dependency: str = "gemini"):
+        self.agent = agent
+        self.chain = chain
+        self.llm = chain[0][1]
+        self.limiter = get_limiter(dependency)
+        self.hedger = get_hedger(dependency)
+
+    def invoke(self, messages, **kwargs):
+        for position, (model, llm) in enumerate(self.chain, 1):
+            try:
+                return self.hedger.call(self._invoke_once, model, llm, messages, **kwargs)
+            except DependencyBusy:
+                raise
+            except Exception as e:
+                if position == len(self.chain):
+                    raise
+                metrics.counter("llm_fallbacks_total", agent=self.agent, model=model).inc()
+                logger.warning(f"{self.agent} call to {model} failed, trying next model: {e}")
+
+    def _invoke_once(self, model, llm, messages, **kwargs):
+        with self.limiter.acquire():
+            started = time.monotonic()
+            response = llm.invoke(messages, **kwargs)
+            latency = time.monotonic() - started
+        usage = getattr(response, "usage_metadata", None) or {}
+        usage_tracker.record(
+            agent=self.agent,
+            model=model,
+            input_tokens=usage.get("input_tokens", 0),
+            output_tokens=usage.get("output_tokens", 0),
+            latency=latency,
+        )
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+
+def get_route(agent: str) -> dict:
+    """Resolve an agent's route on top of the default route"""
+    return {**LLM_ROUTES["default"], **LLM_ROUTES.get(agent, {})}
+
+
+def _build_model(model: str, route: dict) -> ChatGoogleGenerativeAI:
+    return ChatGoogleGenerativeAI(
+        model=model,
+        google_api_key=GOOGLE_API_KEY,
+        temperature=route["temperature"],
+        max_output_tokens=route["max_output_tokens"],
+        timeout=route["timeout"],
+        max_retries=route["max_retries"],
+    )
+
+
+def get_gemini_llm(agent: str = "default"):
+    route = get_route(agent)
+    models = [route["model"]] + [m for m in route["fallbacks"] if m != route["model"]]
+    return RoutedChatModel(agent, [(model, _build_model(model, route)) for model in models])
@@ -10,6 +10,13 @@ from demo_router import router as demo_router
 from voice_router import router as voice_router, initialize_voice_bot, cleanup_voice_bot
 from rtvi_router import router as rtvi_router
 from conversation_router import router as conversation_router
+from metrics_router import router as metrics_router
+from utils.loop_monitor import loop_monitor
+from utils.profiler import install_profiling_executor
+from utils.case_index import case_index
+from utils.transcription_jobs import transcription_jobs
+from voice_live_agent.conversation_storage import conversation_storage
+from config.config import LOOP_MONITOR_ENABLED, CASE_INDEX_ENABLED
 import logging
 
 from api.router import router as api_router
@@ -41,6 +48,7 @@ app.include_router(demo_router, tags=["Demo"])
 app.include_router(voice_router, tags=["Voice Bot"])
 app.include_router(rtvi_router, tags=["RTVI"])
 app.include_router(conversation_router, tags=["Conversations"])
+app.include_router(metrics_router, tags=["Metrics"])
 
 # Serve static files
 app.mount("/static", StaticFiles(directory="."), name="static")
@@ -49,6 +57,12 @@ app.mount("/static", StaticFiles(directory="."), name="static")
 async def startup_event():
     """Initialize the application on startup"""
     logger.info("Starting Healia backend...")
+    install_profiling_executor()
+    if LOOP_MONITOR_ENABLED:
+        await loop_monitor.start()
+    if CASE_INDEX_ENABLED:
+        await case_index.start(conversation_storage)
+    await transcription_jobs.start()
     try:
         await initialize_voice_bot()
         logger.info("Voice bot initialized successfully")
@@ -59,6 +73,9 @@ async def startup_event():
 async def shutdown_event():
     """Clean up resources on shutdown"""
     logger.info("Shutting down Healia backend...")
+    await loop_monitor.stop()
+    await case_index.stop()
+    await transcription_jobs.stop()
     try:
         await cleanup_voice_bot()
         logger.info("Voice bot cleaned up successfully")
@@ -76,6 +93,7 @@ async def root():
             "voice_connect": "/voice/connect",
             "voice_status": "/voice/status",
             "demo": "/api/demo",
+            "metrics": "/metrics",
             "docs": "/docs"
         }
     }
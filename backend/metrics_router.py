@@ -0,0 +1,32 @@
+"""
+Metrics Router
+Exposes in-process metrics, the event loop blocking-call report and LLM usage
+"""
+
+from fastapi import APIRouter, HTTPException
+from typing import Dict, Any, Optional
+from utils.metrics import metrics
+from utils.loop_monitor import loop_monitor
+from utils.usage import usage_tracker, USAGE_WINDOWS
+
+router = APIRouter()
+
+@router.get("/metrics")
+async def get_metrics() -> Dict[str, Any]:
+    """Get a snapshot of all counters, gauges and histograms"""
+    return metrics.snapshot()
+
+@router.get("/metrics/event-loop")
+async def get_event_loop_report() -> Dict[str, Any]:
+    """Get event loop lag percentiles and the call sites that blocked the loop"""
+    return loop_monitor.report()
+
+
+@router.get("/usage")
+async def get_usage(window: Optional[str] = None) -> Dict[str, Any]:
+    """Get LLM token, latency and cost usage per agent, endpoint, model and session"""
+    if window is None:
+        return {name: usage_tracker.summary(seconds) for name, seconds in USAGE_WINDOWS.items()}
+    if window not in USAGE_WINDOWS:
+        raise HTTPException(status_code=400, detail=f"Unknown window {window}, expected one of {list(USAGE_WINDOWS)}")
+    return usage_tracker.summary(USAGE_WINDOWS[window])
\ No newline at end of file
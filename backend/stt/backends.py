@@ -0,0 +1,88 @@
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import BinaryIO, Optional, Union
+
+import assemblyai as aai
+
+from config.config import STT_BACKEND, FAKE_STT_LATENCY, FAKE_STT_TEXT
+from utils.concurrency import get_limiter
+
+# A filesystem path or an open binary file positioned at the start of the audio
+AudioSource = Union[str, BinaryIO]
+
+
+@dataclass
+class Transcript:
+    text: str
+    status: str = "completed"
+    error: Optional[str] = None
+
+
+class STTBackend(ABC):
+    """Blocking speech-to-text call; the transcription job workers run it off the event loop"""
+
+    name = "base"
+
+    @property
+    def fingerprint(self) -> str:
+        """Identifies everything that affects the transcript; part of the transcript cache key"""
+        return self.name
+
+    @abstractmethod
+    def transcribe(self, audio: AudioSource) -> Transcript:
+        """
+        Transcribe one clip; failures are reported as a Transcript with status "error"
+        """
+        pass
+
+
+class AssemblyAIBackend(STTBackend):
+    name = "assemblyai"
+
+    def __init__(self):
+        self.limiter = get_limiter("assemblyai")
+        self.speech_model = aai.SpeechModel.best
+
+    @property
+    def fingerprint(self) -> str:
+        return f"{self.name}:{self.speech_model}"
+
+    def transcribe(self, audio: AudioSource) -> Transcript:
+        config = aai.TranscriptionConfig(speech_model=self.speech_model)
+        transcriber = aai.Transcriber(config=config)
+        with self.limiter.acquire():
+            transcript = transcriber.transcribe(audio)
+        if transcript.status == "error":
+            return Transcript(text="", status="error", error=transcript.error)
+        return Transcript(text=transcript.text or "")
+
+
+class FakeSTTBackend(STTBackend):
+    """Sleeps for a fixed latency and returns a canned text; for tests, local development and benchmarks"""
+
+    name = "fake"
+
+    def __init__(self, latency: float = FAKE_STT_LATENCY, text: str = FAKE_STT_TEXT):
+        self.latency = latency
+        self.text = text
+
+    @property
+    def fingerprint(self) -> str:
+        return f"{self.name}:{self.text}"
+
+    def transcribe(self, audio: AudioSource) -> Transcript:
+        time.sleep(self.latency)
+        return Transcript(text=self.text)
+
+
+STT_BACKENDS = {
+    AssemblyAIBackend.name: AssemblyAIBackend,
+    FakeSTTBackend.name: FakeSTTBackend,
+}
+
+
+def get_stt_backend(name: str = STT_BACKEND) -> STTBackend:
+    if name not in STT_BACKENDS:
+        raise ValueError(f"Unknown STT backend {name}, expected one of {list(STT_BACKENDS)}")
+    return STT_BACKENDS[name]()
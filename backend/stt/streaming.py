@@ -0,0 +1,224 @@
+import asyncio
+import logging
+import tempfile
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, Optional
+
+import assemblyai as aai
+from assemblyai.streaming.v3 import (
+    StreamingClient,
+    StreamingClientOptions,
+    StreamingError,
+    StreamingEvents,
+    StreamingParameters,
+    TurnEvent,
+)
+
+from config.config import (
+    STREAMING_STT_BACKEND,
+    FAKE_STT_TEXT,
+    FAKE_STREAMING_BYTES_PER_WORD,
+    ASSEMBLYAI_STREAMING_SAMPLE_RATE,
+    AUDIO_UPLOAD_MAX_BYTES,
+    AUDIO_SPOOL_MEMORY_BYTES,
+    AUDIO_SPOOL_DIR,
+)
+from utils.audio_upload import UploadTooLarge
+from utils.transcription_jobs import transcription_jobs
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TranscriptEvent:
+    text: str
+    is_final: bool = False
+
+
+class StreamingSTTSession(ABC):
+    """
+    One utterance streamed to a speech-to-text backend. Audio frames go in through feed() as they are
+    recorded; events() yields partial transcripts while audio arrives and a single final transcript
+    after finish(), then ends.
+    """
+
+    name = "base"
+
+    def __init__(self):
+        self._events: "asyncio.Queue[Optional[TranscriptEvent]]" = asyncio.Queue()
+
+    @abstractmethod
+    async def feed(self, chunk: bytes):
+        pass
+
+    @abstractmethod
+    async def finish(self, timeout: Optional[float] = None):
+        """
+        No more audio; the backend emits the final transcript. Raises asyncio.TimeoutError if it is not
+        ready within `timeout` seconds.
+        """
+        pass
+
+    async def close(self):
+        """Release resources when the stream is abandoned before finishing"""
+        pass
+
+    def _emit(self, event: Optional[TranscriptEvent]):
+        self._events.put_nowait(event)
+
+    async def events(self) -> AsyncIterator[TranscriptEvent]:
+        while (event := await self._events.get()) is not None:
+            yield event
+
+
+class FakeStreamingSTT(StreamingSTTSession):
+    """
+    Reveals a canned text one word per `bytes_per_word` bytes received, as partials, and all of it as
+    the final transcript; for tests, local development and benchmarks
+    """
+
+    name = "fake"
+
+    def __init__(self, text: str = FAKE_STT_TEXT, bytes_per_word: int = FAKE_STREAMING_BYTES_PER_WORD):
+        super().__init__()
+        self.words = text.split()
+        self.bytes_per_word = bytes_per_word
+        self.received = 0
+        self.revealed = 0
+
+    async def feed(self, chunk: bytes):
+        self.received += len(chunk)
+        revealed = min(len(self.words), self.received // self.bytes_per_word)
+        if revealed > self.revealed:
+            self.revealed = revealed
+            self._emit(TranscriptEvent(" ".join(self.words[:revealed])))
+
+    async def finish(self, timeout: Optional[float] = None):
+        self._emit(TranscriptEvent(" ".join(self.words), is_final=True))
+        self._emit(None)
+
+
+class BatchStreamingSTT(StreamingSTTSession):
+    """
+    Adapter for non-streaming backends: frames are spooled (memory first, then an anonymous temp
+    file) and the whole recording goes through the transcription job manager on finish. There are
+    no partials, but recording still overlaps with upload and nothing waits for a file to be saved.
+    """
+
+    name = "batch"
+
+    def __init__(self, max_bytes: int = AUDIO_UPLOAD_MAX_BYTES):
+        super().__init__()
+        self.max_bytes = max_bytes
+        self.received = 0
+        self.buffer = tempfile.SpooledTemporaryFile(max_size=AUDIO_SPOOL_MEMORY_BYTES, dir=AUDIO_SPOOL_DIR)
+
+    async def feed(self, chunk: bytes):
+        self.received += len(chunk)
+        if self.received > self.max_bytes:
+            raise UploadTooLarge(self.max_bytes)
+        # The spool rolls over to disk once its size passes AUDIO_SPOOL_MEMORY_BYTES
+        if self.received > AUDIO_SPOOL_MEMORY_BYTES:
+            await asyncio.to_thread(self.buffer.write, chunk)
+        else:
+            self.buffer.write(chunk)
+
+    async def finish(self, timeout: Optional[float] = None):
+        self.buffer.seek(0)
+        buffer, self.buffer = self.buffer, None
+        job = await transcription_jobs.submit(buffer)
+        try:
+            await transcription_jobs.wait(job, timeout)
+        except asyncio.TimeoutError:
+            transcription_jobs.cancel(job)
+            raise
+        if job.status != "completed":
+            raise RuntimeError(f"Transcription failed: {job.error}")
+        self._emit(TranscriptEvent(job.text or "", is_final=True))
+        self._emit(None)
+
+    async def close(self):
+        if self.buffer is not None:
+            self.buffer.close()
+            self.buffer = None
+
+
+class AssemblyAIStreamingSTT(StreamingSTTSession):
+    """
+    AssemblyAI realtime (Universal Streaming) transcription. Frames must be raw 16-bit mono PCM at
+    ASSEMBLYAI_STREAMING_SAMPLE_RATE. The SDK client is blocking and calls back on its own threads,
+    so connecting and disconnecting run in worker threads and its events are handed to the loop.
+
+    AssemblyAI splits speech into turns at pauses; partials are every turn so far joined together,
+    and the final transcript is the same once the session has been terminated.
+    """
+
+    name = "assemblyai"
+
+    def __init__(self, sample_rate: int = ASSEMBLYAI_STREAMING_SAMPLE_RATE):
+        super().__init__()
+        self.sample_rate = sample_rate
+        self.client: Optional[StreamingClient] = None
+        self.turns: Dict[int, str] = {}
+        self.error: Optional[str] = None
+        self._loop = asyncio.get_running_loop()
+
+    async def _connect(self):
+        client = StreamingClient(
+            StreamingClientOptions(api_key=aai.settings.api_key, api_host="streaming.assemblyai.com")
+        )
+        client.on(StreamingEvents.Turn, self._on_turn)
+        client.on(StreamingEvents.Error, self._on_error)
+        try:
+            await asyncio.to_thread(
+                client.connect, StreamingParameters(sample_rate=self.sample_rate, format_turns=True)
+            )
+        except Exception as e:
+            raise RuntimeError(f"Could not start streaming transcription: {e}") from e
+        self.client = client
+
+    def _text(self) -> str:
+        return " ".join(text for _, text in sorted(self.turns.items()) if text)
+
+    def _on_turn(self, client: StreamingClient, event: TurnEvent):
+        self.turns[event.turn_order] = event.transcript
+        self._loop.call_soon_threadsafe(self._emit, TranscriptEvent(self._text()))
+
+    def _on_error(self, client: StreamingClient, error: StreamingError):
+        logger.warning(f"AssemblyAI streaming error: {error}")
+        self.error = str(error)
+
+    async def feed(self, chunk: bytes):
+        if self.client is None:
+            await self._connect()
+        self.client.stream(chunk)
+
+    async def finish(self, timeout: Optional[float] = None):
+        if self.client is not None:
+            client, self.client = self.client, None
+            # Terminating waits for the last turns to be transcribed; past the timeout the worker
+            # thread is left to finish the disconnect on its own
+            await asyncio.wait_for(asyncio.to_thread(client.disconnect, True), timeout)
+        if self.error and not self.turns:
+            raise RuntimeError(f"Transcription failed: {self.error}")
+        self._emit(TranscriptEvent(self._text(), is_final=True))
+        self._emit(None)
+
+    async def close(self):
+        if self.client is not None:
+            client, self.client = self.client, None
+            await asyncio.to_thread(client.disconnect, False)
+
+
+STREAMING_STT_BACKENDS = {
+    FakeStreamingSTT.name: FakeStreamingSTT,
+    BatchStreamingSTT.name: BatchStreamingSTT,
+    AssemblyAIStreamingSTT.name: AssemblyAIStreamingSTT,
+}
+
+
+def open_streaming_stt(name: str = STREAMING_STT_BACKEND) -> StreamingSTTSession:
+    if name not in STREAMING_STT_BACKENDS:
+        raise ValueError(f"Unknown streaming STT backend {name}, expected one of {list(STREAMING_STT_BACKENDS)}")
+    return STREAMING_STT_BACKENDS[name]()
@@ -0,0 +1,224 @@
+"""
+Audio Normalization
+Decodes uploads to 16 kHz mono PCM and trims silence with an energy VAD so less audio is uploaded and transcribed
+"""
+
+import io
+import logging
+import wave
+from dataclasses import dataclass, asdict
+from typing import BinaryIO, Optional, Tuple
+
+import numpy as np
+
+from config.config import (
+    AUDIO_TARGET_SAMPLE_RATE,
+    AUDIO_VAD_FRAME_MS,
+    AUDIO_VAD_MIN_DBFS,
+    AUDIO_VAD_MARGIN_DB,
+    AUDIO_VAD_PADDING_MS,
+    AUDIO_VAD_MAX_PAUSE_MS,
+    AUDIO_MIN_SECONDS_SAVED,
+)
+from utils.metrics import metrics
+
+# PyAV (installed with aiortc) decodes browser formats such as WebM/Opus and MP3; without it only WAV is handled
+try:
+    import av
+    HAS_PYAV = True
+except ImportError:
+    HAS_PYAV = False
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class NormalizationReport:
+    original_bytes: int
+    normalized_bytes: int
+    original_seconds: float
+    normalized_seconds: float
+    original_sample_rate: int
+    original_channels: int
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.original_bytes - self.normalized_bytes
+
+    @property
+    def seconds_saved(self) -> float:
+        return self.original_seconds - self.normalized_seconds
+
+    def to_dict(self) -> dict:
+        return {
+            **asdict(self),
+            "bytes_saved": self.bytes_saved,
+            "seconds_saved": round(self.seconds_saved, 3),
+        }
+
+
+def _decode_pyav(source: BinaryIO, rate: int) -> Tuple[np.ndarray, int, int, float]:
+    """Decode, downmix and resample in libswresample; returns mono float32 samples at `rate`"""
+    with av.open(source) as container:
+        stream = container.streams.audio[0]
+        original_rate, channels = stream.codec_context.sample_rate, len(stream.codec_context.layout.channels)
+        resampler = av.AudioResampler(format="flt", layout="mono", rate=rate)
+        chunks = []
+        for frame in container.decode(stream):
+            chunks.extend(out.to_ndarray().reshape(-1) for out in resampler.resample(frame))
+        chunks.extend(out.to_ndarray().reshape(-1) for out in resampler.resample(None))
+    samples = np.concatenate(chunks).astype(np.float32) if chunks else np.zeros(0, np.float32)
+    return samples, original_rate, channels, len(samples) / rate
+
+
+def _decode_wav(source: BinaryIO, rate: int) -> Tuple[np.ndarray, int, int, float]:
+    """Decode 16-bit PCM WAV, downmix by averaging channels and resample with an FFT"""
+    with wave.open(source, "rb") as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError(f"Unsupported WAV sample width {wav.getsampwidth()}")
+        original_rate, channels = wav.getframerate(), wav.getnchannels()
+        pcm = np.frombuffer(wav.readframes(wav.getnframes()), dtype="<i2")
+    samples = pcm.reshape(-1, channels).astype(np.float32).mean(axis=1) / 32768.0
+    duration = len(samples) / original_rate
+    if original_rate != rate and len(samples):
+        samples = _resample(samples, original_rate, rate)
+    return samples, original_rate, channels, duration
+
+
+def _resample(samples: np.ndarray, from_rate: int, to_rate: int) -> np.ndarray:
+    """Band-limited resampling of a whole clip by truncating or zero-padding its spectrum"""
+    n_out = int(round(len(samples) * to_rate / from_rate))
+    spectrum = np.fft.rfft(samples)
+    n_bins = n_out // 2 + 1
+    if n_bins <= len(spectrum):
+        spectrum = spectrum[:n_bins]
+    else:
+        spectrum = np.pad(spectrum, (0, n_bins - len(spectrum)))
+    return (np.fft.irfft(spectrum, n_out) * (n_out / len(samples))).astype(np.float32)
+
+
+def speech_mask(samples: np.ndarray, rate: int) -> np.ndarray:
+    """
+    Per-frame speech decision from frame energy
+
+    A frame is speech when its RMS level is above both an absolute floor and the clip's noise floor
+    (10th percentile frame level) plus a margin, so quiet rooms and noisy ones are both handled.
+    """
+    frame = int(rate * AUDIO_VAD_FRAME_MS / 1000)
+    n_frames = len(samples) // frame
+    if n_frames == 0:
+        return np.zeros(0, dtype=bool)
+    frames = samples[:n_frames * frame].reshape(n_frames, frame)
+    level_db = 10 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+    threshold = max(AUDIO_VAD_MIN_DBFS, np.percentile(level_db, 10) + AUDIO_VAD_MARGIN_DB)
+    return level_db > threshold
+
+
+def trim_silence(samples: np.ndarray, rate: int) -> np.ndarray:
+    """
+    Drop leading and trailing silence (keeping AUDIO_VAD_PADDING_MS around speech) and shorten pauses
+    longer than AUDIO_VAD_MAX_PAUSE_MS. Clips with no detected speech are returned unchanged.
+    """
+    speech = speech_mask(samples, rate)
+    if not speech.any():
+        return samples
+    frame = int(rate * AUDIO_VAD_FRAME_MS / 1000)
+    padding = max(1, AUDIO_VAD_PADDING_MS // AUDIO_VAD_FRAME_MS)
+    max_pause = max(1, AUDIO_VAD_MAX_PAUSE_MS // AUDIO_VAD_FRAME_MS)
+
+    # Widen speech by the padding on both sides (a dilation done with a running window sum)
+    window = np.convolve(speech.astype(np.int32), np.ones(2 * padding + 1, dtype=np.int32), mode="same")
+    keep = window > 0
+
+    # Within each silent run, keep only the first and last max_pause / 2 frames
+    changes = np.flatnonzero(np.diff(np.concatenate(([1], keep.astype(np.int8), [1]))))
+    starts, ends = changes[0::2], changes[1::2]
+    for start, end in zip(starts, ends):
+        is_edge = start == 0 or end == len(keep)
+        if is_edge:
+            continue
+        if end - start > max_pause:
+            keep[start:start + max_pause // 2] = True
+            keep[end - (max_pause - max_pause // 2):end] = True
+        else:
+            keep[start:end] = True
+
+    sample_keep = np.repeat(keep, frame)
+    tail = samples[len(sample_keep):] if keep[-1] else samples[:0]
+    return np.concatenate((samples[:len(sample_keep)][sample_keep], tail))
+
+
+def _to_pcm16(samples: np.ndarray) -> np.ndarray:
+    return (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2")
+
+
+def encode_flac(samples: np.ndarray, rate: int) -> io.BytesIO:
+    """Lossless mono FLAC, roughly half the size of the equivalent WAV"""
+    buffer = io.BytesIO()
+    with av.open(buffer, "w", format="flac") as container:
+        stream = container.add_stream("flac", rate=rate, layout="mono")
+        frame = av.AudioFrame.from_ndarray(_to_pcm16(samples).reshape(1, -1), format="s16", layout="mono")
+        frame.sample_rate = rate
+        for packet in stream.encode(frame):
+            container.mux(packet)
+        for packet in stream.encode(None):
+            container.mux(packet)
+    buffer.seek(0)
+    return buffer
+
+
+def encode_wav(samples: np.ndarray, rate: int) -> io.BytesIO:
+    pcm = _to_pcm16(samples)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(pcm.tobytes())
+    buffer.seek(0)
+    return buffer
+
+
+def normalize_audio(source: BinaryIO, rate: int = AUDIO_TARGET_SAMPLE_RATE) -> Tuple[BinaryIO, Optional[NormalizationReport]]:
+    """
+    Convert an uploaded clip to trimmed 16-bit mono audio at `rate` (FLAC with PyAV, WAV otherwise)
+
+    Returns the new buffer and a report of the size and duration saved. Lossless output can be larger
+    than a compressed upload, so it is used only when it is smaller or at least
+    AUDIO_MIN_SECONDS_SAVED shorter (transcription time follows duration). Otherwise, or when the
+    clip cannot be decoded, the original is returned rewound with no report. The caller keeps
+    ownership of `source`.
+    """
+    source.seek(0, io.SEEK_END)
+    original_bytes = source.tell()
+    source.seek(0)
+    try:
+        decode = _decode_pyav if HAS_PYAV else _decode_wav
+        samples, original_rate, channels, original_seconds = decode(source, rate)
+    except Exception as e:
+        logger.warning(f"Could not decode audio for normalization, sending it unchanged: {e}")
+        metrics.counter("audio_normalization_total", outcome="undecodable").inc()
+        source.seek(0)
+        return source, None
+
+    trimmed = trim_silence(samples, rate)
+    normalized = encode_flac(trimmed, rate) if HAS_PYAV else encode_wav(trimmed, rate)
+    normalized_bytes = normalized.getbuffer().nbytes
+    seconds_saved = original_seconds - len(trimmed) / rate
+    if normalized_bytes >= original_bytes and seconds_saved < AUDIO_MIN_SECONDS_SAVED:
+        metrics.counter("audio_normalization_total", outcome="no_gain").inc()
+        source.seek(0)
+        return source, None
+
+    report = NormalizationReport(
+        original_bytes=original_bytes,
+        normalized_bytes=normalized_bytes,
+        original_seconds=round(original_seconds, 3),
+        normalized_seconds=round(len(trimmed) / rate, 3),
+        original_sample_rate=original_rate,
+        original_channels=channels,
+    )
+    metrics.counter("audio_normalization_total", outcome="normalized").inc()
+    metrics.counter("audio_normalization_bytes_saved_total").inc(report.bytes_saved)
+    metrics.counter("audio_normalization_seconds_saved_total").inc(report.seconds_saved)
+    return normalized, report
@@ -0,0 +1,155 @@
+"""
+Audio Upload Spooling
+Streams uploaded audio into a size-limited buffer that stays in memory for short clips and spills to an anonymous temp file
+"""
+
+import asyncio
+import tempfile
+from typing import AsyncIterator, List, Optional
+
+from fastapi import HTTPException, Request
+from python_multipart.exceptions import FormParserError
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+from config.config import (
+    AUDIO_UPLOAD_MAX_BYTES,
+    AUDIO_SPOOL_MEMORY_BYTES,
+    AUDIO_MULTIPART_OVERHEAD_BYTES,
+    AUDIO_SPOOL_DIR,
+)
+from utils.metrics import metrics
+
+
+class UploadTooLarge(HTTPException):
+    def __init__(self, max_bytes: int):
+        super().__init__(status_code=413, detail=f"Audio upload exceeds the limit of {max_bytes} bytes")
+
+
+async def spool_chunks(
+    chunks: AsyncIterator[bytes],
+    max_bytes: int = AUDIO_UPLOAD_MAX_BYTES,
+    memory_bytes: int = AUDIO_SPOOL_MEMORY_BYTES,
+) -> tempfile.SpooledTemporaryFile:
+    """
+    Copy an async byte stream into a SpooledTemporaryFile, rewound and ready to read
+
+    The buffer is held in memory up to `memory_bytes` and then moves to an unnamed temp file, so
+    concurrent uploads never share a path and nothing is left behind once it is closed. Writes that
+    roll the buffer over or land on disk happen in a worker thread. Raises UploadTooLarge (413) as
+    soon as the stream passes `max_bytes`.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=memory_bytes, dir=AUDIO_SPOOL_DIR)
+    total = 0
+    try:
+        async for chunk in chunks:
+            total += len(chunk)
+            if total > max_bytes:
+                metrics.counter("audio_uploads_rejected_total", reason="too_large").inc()
+                raise UploadTooLarge(max_bytes)
+            # The spool rolls over once its size passes memory_bytes, so from that write on it is disk I/O
+            if total > memory_bytes:
+                await asyncio.to_thread(spool.write, chunk)
+            else:
+                spool.write(chunk)
+        spool.seek(0)
+    except BaseException:
+        spool.close()
+        raise
+    metrics.histogram("audio_upload_bytes").observe(total)
+    metrics.counter("audio_uploads_total", buffer="disk" if total > memory_bytes else "memory").inc()
+    return spool
+
+
+class _FilePartReader:
+    """MultipartParser callbacks that keep the data of one named form field and skip every other part"""
+
+    def __init__(self, field: str):
+        self.field = field.encode()
+        self.header_name = b""
+        self.header_value = b""
+        self.disposition = b""
+        self.in_field = False
+        self.found = False
+        self.data: List[bytes] = []
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_part_data": self.on_part_data,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+        }
+
+    def on_part_begin(self):
+        self.disposition = b""
+        self.in_field = False
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if self.in_field:
+            self.data.append(data[start:end])
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self.header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self.header_value += data[start:end]
+
+    def on_header_end(self):
+        if self.header_name.lower() == b"content-disposition":
+            self.disposition = self.header_value
+        self.header_name = b""
+        self.header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self.disposition)
+        # Only the first part with the field's name is read, as a form would
+        self.in_field = options.get(b"name") == self.field and not self.found
+        self.found = self.found or self.in_field
+
+
+async def _multipart_field_chunks(request: Request, field: str, max_bytes: int) -> AsyncIterator[bytes]:
+    """The bytes of one form field of a multipart request, yielded as the body arrives off the socket"""
+    _, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary: Optional[bytes] = params.get(b"boundary")
+    if not boundary:
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data upload")
+
+    max_body_bytes = max_bytes + AUDIO_MULTIPART_OVERHEAD_BYTES
+    reader = _FilePartReader(field)
+    parser = MultipartParser(boundary, reader.callbacks())
+    received = 0
+    try:
+        async for body in request.stream():
+            received += len(body)
+            # Other parts are not kept, but the body as a whole is still capped
+            if received > max_body_bytes:
+                metrics.counter("audio_uploads_rejected_total", reason="too_large").inc()
+                raise UploadTooLarge(max_bytes)
+            parser.write(body)
+            for chunk in reader.data:
+                yield chunk
+            reader.data.clear()
+        parser.finalize()
+    except FormParserError:
+        raise HTTPException(status_code=400, detail="Invalid multipart upload")
+    if not reader.found:
+        raise HTTPException(status_code=400, detail="No audio file provided")
+
+
+async def spool_request(
+    request: Request, field: str = "audio", max_bytes: int = AUDIO_UPLOAD_MAX_BYTES
+) -> tempfile.SpooledTemporaryFile:
+    """
+    Spool the file in a multipart request's `field` straight from the request stream
+
+    The body is parsed as it arrives instead of letting the framework buffer the whole form first,
+    so the audio is copied once and an oversized upload is cut off as soon as it passes the limit.
+    A declared Content-Length that is already over the limit is rejected before anything is read.
+    """
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > max_bytes + AUDIO_MULTIPART_OVERHEAD_BYTES:
+        metrics.counter("audio_uploads_rejected_total", reason="too_large").inc()
+        raise UploadTooLarge(max_bytes)
+    return await spool_chunks(_multipart_field_chunks(request, field, max_bytes), max_bytes)
@@ -0,0 +1,237 @@
+"""
+Past Case Index
+Embeds diagnosed voice-bot sessions and chats so new complaints can be matched to similar past cases
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import faiss
+import numpy as np
+
+from config.config import (
+    CASE_INDEX_MAX_CASES,
+    CASE_INDEX_COMPACT_THRESHOLD,
+    CASE_INDEX_MAINTENANCE_INTERVAL,
+    CASE_INDEX_MAX_CHARS,
+)
+from utils.concurrency import Priority, priority_scope
+from utils.local_embedder import get_embedding
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PastCase:
+    session_id: str
+    complaint: str
+    diagnosis: str
+    ended_at: float
+
+
+@dataclass
+class SimilarCase:
+    case: PastCase
+    similarity: float
+
+
+def case_text(user_messages: List[str]) -> str:
+    """The part of a session that describes the complaint: the user's own messages, capped in length"""
+    return " ".join(m.strip() for m in user_messages if m and m.strip())[:CASE_INDEX_MAX_CHARS]
+
+
+class CaseIndex:
+    """
+    Cosine index (IndexIDMap over IndexFlatIP) of past sessions' user messages.
+
+    Sessions are embedded on a single background worker in the BACKGROUND priority lane so they
+    never compete with live requests for the embedding server. Re-indexed or evicted cases are
+    only tombstoned at first; search skips them, and compaction removes them from the FAISS index
+    in one pass once enough have accumulated. The index holds at most `max_cases` live cases,
+    dropping the oldest first.
+    """
+
+    def __init__(self, max_cases: int = CASE_INDEX_MAX_CASES, compact_threshold: int = CASE_INDEX_COMPACT_THRESHOLD):
+        self.max_cases = max_cases
+        self.compact_threshold = compact_threshold
+        self.index: Optional[faiss.IndexIDMap] = None
+        self._cases: Dict[int, PastCase] = {}
+        self._id_by_session: Dict[str, int] = {}
+        self._tombstones: set = set()
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="case-index")
+        self._queued: Dict[str, tuple] = {}
+        self._seen_files: Dict[str, float] = {}
+        self._storage = None
+        self._maintenance_task: Optional[asyncio.Task] = None
+        self._size = metrics.gauge("case_index_cases")
+        self._tombstone_gauge = metrics.gauge("case_index_tombstones")
+
+    def __len__(self) -> int:
+        return len(self._cases)
+
+    def submit_session(self, session):
+        """Queue a completed ConversationSession for indexing; sessions without a diagnosis are skipped"""
+        if not session.diagnosis_result:
+            return
+        # Sessions saved by another process (the voice bot) are only on disk, not in this storage
+        user_messages = self._storage.get_user_messages(session.session_id) if self._storage else []
+        text = case_text(user_messages or [m.content for m in session.messages if m.role == "user"])
+        if not text:
+            return
+        ended_at = session.end_time.timestamp() if session.end_time else time.time()
+        self._queue(PastCase(session.session_id, text, session.diagnosis_result, ended_at))
+
+    def submit_case(self, user_messages: List[str], diagnosis: str, source: str):
+        """
+        Queue a diagnosed chat or audio upload for indexing. These cases live only in this in-memory
+        index; they are never written to ConversationStorage, whose sessions belong to the voice bot.
+        """
+        text = case_text(user_messages)
+        if text and diagnosis:
+            self._queue(PastCase(f"{source}:{uuid.uuid4().hex}", text, diagnosis, time.time()))
+
+    def _queue(self, case: PastCase):
+        key = (case.complaint, case.diagnosis)
+        # The session listener and the directory scan both see a newly saved session; embed it once
+        with self._lock:
+            existing = self._cases.get(self._id_by_session.get(case.session_id, -1))
+            if existing and (existing.complaint, existing.diagnosis) == key:
+                return
+            if self._queued.get(case.session_id) == key:
+                return
+            self._queued[case.session_id] = key
+        self._worker.submit(self._embed_and_add, case)
+
+    def _embed_and_add(self, case: PastCase):
+        try:
+            with priority_scope(Priority.BACKGROUND):
+                embedding = get_embedding(case.complaint)
+            if len(embedding):
+                self.add(case, embedding)
+        except Exception as e:
+            logger.warning(f"Could not embed case {case.session_id}: {e}")
+        finally:
+            with self._lock:
+                if self._queued.get(case.session_id) == (case.complaint, case.diagnosis):
+                    del self._queued[case.session_id]
+
+    def add(self, case: PastCase, embedding: List[float]):
+        vector = np.asarray([embedding], dtype="float32")
+        faiss.normalize_L2(vector)
+        with self._lock:
+            if self.index is None:
+                self.index = faiss.IndexIDMap(faiss.IndexFlatIP(vector.shape[1]))
+            previous = self._id_by_session.pop(case.session_id, None)
+            if previous is not None:
+                self._drop(previous)
+            while len(self._cases) >= self.max_cases:
+                oldest = min(self._cases, key=lambda case_id: self._cases[case_id].ended_at)
+                self._id_by_session.pop(self._cases[oldest].session_id, None)
+                self._drop(oldest)
+                metrics.counter("case_index_evictions_total").inc()
+
+            case_id = self._next_id
+            self._next_id += 1
+            self.index.add_with_ids(vector, np.asarray([case_id], dtype="int64"))
+            self._cases[case_id] = case
+            self._id_by_session[case.session_id] = case_id
+            if len(self._tombstones) >= self.compact_threshold:
+                self._compact()
+            self._publish()
+
+    def _drop(self, case_id: int):
+        self._cases.pop(case_id, None)
+        self._tombstones.add(case_id)
+
+    def _compact(self):
+        if not self._tombstones:
+            return
+        self.index.remove_ids(np.fromiter(self._tombstones, dtype="int64"))
+        self._tombstones.clear()
+        metrics.counter("case_index_compactions_total").inc()
+
+    def compact(self):
+        with self._lock:
+            if self.index is not None:
+                self._compact()
+            self._publish()
+
+    def search(self, embedding: List[float], k: int = 3) -> List[SimilarCase]:
+        """The k most similar live past cases, best first"""
+        if not len(embedding):
+            return []
+        vector = np.asarray([embedding], dtype="float32")
+        faiss.normalize_L2(vector)
+        with self._lock:
+            if self.index is None or not self._cases:
+                return []
+            # Over-fetch by the number of tombstones so dropped cases cannot crowd out live ones
+            similarities, ids = self.index.search(vector, min(k + len(self._tombstones), self.index.ntotal))
+            matches = [
+                SimilarCase(self._cases[int(case_id)], float(similarity))
+                for similarity, case_id in zip(similarities[0], ids[0])
+                if int(case_id) in self._cases
+            ]
+        return matches[:k]
+
+    def _publish(self):
+        self._size.set(len(self._cases))
+        self._tombstone_gauge.set(len(self._tombstones))
+
+    def ingest_directory(self, storage):
+        """Index session files written since the last scan, including ones saved by the voice bot process"""
+        try:
+            filenames = os.listdir(storage.storage_dir)
+        except OSError:
+            return
+        for filename in filenames:
+            if not filename.endswith(".json"):
+                continue
+            path = os.path.join(storage.storage_dir, filename)
+            try:
+                mtime = os.path.getmtime(path)
+                if self._seen_files.get(filename) == mtime:
+                    continue
+                self._seen_files[filename] = mtime
+                session = storage.load_session_file(path)
+            except Exception as e:
+                logger.warning(f"Skipping unreadable session file {filename}: {e}")
+                continue
+            if session.end_time:
+                self.submit_session(session)
+
+    async def start(self, storage):
+        """Index existing sessions and keep the index in sync and compacted in the background"""
+        if self._maintenance_task:
+            return
+        self._storage = storage
+        storage.add_session_listener(self.submit_session)
+        self._maintenance_task = asyncio.create_task(self._maintain(storage))
+
+    async def stop(self):
+        if self._maintenance_task:
+            self._maintenance_task.cancel()
+            try:
+                await self._maintenance_task
+            except asyncio.CancelledError:
+                pass
+            self._maintenance_task = None
+
+    async def _maintain(self, storage):
+        while True:
+            await asyncio.to_thread(self.ingest_directory, storage)
+            await asyncio.to_thread(self.compact)
+            await asyncio.sleep(CASE_INDEX_MAINTENANCE_INTERVAL)
+
+
+case_index = CaseIndex()
@@ -0,0 +1,193 @@
+"""
+Chat Session State
+Per-connection memory of a multi-turn chat so follow-up turns only process what they add
+"""
+
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+from config.config import (
+    RRF_SOURCE_WEIGHTS,
+    CHAT_SESSION_MAX_TURNS,
+    CHAT_SESSION_MAX_LISTS,
+    CHAT_SESSION_MAX_SYMPTOMS,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ChatSession:
+    """
+    What a /ws/chat connection has established so far: the user's turns, the symptoms extracted
+    from them, and every ranked result list fetched for those symptoms.
+
+    Ranked lists are kept per source and turn ("vector", "web", "vector:2", ...) and fused together
+    on every turn, so a follow-up only has to search for the symptoms it newly mentions. Web searches
+    started by a follow-up may finish after that turn's answer; they are kept pending and merged
+    into the rankings on the next turn.
+
+    Searches can also be run speculatively on a partial transcript before the turn itself arrives.
+    The symptoms and lists they add stay provisional until the turn is processed; provisional symptoms
+    the final text does not mention are dropped together with the provisional lists searched only for
+    them. Symptoms and lists from earlier turns are never dropped this way.
+
+    Symptoms the user denies ("no fever") are remembered until they are reported after all, so the
+    conditions they rule out can be filtered from retrieval for the rest of the complaint.
+
+    Only the newest `max_lists` ranked lists and `max_symptoms` symptoms are kept, so a long-lived
+    connection cannot grow its session without bound.
+    """
+
+    def __init__(
+        self,
+        max_turns: int = CHAT_SESSION_MAX_TURNS,
+        max_lists: int = CHAT_SESSION_MAX_LISTS,
+        max_symptoms: int = CHAT_SESSION_MAX_SYMPTOMS,
+    ):
+        self.max_turns = max_turns
+        self.max_lists = max_lists
+        self.max_symptoms = max_symptoms
+        self.turns: List[str] = []
+        self.turn_count = 0
+        self.symptoms: List[str] = []
+        self.denied: List[str] = []
+        self.searched: set = set()
+        self.rankings: Dict[str, List[Dict]] = {}
+        self.pending_web: Dict[str, asyncio.Task] = {}
+        self.list_symptoms: Dict[str, List[str]] = {}
+        self.list_count = 0
+        self.speculating = False
+        self.provisional_symptoms: set = set()
+        self.provisional_lists: set = set()
+        self.health_related = False
+        self.off_topic_turns = 0
+        self.diagnosis: Optional[str] = None
+
+    def add_turn(self, text: str):
+        self.turns.append(text.strip())
+        self.turn_count += 1
+        del self.turns[:-self.max_turns]
+
+    def context_text(self) -> str:
+        """The conversation so far as a single complaint, oldest turn first"""
+        return " ".join(self.turns)
+
+    @property
+    def has_results(self) -> bool:
+        return bool(self.rankings) or bool(self.pending_web)
+
+    def add_symptoms(self, symptoms: List[str]) -> List[str]:
+        """Remember symptoms and return those not yet searched for, in order"""
+        for symptom in symptoms:
+            if symptom not in self.symptoms:
+                self.symptoms.append(symptom)
+                if self.speculating:
+                    self.provisional_symptoms.add(symptom)
+        del self.symptoms[:-self.max_symptoms]
+        self.denied = [s for s in self.denied if s not in self.symptoms]
+        self.searched.intersection_update(self.symptoms)
+        return [s for s in self.symptoms if s not in self.searched]
+
+    def deny(self, symptoms: List[str]):
+        """Remember symptoms the user said they do not have"""
+        for symptom in symptoms:
+            if symptom not in self.denied:
+                self.denied.append(symptom)
+        del self.denied[:-self.max_symptoms]
+
+    def _list_key(self, source: str, symptoms: List[str]) -> str:
+        self.list_count += 1
+        taken = source in self.rankings or source in self.pending_web
+        key = f"{source}:{self.list_count}" if taken else source
+        self.list_symptoms[key] = list(symptoms)
+        if self.speculating:
+            self.provisional_lists.add(key)
+        return key
+
+    def record(self, source: str, results: List[Dict], symptoms: List[str]):
+        """Store a ranked list under `source`, suffixed with a sequence number if that name is taken"""
+        self.searched.update(symptoms)
+        if results:
+            self.rankings[self._list_key(source, symptoms)] = results
+            self._trim_lists()
+
+    def defer_web_search(self, task: asyncio.Task, symptoms: List[str]):
+        self.pending_web[self._list_key("web", symptoms)] = task
+        self._trim_lists()
+
+    def _trim_lists(self):
+        """Drop the oldest stored lists beyond `max_lists`; pending web searches count but are never dropped"""
+        excess = len(self.rankings) + len(self.pending_web) - self.max_lists
+        for key in list(self.rankings)[:max(excess, 0)]:
+            del self.rankings[key]
+        for key in list(self.list_symptoms):
+            if key not in self.rankings and key not in self.pending_web:
+                del self.list_symptoms[key]
+
+    def settle_provisional(self, symptoms: List[str]):
+        """
+        Resolve speculation against the symptoms of the turn it anticipated: provisional symptoms not in
+        `symptoms` are forgotten with the provisional lists searched only for them, the rest are kept
+        """
+        dropped = self.provisional_symptoms.difference(symptoms)
+        if dropped:
+            self.symptoms = [s for s in self.symptoms if s not in dropped]
+            self.searched -= dropped
+            for key in self.provisional_lists:
+                searched_for = self.list_symptoms.get(key)
+                if searched_for and dropped.issuperset(searched_for):
+                    self.rankings.pop(key, None)
+                    task = self.pending_web.pop(key, None)
+                    if task is not None:
+                        task.cancel()
+                    del self.list_symptoms[key]
+        self.provisional_symptoms.clear()
+        self.provisional_lists.clear()
+
+    def harvest_web(self) -> List[str]:
+        """Move finished background web searches into the rankings; returns the sources added"""
+        added = []
+        for key, task in list(self.pending_web.items()):
+            if not task.done():
+                continue
+            del self.pending_web[key]
+            if task.cancelled():
+                continue
+            if task.exception() is not None:
+                logger.warning(f"Deferred web search {key} failed: {task.exception()}")
+                continue
+            if task.result():
+                self.rankings[key] = task.result()
+                added.append(key)
+        self._trim_lists()
+        return added
+
+    def weights(self) -> Dict[str, float]:
+        """RRF weight of every stored list, taken from its source type"""
+        return {key: RRF_SOURCE_WEIGHTS.get(key.split(":")[0], 1.0) for key in self.rankings}
+
+    def web_results(self) -> List[Dict]:
+        return [r for key, results in self.rankings.items() if key.startswith("web") for r in results]
+
+    def reset(self):
+        """Forget the complaint so far, for an unrelated turn or a change of topic"""
+        self.close()
+        self.turns.clear()
+        self.symptoms.clear()
+        self.denied.clear()
+        self.searched.clear()
+        self.rankings.clear()
+        self.list_symptoms.clear()
+        self.speculating = False
+        self.provisional_symptoms.clear()
+        self.provisional_lists.clear()
+        self.health_related = False
+        self.off_topic_turns = 0
+        self.diagnosis = None
+
+    def close(self):
+        for task in self.pending_web.values():
+            task.cancel()
+        self.pending_web.clear()
+
@@ -0,0 +1,250 @@
+"""
+Dependency Concurrency Limits
+Adaptive (AIMD) per-dependency concurrency limiters with priority lanes, bounded wait queues and load shedding
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Dict, List, Optional, Tuple
+
+from config.config import DEPENDENCY_LIMITS, BACKGROUND_CAPACITY_SHARE
+from utils.deadline import current_deadline
+from utils.metrics import metrics
+
+
+class DependencyBusy(Exception):
+    """Raised when a dependency's wait queue is full or the wait timed out"""
+
+    def __init__(self, dependency: str, retry_after: int = 1):
+        super().__init__(f"{dependency} is busy, please retry shortly")
+        self.dependency = dependency
+        self.retry_after = retry_after
+
+
+def is_rate_limited(exc: BaseException) -> bool:
+    """Best-effort detection of provider 429 / quota errors across client libraries"""
+    for status in (
+        getattr(exc, "status_code", None),
+        getattr(exc, "code", None),
+        getattr(getattr(exc, "response", None), "status_code", None),
+    ):
+        if status == 429:
+            return True
+    return type(exc).__name__ in ("ResourceExhausted", "RateLimitError", "TooManyRequests") or "429" in str(exc)
+
+
+class Priority(IntEnum):
+    """Scheduling lanes for shared dependencies; lower values are served first"""
+    INTERACTIVE = 0
+    DEMO = 1
+    BACKGROUND = 2
+
+
+current_priority: ContextVar[Priority] = ContextVar("current_priority", default=Priority.INTERACTIVE)
+
+
+@contextmanager
+def priority_scope(priority: Priority):
+    """Run the enclosed block (and threads it spawns via to_thread/executors) in a priority lane"""
+    token = current_priority.set(priority)
+    try:
+        yield
+    finally:
+        current_priority.reset(token)
+
+
+class _Waiter:
+    __slots__ = ("priority", "granted", "preempted")
+
+    def __init__(self, priority: Priority):
+        self.priority = priority
+        self.granted = False
+        self.preempted = False
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limiter whose limit follows AIMD: it grows by roughly one slot per
+    limit's worth of fast successes and is cut multiplicatively on 429s or slow calls.
+    Callers beyond the limit wait in a bounded queue; when the queue is full they are
+    shed immediately with DependencyBusy instead of piling up behind the provider.
+
+    Waiters are served in priority order. Background callers may only use a share of
+    the limit, and when the queue is full a higher-priority caller preempts the newest
+    lower-priority waiter rather than being shed itself. Preemption only applies to
+    queued work: a call that already holds a slot keeps it until it finishes, so the
+    background share is what bounds how much capacity running background work can take.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial_limit: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 16,
+        max_queue: int = 32,
+        queue_timeout: float = 10.0,
+        latency_target: float = 5.0,
+        backoff: float = 0.5,
+        background_share: float = BACKGROUND_CAPACITY_SHARE,
+    ):
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.background_share = background_share
+        self.limit = float(min(max(initial_limit, min_limit), max_limit))
+        self.inflight = 0
+        self._waiters: List[Tuple[int, int, _Waiter]] = []
+        self._sequence = itertools.count()
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+        self._limit_gauge = metrics.gauge("dependency_concurrency_limit", dependency=name)
+        self._inflight_gauge = metrics.gauge("dependency_inflight", dependency=name)
+        self._queue_gauge = metrics.gauge("dependency_queue_depth", dependency=name)
+        self._queue_limit_gauge = metrics.gauge("dependency_queue_limit", dependency=name)
+        self._shed = metrics.counter("dependency_shed_total", dependency=name)
+        self._preempted = metrics.counter("dependency_preempted_total", dependency=name)
+        self._rate_limited = metrics.counter("dependency_rate_limited_total", dependency=name)
+        self.latency = metrics.histogram("dependency_latency_seconds", dependency=name)
+        self._queue_limit_gauge.set(max_queue)
+        self._publish()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    @contextmanager
+    def acquire(self, priority: Optional[Priority] = None):
+        """Hold one concurrency slot for the duration of the block"""
+        priority = current_priority.get() if priority is None else priority
+        self._enter(priority)
+        started = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            self._exit(time.monotonic() - started, rate_limited=is_rate_limited(e))
+            raise
+        else:
+            self._exit(time.monotonic() - started, rate_limited=False)
+
+    def _capacity(self, priority: Priority) -> int:
+        if priority >= Priority.BACKGROUND:
+            return max(1, int(self.limit * self.background_share))
+        return int(self.limit)
+
+    def _enter(self, priority: Priority):
+        queued_at = time.monotonic()
+        with self._cond:
+            ahead = self._waiters and self._waiters[0][0] <= priority
+            if not ahead and self.inflight < self._capacity(priority):
+                self.inflight += 1
+                self._publish()
+                return
+
+            if len(self._waiters) >= self.max_queue and not self._preempt_below(priority):
+                self._shed.inc()
+                raise DependencyBusy(self.name)
+
+            waiter = _Waiter(priority)
+            entry = (int(priority), next(self._sequence), waiter)
+            heapq.heappush(self._waiters, entry)
+            self._publish()
+            wait_budget = self.queue_timeout
+            request_deadline = current_deadline.get()
+            if request_deadline is not None:
+                wait_budget = min(wait_budget, request_deadline.remaining())
+            deadline = queued_at + wait_budget
+            while not waiter.granted:
+                if waiter.preempted:
+                    raise DependencyBusy(self.name)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+                    self._shed.inc()
+                    self._publish()
+                    raise DependencyBusy(self.name)
+                self._cond.wait(remaining)
+
+        metrics.histogram(
+            "dependency_queue_wait_seconds", dependency=self.name, priority=priority.name.lower()
+        ).observe(time.monotonic() - queued_at)
+
+    def _preempt_below(self, priority: Priority) -> bool:
+        """Evict the newest queued waiter with a lower priority than the caller, if any; running calls are not interrupted"""
+        if not self._waiters:
+            return False
+        victim = max(self._waiters, key=lambda entry: (entry[0], entry[1]))
+        if victim[0] <= priority:
+            return False
+        self._waiters.remove(victim)
+        heapq.heapify(self._waiters)
+        victim[2].preempted = True
+        self._preempted.inc()
+        self._publish()
+        self._cond.notify_all()
+        return True
+
+    def _dispatch(self):
+        """Hand free slots to queued waiters in priority order"""
+        granted = False
+        while self._waiters:
+            priority, _, waiter = self._waiters[0]
+            if self.inflight >= self._capacity(Priority(priority)):
+                break
+            heapq.heappop(self._waiters)
+            waiter.granted = True
+            self.inflight += 1
+            granted = True
+        if granted:
+            self._cond.notify_all()
+
+    def _exit(self, elapsed: float, rate_limited: bool):
+        self.latency.observe(elapsed)
+        with self._cond:
+            self.inflight -= 1
+            now = time.monotonic()
+            if rate_limited:
+                self._rate_limited.inc()
+                self._decrease(now)
+            elif elapsed > self.latency_target:
+                self._decrease(now)
+            else:
+                self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+            self._dispatch()
+            self._publish()
+
+    def _decrease(self, now: float):
+        # Cut at most once per latency target so a burst of slow responses counts once
+        if now - self._last_decrease < self.latency_target:
+            return
+        self._last_decrease = now
+        self.limit = max(float(self.min_limit), self.limit * self.backoff)
+
+    def _publish(self):
+        self._limit_gauge.set(int(self.limit))
+        self._inflight_gauge.set(self.inflight)
+        self._queue_gauge.set(self.waiting)
+
+
+dependency_limiters: Dict[str, AdaptiveLimiter] = {
+    name: AdaptiveLimiter(name, **settings) for name, settings in DEPENDENCY_LIMITS.items()
+}
+
+
+def get_limiter(dependency: str) -> AdaptiveLimiter:
+    """Get the shared limiter for a dependency, creating a default one if unconfigured"""
+    limiter = dependency_limiters.get(dependency)
+    if limiter is None:
+        limiter = dependency_limiters.setdefault(dependency, AdaptiveLimiter(dependency))
+    return limiter
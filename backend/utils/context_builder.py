@@ -0,0 +1,133 @@
+"""
+Prompt Context Builder
+Deduplicates, truncates and packs ranked reference snippets into a per-agent token budget
+"""
+
+import logging
+import math
+import re
+from dataclasses import dataclass, field
+from typing import List
+
+from config.config import CONTEXT_BUDGETS, CHARS_PER_TOKEN
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# A truncated snippet shorter than this is not worth the separator it costs
+MIN_SNIPPET_TOKENS = 24
+
+_WHITESPACE = re.compile(r"\s+")
+_NON_WORD = re.compile(r"[^a-z0-9 ]+")
+_SENTENCE_END = re.compile(r"[.!?](?=\s)")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English with Gemini/SentencePiece tokenizers)"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to roughly max_tokens, preferring a sentence boundary and then a word boundary"""
+    max_chars = int(max_tokens * CHARS_PER_TOKEN)
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    sentence_ends = [m.end() for m in _SENTENCE_END.finditer(cut + " ")]
+    if sentence_ends and sentence_ends[-1] >= max_chars // 2:
+        return cut[:sentence_ends[-1]].rstrip()
+    space = cut.rfind(" ")
+    if space >= max_chars // 2:
+        cut = cut[:space]
+    return cut.rstrip(" ,;:") + "..."
+
+
+def _fingerprint(text: str) -> str:
+    return _WHITESPACE.sub(" ", _NON_WORD.sub(" ", text.lower())).strip()
+
+
+@dataclass
+class PackedContext:
+    text: str
+    tokens: int
+    included: int
+    truncated: int
+    duplicates: int
+    dropped: int
+    sections: List[str] = field(default_factory=list)
+
+
+class ContextBuilder:
+    """
+    Packs snippets in the order given (highest ranked first) until the token budget is spent.
+
+    Snippets whose normalized text repeats or is contained in an already packed snippet are
+    skipped, each snippet is capped at `per_source` tokens, and the last one that does not
+    fit whole is truncated into the space that is left.
+    """
+
+    def __init__(self, agent: str, budget: int, per_source: int, separator: str = "\n\n"):
+        self.agent = agent
+        self.budget = budget
+        self.per_source = per_source
+        self.separator = separator
+        self._separator_tokens = estimate_tokens(separator)
+
+    def build(self, snippets: List[str]) -> PackedContext:
+        sections: List[str] = []
+        fingerprints: List[str] = []
+        used = truncated = duplicates = dropped = 0
+
+        for snippet in snippets:
+            snippet = snippet.strip()
+            if not snippet:
+                continue
+            fingerprint = _fingerprint(snippet)
+            if any(fingerprint in seen for seen in fingerprints):
+                duplicates += 1
+                continue
+
+            cost = self._separator_tokens if sections else 0
+            available = min(self.per_source, self.budget - used - cost)
+            if available < MIN_SNIPPET_TOKENS and estimate_tokens(snippet) > available:
+                dropped += 1
+                continue
+            if estimate_tokens(snippet) > available:
+                snippet = truncate_to_tokens(snippet, available)
+                truncated += 1
+
+            sections.append(snippet)
+            fingerprints.append(fingerprint)
+            used += cost + estimate_tokens(snippet)
+
+        return PackedContext(
+            text=self.separator.join(sections),
+            tokens=used,
+            included=len(sections),
+            truncated=truncated,
+            duplicates=duplicates,
+            dropped=dropped,
+            sections=sections,
+        )
+
+
+def get_context_builder(agent: str) -> ContextBuilder:
+    settings = CONTEXT_BUDGETS.get(agent, CONTEXT_BUDGETS["diagnosis"])
+    return ContextBuilder(agent, settings["budget"], settings["per_source"])
+
+
+def report_prompt_size(agent: str, prompt: str, context: PackedContext):
+    """Record the size of a prompt and of the reference context packed into it"""
+    prompt_tokens = estimate_tokens(prompt)
+    metrics.histogram("llm_prompt_tokens", agent=agent).observe(prompt_tokens)
+    metrics.histogram("llm_context_tokens", agent=agent).observe(context.tokens)
+    if context.truncated:
+        metrics.counter("context_snippets_truncated_total", agent=agent).inc(context.truncated)
+    if context.duplicates:
+        metrics.counter("context_snippets_deduplicated_total", agent=agent).inc(context.duplicates)
+    if context.dropped:
+        metrics.counter("context_snippets_dropped_total", agent=agent).inc(context.dropped)
+    logger.info(
+        f"{agent} prompt ~{prompt_tokens} tokens (context {context.tokens}: {context.included} included, "
+        f"{context.truncated} truncated, {context.duplicates} duplicates, {context.dropped} dropped)"
+    )
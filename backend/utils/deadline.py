@@ -0,0 +1,87 @@
+"""
+Request Deadlines
+Per-request time budgets that pipeline stages slice up, with a record of the degradations applied
+"""
+
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Iterator, List, Optional
+
+from config.config import PIPELINE_BUDGETS
+from utils.metrics import metrics
+
+current_deadline: ContextVar[Optional["Deadline"]] = ContextVar("current_deadline", default=None)
+
+
+class Deadline:
+    def __init__(self, budget: float, product: str = "default"):
+        self.budget = budget
+        self.product = product
+        self.started_at = time.monotonic()
+        self.expires_at = self.started_at + budget
+        self.degradations: List[str] = []
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    def stage_timeout(self, reserve: float = 0.0) -> float:
+        """
+        Time the current stage may use
+
+        Args:
+            reserve: Fraction of the total budget to keep back for later stages
+
+        Returns:
+            Seconds available to the stage, never negative
+        """
+        return max(0.0, self.remaining() - self.budget * reserve)
+
+    async def run(self, awaitable: Awaitable, reserve: float = 0.0):
+        """Await a stage within its slice of the budget, raising asyncio.TimeoutError on overrun"""
+        timeout = self.stage_timeout(reserve)
+        if timeout <= 0:
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            elif isinstance(awaitable, asyncio.Future):
+                awaitable.cancel()
+            raise asyncio.TimeoutError()
+        return await asyncio.wait_for(awaitable, timeout)
+
+    def degrade(self, degradation: str):
+        """Record that a stage was skipped or replaced to stay within the budget"""
+        self.degradations.append(degradation)
+        metrics.counter("pipeline_degradations_total", product=self.product, degradation=degradation).inc()
+
+    def finish(self):
+        metrics.histogram("pipeline_latency_seconds", product=self.product).observe(self.elapsed())
+
+
+@contextmanager
+def start_deadline(product: str) -> Iterator[Deadline]:
+    """
+    Run the enclosed block under a deadline with the product's configured budget
+
+    The deadline is current only inside the block, so later turns on the same connection and tasks
+    started after it do not inherit an expired budget. Its latency is recorded on exit.
+    """
+    deadline = Deadline(PIPELINE_BUDGETS.get(product, PIPELINE_BUDGETS["default"]), product)
+    token = current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        current_deadline.reset(token)
+        deadline.finish()
+
+
+async def run_with_deadline(awaitable: Awaitable, deadline: Deadline):
+    """
+    Await `awaitable` with `deadline` current; meant to be the body of its own task (background or
+    speculative work), whose copied context keeps the deadline from reaching the caller
+    """
+    current_deadline.set(deadline)
+    return await awaitable
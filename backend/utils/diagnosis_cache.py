@@ -0,0 +1,105 @@
+"""
+Diagnosis Cache
+Stores diagnoses under a canonical signature of the symptom set and the top fused conditions
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from config.config import DIAGNOSIS_CACHE_ENABLED, DIAGNOSIS_CACHE_TTL, DIAGNOSIS_CACHE_MAX_ENTRIES
+from utils.faiss_index import KNOWLEDGE_BASE_VERSION
+from utils.metrics import metrics
+from utils.rrf_ranking import normalize_name
+from utils.symptom_extractor import extract_symptoms
+from utils.symptom_vocabulary import normalize_text
+
+
+def diagnosis_signature(symptoms: List[str], structured_results: List[Dict[str, Any]]) -> Optional[str]:
+    """
+    Canonical key for a diagnosis request
+
+    Symptoms are mapped through the symptom extractor (so "tired" and "fatigue" agree), falling
+    back to normalized text for terms outside the vocabulary, then sorted. Conditions are identified
+    by knowledge-base Code or normalized name, also sorted. Returns None when there are no symptoms.
+    """
+    canonical = set()
+    for symptom in symptoms:
+        extracted = extract_symptoms(symptom).symptoms
+        canonical.update(extracted or [normalize_text(symptom)])
+    canonical.discard("")
+    if not canonical:
+        return None
+    conditions = sorted(
+        str(r["Code"]) if r.get("Code") is not None else normalize_name(str(r.get("Name", "")))
+        for r in structured_results
+    )
+    payload = json.dumps({"symptoms": sorted(canonical), "conditions": conditions})
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+class _Entry:
+    __slots__ = ("diagnosis", "created_at", "version")
+
+    def __init__(self, diagnosis: str, created_at: float, version: str):
+        self.diagnosis = diagnosis
+        self.created_at = created_at
+        self.version = version
+
+
+class DiagnosisCache:
+    """
+    LRU map from signature to diagnosis text with a TTL. Entries are tagged with the knowledge
+    base version they were produced from and never served across versions. Expired entries stay
+    until evicted so they can still stand in when the diagnosis LLM is out of time.
+    """
+
+    def __init__(self, ttl: float = DIAGNOSIS_CACHE_TTL, max_entries: int = DIAGNOSIS_CACHE_MAX_ENTRIES,
+                 version: str = KNOWLEDGE_BASE_VERSION):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.version = version
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._size = metrics.gauge("diagnosis_cache_entries")
+
+    def get(self, signature: Optional[str], allow_stale: bool = False) -> Optional[str]:
+        if signature is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(signature)
+            if entry is not None and entry.version != self.version:
+                del self._entries[signature]
+                entry = None
+            fresh = entry is not None and time.monotonic() - entry.created_at <= self.ttl
+            if entry is None or not (fresh or allow_stale):
+                metrics.counter("diagnosis_cache_misses_total").inc()
+                return None
+            self._entries.move_to_end(signature)
+        metrics.counter("diagnosis_cache_hits_total", stale=str(not fresh).lower()).inc()
+        return entry.diagnosis
+
+    def put(self, signature: Optional[str], diagnosis: str):
+        if signature is None:
+            return
+        with self._lock:
+            self._entries[signature] = _Entry(diagnosis, time.monotonic(), self.version)
+            self._entries.move_to_end(signature)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                metrics.counter("diagnosis_cache_evictions_total").inc()
+            self._size.set(len(self._entries))
+
+    def set_version(self, version: str):
+        """Switch to a new knowledge base version, dropping every entry made from the old one"""
+        with self._lock:
+            if version != self.version:
+                self.version = version
+                self._entries.clear()
+                self._size.set(0)
+
+
+diagnosis_cache = DiagnosisCache() if DIAGNOSIS_CACHE_ENABLED else None
@@ -1,7 +1,13 @@
 import faiss
+import hashlib
 import pandas as pd
 import numpy as np
 import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, FrozenSet, Optional
+
+from config.config import DISABLED_CONDITIONS, FILTER_CATEGORY_COLUMN, FILTER_URGENT_COLUMN
 
 VSTORE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../vectorstore"))
 
@@ -12,10 +18,107 @@ faiss_index = faiss.read_index(INDEX_PATH)
 
 metadata_df = pd.read_csv(META_PATH)
 
-def search_faiss(query_vector: list[float], k: int = 2):
-    """Search the FAISS index and return metadata rows as dicts."""
-    query_vector = np.array([query_vector]).astype("float32")
-    _, indices = faiss_index.search(query_vector, k)
-    return metadata_df.iloc[indices[0]].to_dict(orient="records")
 
+def _knowledge_base_version() -> str:
+    digest = hashlib.sha256()
+    for path in (INDEX_PATH, META_PATH):
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+# Content hash of the loaded index and metadata; caches of derived answers are tagged with it
+KNOWLEDGE_BASE_VERSION = _knowledge_base_version()
+
+
+@dataclass(frozen=True)
+class RetrievalFilter:
+    """Restrictions applied inside the FAISS search; codes refer to the metadata Code column"""
+    exclude_codes: FrozenSet[int] = frozenset()
+    urgent_only: bool = False
+    category: Optional[str] = None
+
+
+TRUE_FLAGS = {"true", "t", "yes", "y", "1", "1.0"}
+
+
+def _flag_column(column: pd.Series) -> np.ndarray:
+    """Read a yes/no metadata column: booleans as is, and only true/yes/1 (any case) as True for text or numbers"""
+    if column.dtype == bool:
+        return column.to_numpy()
+    return column.fillna("").astype(str).str.strip().str.lower().isin(TRUE_FLAGS).to_numpy()
+
+
+class FilterBitmaps:
+    """
+    Row bitmaps precomputed from the metadata, combined per query into a FAISS IDSelectorBitmap.
+    FAISS ids are metadata row positions, so bit i allows row i.
+    """
+
+    def __init__(self, metadata: pd.DataFrame, disabled: set):
+        n_rows = len(metadata)
+        self.row_by_code = {code: i for i, code in enumerate(metadata["Code"])}
+        self.enabled = ~(metadata["Code"].isin(disabled) | metadata["Name"].isin(disabled)).to_numpy()
 
+        self.urgent = None
+        if FILTER_URGENT_COLUMN in metadata.columns:
+            self.urgent = _flag_column(metadata[FILTER_URGENT_COLUMN])
+
+        self.categories: Dict[str, np.ndarray] = {}
+        self.has_categories = FILTER_CATEGORY_COLUMN in metadata.columns
+        if self.has_categories:
+            values = metadata[FILTER_CATEGORY_COLUMN].fillna("").astype(str).str.strip().str.lower()
+            self.categories = {value: (values == value).to_numpy() for value in values.unique() if value}
+
+        self.n_rows = n_rows
+        self.default_params = self._params(self.enabled) if not self.enabled.all() else None
+
+    def mask(self, retrieval_filter: RetrievalFilter) -> np.ndarray:
+        """Rows the filter allows; raises ValueError if it needs a metadata column the knowledge base lacks"""
+        mask = self.enabled.copy()
+        if retrieval_filter.urgent_only:
+            if self.urgent is None:
+                raise ValueError(f"urgent_only filter needs a '{FILTER_URGENT_COLUMN}' column in {META_PATH}")
+            mask &= self.urgent
+        if retrieval_filter.category is not None:
+            if not self.has_categories:
+                raise ValueError(f"category filter needs a '{FILTER_CATEGORY_COLUMN}' column in {META_PATH}")
+            category = self.categories.get(retrieval_filter.category.strip().lower())
+            mask &= category if category is not None else False
+        for code in retrieval_filter.exclude_codes:
+            row = self.row_by_code.get(code)
+            if row is not None:
+                mask[row] = False
+        return mask
+
+    def _params(self, mask: np.ndarray) -> faiss.SearchParameters:
+        packed = np.packbits(mask, bitorder="little")
+        params = faiss.SearchParameters(sel=faiss.IDSelectorBitmap(self.n_rows, faiss.swig_ptr(packed)))
+        # The selector only holds a pointer; keep the bits alive as long as the parameters
+        params.bitmap = packed
+        return params
+
+    def search_params(self, retrieval_filter: Optional[RetrievalFilter]) -> Optional[faiss.SearchParameters]:
+        if retrieval_filter is None or retrieval_filter == RetrievalFilter():
+            return self.default_params
+        return _cached_params(self, retrieval_filter)
+
+
+@lru_cache(maxsize=256)
+def _cached_params(bitmaps: FilterBitmaps, retrieval_filter: RetrievalFilter) -> faiss.SearchParameters:
+    return bitmaps._params(bitmaps.mask(retrieval_filter))
+
+
+filter_bitmaps = FilterBitmaps(metadata_df, DISABLED_CONDITIONS)
+
+
+def search_faiss(query_vector: list[float], k: int = 2, retrieval_filter: Optional[RetrievalFilter] = None):
+    """Search the FAISS index and return metadata rows as dicts, honouring disabled conditions and the filter."""
+    if len(query_vector) == 0:
+        return []
+    query_vector = np.array([query_vector]).astype("float32")
+    params = filter_bitmaps.search_params(retrieval_filter)
+    _, indices = faiss_index.search(query_vector, k, params=params)
+    # FAISS pads with -1 when fewer than k rows pass the filter
+    rows = [i for i in indices[0] if i >= 0]
+    return metadata_df.iloc[rows].to_dict(orient="records")
@@ -0,0 +1,91 @@
+"""
+Fast-Path Input Classifier
+Decides clearly relevant and clearly irrelevant inputs locally so only ambiguous ones reach the LLM classifier
+"""
+
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+import faiss
+import numpy as np
+
+from config.config import (
+    FASTPATH_CENTROIDS,
+    FASTPATH_RELEVANT_SIMILARITY,
+    FASTPATH_STRONG_SIMILARITY,
+    FASTPATH_IRRELEVANT_SIMILARITY,
+    FASTPATH_MIN_TERMS,
+)
+from utils.faiss_index import faiss_index
+from utils.metrics import metrics
+from utils.symptom_extractor import lexicon_matches
+
+
+@dataclass
+class FastDecision:
+    decision: Optional[str]
+    similarity: Optional[float]
+    terms: List[str] = field(default_factory=list)
+    negated: List[str] = field(default_factory=list)
+
+
+def build_centroids(index: faiss.Index, k: int) -> np.ndarray:
+    """Cluster the knowledge-base condition embeddings into k unit-length centroids"""
+    vectors = index.reconstruct_n(0, index.ntotal).astype("float32")
+    faiss.normalize_L2(vectors)
+    k = max(1, min(k, index.ntotal // 39))  # faiss wants ~39 training points per centroid
+    kmeans = faiss.Kmeans(vectors.shape[1], k, niter=20, seed=1234, spherical=True, verbose=False)
+    kmeans.train(vectors)
+    centroids = kmeans.centroids.copy()
+    faiss.normalize_L2(centroids)
+    return centroids
+
+
+class FastPathClassifier:
+    """
+    Nearest-centroid similarity plus symptom lexicon.
+
+    An input is "Relevant" when it names enough symptom terms, when it names one and sits close
+    to a condition centroid, or when it sits very close to one. Negated symptoms ("no fever, no
+    cough") are not evidence of a complaint, but they do keep an input from being "Not Relevant",
+    which needs no symptom or health term at all and distance from every centroid. Otherwise the decision is None and
+    the caller asks the LLM, which is also the only path that can ask follow-up questions.
+    """
+
+    def __init__(self, index: faiss.Index = faiss_index, k: int = FASTPATH_CENTROIDS):
+        self.centroids = build_centroids(index, k)
+
+    def similarity(self, embedding: List[float]) -> Optional[float]:
+        if not embedding:
+            return None
+        vector = np.asarray(embedding, dtype="float32")
+        norm = np.linalg.norm(vector)
+        if norm == 0 or vector.shape[0] != self.centroids.shape[1]:
+            return None
+        return float((self.centroids @ (vector / norm)).max())
+
+    def classify(self, text: str, embed: Optional[Callable[[str], List[float]]] = None) -> FastDecision:
+        """
+        Classify text locally
+
+        Args:
+            text: The user input
+            embed: Embedding function, only called when the lexicon alone does not decide
+
+        Returns:
+            FastDecision whose decision is "Relevant", "Not Relevant" or None (ask the LLM)
+        """
+        terms, negated = lexicon_matches(text)
+        similarity = None
+
+        decision = None
+        if len(terms) >= FASTPATH_MIN_TERMS:
+            decision = "Relevant"
+        elif embed is not None and (similarity := self.similarity(embed(text))) is not None:
+            if similarity >= FASTPATH_STRONG_SIMILARITY or (terms and similarity >= FASTPATH_RELEVANT_SIMILARITY):
+                decision = "Relevant"
+            elif not terms and not negated and similarity <= FASTPATH_IRRELEVANT_SIMILARITY:
+                decision = "Not Relevant"
+
+        metrics.counter("classifier_fastpath_total", decision=decision or "deferred").inc()
+        return FastDecision(decision=decision, similarity=similarity, terms=terms, negated=negated)
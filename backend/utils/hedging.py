@@ -0,0 +1,106 @@
+"""
+Request Hedging
+Fires a backup copy of a slow idempotent call once it passes the dependency's observed p95 latency
+"""
+
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict
+
+from config.config import (
+    HEDGED_DEPENDENCIES,
+    HEDGE_BUDGET_RATIO,
+    HEDGE_MAX_TOKENS,
+    HEDGE_MIN_DELAY,
+    HEDGE_MIN_SAMPLES,
+    HEDGE_WORKERS,
+)
+from utils.concurrency import get_limiter
+from utils.metrics import metrics
+
+hedge_executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="hedge")
+
+
+class HedgeBudget:
+    """
+    Global token bucket shared by all dependencies. Every call earns `ratio` tokens
+    and every hedge spends one, so hedges stay below `ratio` of total traffic.
+    """
+
+    def __init__(self, ratio: float = HEDGE_BUDGET_RATIO, max_tokens: float = HEDGE_MAX_TOKENS):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = 0.0
+        self._lock = threading.Lock()
+        self._gauge = metrics.gauge("hedge_budget_tokens")
+
+    def earn(self):
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+            self._gauge.set(self.tokens)
+
+    def spend(self) -> bool:
+        with self._lock:
+            if self.tokens < 1.0:
+                return False
+            self.tokens -= 1.0
+            self._gauge.set(self.tokens)
+            return True
+
+
+hedge_budget = HedgeBudget()
+
+
+class Hedger:
+    def __init__(self, dependency: str, enabled: bool):
+        self.dependency = dependency
+        self.enabled = enabled
+        self.latency = get_limiter(dependency).latency
+        self._calls = metrics.counter("hedge_calls_total", dependency=dependency)
+        self._fired = metrics.counter("hedges_fired_total", dependency=dependency)
+        self._won = metrics.counter("hedges_won_total", dependency=dependency)
+        self._denied = metrics.counter("hedges_denied_total", dependency=dependency)
+
+    def call(self, fn: Callable, *args, **kwargs):
+        """
+        Call fn, hedging it with a second identical call if it runs past the p95 latency.
+        fn must be idempotent; the losing attempt is left to finish in the background.
+        """
+        if not self.enabled or self.latency.count < HEDGE_MIN_SAMPLES:
+            return fn(*args, **kwargs)
+
+        self._calls.inc()
+        hedge_budget.earn()
+        delay = max(self.latency.percentile(95), HEDGE_MIN_DELAY)
+
+        primary = hedge_executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+        done, _ = wait([primary], timeout=delay)
+        if done or not hedge_budget.spend():
+            if not done:
+                self._denied.inc()
+            return primary.result()
+
+        self._fired.inc()
+        backup = hedge_executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+        done, pending = wait([primary, backup], return_when=FIRST_COMPLETED)
+        first = done.pop()
+        if first.exception() is not None and pending:
+            # Prefer whichever attempt succeeds
+            other = pending.pop()
+            if other.exception() is None:
+                first = other
+        if first is backup and first.exception() is None:
+            self._won.inc()
+        return first.result()
+
+
+_hedgers: Dict[str, Hedger] = {}
+
+
+def get_hedger(dependency: str) -> Hedger:
+    """Get the hedger for a dependency; hedging is only active for HEDGED_DEPENDENCIES"""
+    hedger = _hedgers.get(dependency)
+    if hedger is None:
+        hedger = _hedgers.setdefault(dependency, Hedger(dependency, dependency in HEDGED_DEPENDENCIES))
+    return hedger
@@ -1,17 +1,26 @@
 import requests
 import os
 from dotenv import load_dotenv
+from utils.concurrency import DependencyBusy, get_limiter
+from utils.hedging import get_hedger
 
 load_dotenv()
 
 EMBEDDING_SERVER = os.getenv("EMBEDDING_SERVER")
+embedding_limiter = get_limiter("embedding")
+embedding_hedger = get_hedger("embedding")
 
-def get_embedding(text: str) -> list[float]:
-    try:
+def _request_embedding(text: str) -> list[float]:
+    with embedding_limiter.acquire():
         response = requests.post(EMBEDDING_SERVER, json={"inputs": text}, timeout=10)
         response.raise_for_status()
-        return response.json()[0]
+    return response.json()[0]
+
+def get_embedding(text: str) -> list[float]:
+    try:
+        return embedding_hedger.call(_request_embedding, text)
+    except DependencyBusy:
+        raise
     except Exception as e:
         print("Embedding error:", e)
         return []
-
@@ -0,0 +1,154 @@
+"""
+Event Loop Lag Monitor
+Measures asyncio event-loop lag and captures the stack of whatever is blocking the loop
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Dict, Any, List, Optional
+
+from config.config import LOOP_LAG_INTERVAL, LOOP_LAG_THRESHOLD
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+APP_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+MAX_BLOCKING_SITES = 100
+
+
+class EventLoopMonitor:
+    """
+    A probe coroutine sleeps for a fixed interval and records how late it wakes up.
+    A watchdog thread notices when the probe has not run for longer than the
+    threshold and snapshots the event-loop thread's stack while it is still blocked.
+    """
+
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL, threshold: float = LOOP_LAG_THRESHOLD):
+        self.interval = interval
+        self.threshold = threshold
+        self.blocking_sites: Dict[str, Dict[str, Any]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._probe_task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._heartbeat = time.monotonic()
+        self._pending_site: Optional[str] = None
+        self._lock = threading.Lock()
+        self._lag = metrics.histogram("event_loop_lag_seconds")
+        self._stalls = metrics.counter("event_loop_stalls_total")
+
+    async def start(self):
+        """Start monitoring the running event loop"""
+        if self._probe_task:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._stop.clear()
+        self._heartbeat = time.monotonic()
+        self._probe_task = asyncio.create_task(self._probe())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+        logger.info(f"Event loop monitor started (interval={self.interval}s, threshold={self.threshold}s)")
+
+    async def stop(self):
+        """Stop the probe and watchdog"""
+        self._stop.set()
+        if self._probe_task:
+            self._probe_task.cancel()
+            try:
+                await self._probe_task
+            except asyncio.CancelledError:
+                pass
+            self._probe_task = None
+        if self._watchdog:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    async def _probe(self):
+        while True:
+            scheduled = time.monotonic()
+            self._heartbeat = scheduled
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - scheduled - self.interval)
+            self._heartbeat = time.monotonic()
+            self._lag.observe(lag)
+
+            if lag >= self.threshold:
+                self._stalls.inc()
+                with self._lock:
+                    site = self._pending_site
+                    self._pending_site = None
+                    if site:
+                        entry = self.blocking_sites[site]
+                        entry["total_lag"] += lag
+                        entry["max_lag"] = max(entry["max_lag"], lag)
+                if site:
+                    logger.warning(f"Event loop blocked for {lag * 1000:.0f}ms at {site}")
+
+    def _watch(self):
+        poll = max(self.threshold / 4, 0.005)
+        captured_for = None
+        while not self._stop.wait(poll):
+            heartbeat = self._heartbeat
+            stalled_for = time.monotonic() - heartbeat - self.interval
+            if stalled_for < self.threshold or captured_for == heartbeat:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            captured_for = heartbeat
+            self._record_stack(traceback.extract_stack(frame))
+
+    def _record_stack(self, stack: traceback.StackSummary):
+        site = _blocking_site(stack)
+        with self._lock:
+            entry = self.blocking_sites.get(site)
+            if entry is None:
+                if len(self.blocking_sites) >= MAX_BLOCKING_SITES:
+                    return
+                entry = self.blocking_sites[site] = {"count": 0, "total_lag": 0.0, "max_lag": 0.0, "stack": []}
+            entry["count"] += 1
+            entry["stack"] = [f"{os.path.relpath(f.filename, APP_ROOT)}:{f.lineno} {f.name}" for f in stack[-12:]]
+            self._pending_site = site
+
+    def report(self) -> Dict[str, Any]:
+        """Lag percentiles plus blocking call sites ordered by total time blocked"""
+        with self._lock:
+            sites: List[Dict[str, Any]] = [
+                {
+                    "site": site,
+                    "count": entry["count"],
+                    "total_lag": round(entry["total_lag"], 4),
+                    "max_lag": round(entry["max_lag"], 4),
+                    "stack": list(entry["stack"]),
+                }
+                for site, entry in self.blocking_sites.items()
+            ]
+        sites.sort(key=lambda s: (s["total_lag"], s["count"]), reverse=True)
+        return {
+            "interval": self.interval,
+            "threshold": self.threshold,
+            "lag": self._lag.summary(),
+            "stalls": self._stalls.value,
+            "blocking_sites": sites,
+        }
+
+
+def _blocking_site(stack: traceback.StackSummary) -> str:
+    """Name the innermost application frame; library frames below it are the blocking call itself"""
+    for frame in reversed(stack):
+        path = os.path.abspath(frame.filename)
+        if path.startswith(APP_ROOT) and "site-packages" not in path and not path.endswith("loop_monitor.py"):
+            return f"{os.path.relpath(path, APP_ROOT)}:{frame.lineno} {frame.name}"
+    leaf = stack[-1]
+    return f"{os.path.basename(leaf.filename)}:{leaf.lineno} {leaf.name}"
+
+
+# Global event loop monitor instance
+loop_monitor = EventLoopMonitor()
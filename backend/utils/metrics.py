@@ -0,0 +1,130 @@
+"""
+In-process Metrics Registry
+Thread-safe counters, gauges and latency histograms served by the /metrics endpoint
+"""
+
+import math
+import threading
+from collections import deque
+from typing import Dict, Any, Tuple
+
+HISTOGRAM_WINDOW = 2048
+PERCENTILES = (50, 90, 95, 99)
+
+
+def _metric_key(name: str, labels: Dict[str, Any]) -> str:
+    if not labels:
+        return name
+    rendered = ",".join(f'{k}="{labels[k]}"' for k in sorted(labels))
+    return f"{name}{{{rendered}}}"
+
+
+class Counter:
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+class Gauge:
+    def __init__(self):
+        self._value = 0.0
+
+    def set(self, value: float):
+        self._value = value
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+class Histogram:
+    """Keeps a sliding window of recent observations for percentile queries"""
+
+    def __init__(self, window: int = HISTOGRAM_WINDOW):
+        self._values = deque(maxlen=window)
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self._values.append(value)
+            self._count += 1
+            self._sum += value
+            self._max = max(self._max, value)
+
+    def percentile(self, q: float) -> float:
+        """Nearest-rank percentile over the current window, 0.0 when empty"""
+        with self._lock:
+            values = sorted(self._values)
+        if not values:
+            return 0.0
+        index = max(0, math.ceil(q / 100.0 * len(values)) - 1)
+        return values[index]
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    def summary(self) -> Dict[str, float]:
+        with self._lock:
+            values = sorted(self._values)
+            count, total, maximum = self._count, self._sum, self._max
+        summary = {"count": count, "sum": round(total, 6), "max": round(maximum, 6)}
+        for q in PERCENTILES:
+            if values:
+                index = max(0, math.ceil(q / 100.0 * len(values)) - 1)
+                summary[f"p{q}"] = round(values[index], 6)
+            else:
+                summary[f"p{q}"] = 0.0
+        return summary
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._counters: Dict[str, Counter] = {}
+        self._gauges: Dict[str, Gauge] = {}
+        self._histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, store: Dict, factory, name: str, labels: Dict[str, Any]):
+        key = _metric_key(name, labels)
+        metric = store.get(key)
+        if metric is None:
+            with self._lock:
+                metric = store.setdefault(key, factory())
+        return metric
+
+    def counter(self, name: str, **labels) -> Counter:
+        return self._get(self._counters, Counter, name, labels)
+
+    def gauge(self, name: str, **labels) -> Gauge:
+        return self._get(self._gauges, Gauge, name, labels)
+
+    def histogram(self, name: str, **labels) -> Histogram:
+        return self._get(self._histograms, Histogram, name, labels)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Return the current value of every registered metric"""
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            histograms = dict(self._histograms)
+        return {
+            "counters": {key: c.value for key, c in sorted(counters.items())},
+            "gauges": {key: g.value for key, g in sorted(gauges.items())},
+            "histograms": {key: h.summary() for key, h in sorted(histograms.items())},
+        }
+
+
+# Global metrics registry
+metrics = MetricsRegistry()
@@ -0,0 +1,184 @@
+"""
+Per-request Sampling Profiler
+Captures a stack-sampling profile of a single request and writes it as collapsed stacks for flamegraph tools
+"""
+
+import asyncio
+import contextvars
+import hmac
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Dict, Optional
+
+from config.config import PROFILE_ADMIN_TOKEN, PROFILE_DIR, PROFILE_SAMPLE_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "x-profile-token"
+PROFILE_QUERY_PARAM = "profile"
+
+# The profiler of the request being served; asyncio.to_thread and LangChain's executor calls copy it
+# into the worker threads that run the request's blocking work
+current_profiler: contextvars.ContextVar[Optional["RequestProfiler"]] = contextvars.ContextVar(
+    "current_profiler", default=None
+)
+
+
+def profiling_requested(connection) -> bool:
+    """Check whether a request or websocket carries a valid admin profiling token"""
+    if not PROFILE_ADMIN_TOKEN:
+        return False
+
+    token = connection.headers.get(PROFILE_HEADER) or connection.query_params.get(PROFILE_QUERY_PARAM)
+    if not token:
+        return False
+    return hmac.compare_digest(token, PROFILE_ADMIN_TOKEN)
+
+
+def request_profiler(connection, name: str):
+    """
+    Return a context manager that profiles the enclosed block when requested
+
+    Args:
+        connection: The FastAPI Request or WebSocket being served
+        name: Label used in the output file name
+
+    Returns:
+        A RequestProfiler if profiling was requested, otherwise a no-op context
+    """
+    if not profiling_requested(connection):
+        return nullcontext()
+    return RequestProfiler(name)
+
+
+class RequestProfiler:
+    """
+    Samples the stack of the calling thread, and of every worker thread running the request's
+    blocking work, while the block runs.
+
+    Only event-loop samples that pass through the frame which entered the profiler are kept, so work
+    from other requests interleaved on the same event loop is excluded. Worker threads are found
+    through `current_profiler`: the ProfilingExecutor tags a thread while it runs a call whose copied
+    context carries this profiler, and its samples are recorded under a "worker thread" root.
+    """
+
+    def __init__(self, name: str, interval: float = PROFILE_SAMPLE_INTERVAL, output_dir: str = PROFILE_DIR):
+        self.name = name
+        self.interval = interval
+        self.output_dir = output_dir
+        self.samples: Counter = Counter()
+        self.output_path: Optional[str] = None
+        self._root_frame = None
+        self._thread_id = None
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._started_at = 0.0
+        self._token: Optional[contextvars.Token] = None
+        self._workers: Dict[int, object] = {}
+        self._workers_lock = threading.Lock()
+
+    def __enter__(self):
+        self._root_frame = sys._getframe(1)
+        self._thread_id = threading.get_ident()
+        self._started_at = time.perf_counter()
+        self._token = current_profiler.set(self)
+        self._sampler = threading.Thread(target=self._sample_loop, name=f"profiler-{self.name}", daemon=True)
+        self._sampler.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        current_profiler.reset(self._token)
+        self._stop.set()
+        self._sampler.join()
+        elapsed = time.perf_counter() - self._started_at
+        try:
+            self.output_path = self._write()
+            logger.info(
+                f"Profile for {self.name} written to {self.output_path} "
+                f"({sum(self.samples.values())} samples over {elapsed:.3f}s)"
+            )
+        except Exception as e:
+            logger.error(f"Failed to write profile for {self.name}: {e}")
+        finally:
+            self._root_frame = None
+        return False
+
+    def run_tagged(self, fn, *args):
+        """Run a worker-thread call with this thread sampled as part of the request"""
+        ident = threading.get_ident()
+        with self._workers_lock:
+            self._workers[ident] = sys._getframe()
+        try:
+            return fn(*args)
+        finally:
+            with self._workers_lock:
+                self._workers.pop(ident, None)
+
+    def _sample_loop(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            stack = _stack_below(frames.get(self._thread_id), self._root_frame, inclusive=True)
+            # An empty stack means the root frame is suspended; the loop is running something else
+            if stack:
+                self.samples[";".join(_frame_label(f) for f in reversed(stack))] += 1
+            with self._workers_lock:
+                workers = list(self._workers.items())
+            for ident, root in workers:
+                stack = _stack_below(frames.get(ident), root, inclusive=False)
+                if stack:
+                    self.samples[";".join(["worker thread"] + [_frame_label(f) for f in reversed(stack)])] += 1
+
+    def _write(self) -> str:
+        os.makedirs(self.output_dir, exist_ok=True)
+        filename = f"{self.name}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.folded"
+        path = os.path.join(self.output_dir, filename)
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+
+def _stack_below(frame, root, inclusive: bool) -> list:
+    """Frames from `frame` out to `root`, innermost first; empty if `root` is not on the stack"""
+    stack = []
+    while frame is not None:
+        if frame is root:
+            if inclusive:
+                stack.append(frame)
+            return stack
+        stack.append(frame)
+        frame = frame.f_back
+    return []
+
+
+class ProfilingExecutor(ThreadPoolExecutor):
+    """
+    Default event-loop executor that lets a request's profiler sample the threads doing its work.
+    asyncio.to_thread and LangChain submit functools.partial(context.run, ...), so the profiler is
+    read from that copied context; other calls run untouched.
+    """
+
+    def submit(self, fn, /, *args, **kwargs):
+        context = getattr(getattr(fn, "func", None), "__self__", None)
+        profiler = context.get(current_profiler) if isinstance(context, contextvars.Context) else None
+        if profiler is None or kwargs:
+            return super().submit(fn, *args, **kwargs)
+        return super().submit(profiler.run_tagged, fn, *args)
+
+
+def install_profiling_executor():
+    """Make the running loop's default executor a ProfilingExecutor; only needed when profiling is enabled"""
+    if PROFILE_ADMIN_TOKEN:
+        asyncio.get_running_loop().set_default_executor(ProfilingExecutor(thread_name_prefix="asyncio"))
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
@@ -1,5 +1,27 @@
-import math
-from typing import List, Dict, Any, Tuple
+import heapq
+import re
+from functools import lru_cache
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Tuple, Callable, Optional
+
+from config.config import RRF_SOURCE_WEIGHTS, RRF_ALIASES
+
+_PARENTHETICAL = re.compile(r"\([^)]*\)")
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+@dataclass
+class FusedResult:
+    result: Dict[str, Any]
+    score: float
+    provenance: Dict[str, int] = field(default_factory=dict)
+
+
+@lru_cache(maxsize=4096)
+def normalize_name(name: str) -> str:
+    """'Influenza (Flu)' and 'influenza' both become 'influenza'"""
+    return _NON_WORD.sub("_", _PARENTHETICAL.sub(" ", name.lower())).strip("_")
+
 
 def calculate_rrf_score(rank: int, k: float = 60.0) -> float:
     return 1.0 / (k + rank)
@@ -10,52 +32,77 @@ def rank_vector_results(vector_results: List[Dict[str, Any]]) -> List[Tuple[Dict
 def rank_web_results(web_results: List[Dict[str, str]]) -> List[Tuple[Dict[str, str], int]]:
     return [(result, i + 1) for i, result in enumerate(web_results)]
 
+def fuse_rankings(
+    rankings: Dict[str, List[Dict[str, Any]]],
+    weights: Optional[Dict[str, float]] = None,
+    k: float = 60.0,
+    top_k: Optional[int] = None,
+    normalize: Callable[[str], str] = normalize_name,
+    aliases: Optional[Dict[str, str]] = None,
+) -> List[FusedResult]:
+    """
+    Weighted reciprocal rank fusion over any number of ranked lists
+
+    Args:
+        rankings: Ranked results per source, best first, e.g. {"vector": [...], "web": [...]}
+        weights: Per-source weight (default RRF_SOURCE_WEIGHTS, then 1.0)
+        k: RRF damping constant
+        top_k: Return only the best top_k (heap selection instead of a full sort)
+        normalize: Maps a result Name to its fusion key
+        aliases: Maps normalized names onto a canonical key so synonyms fuse
+
+    Returns:
+        FusedResult list by descending score; each keeps the result from the first source
+        that produced it and the 1-based rank it had in every source
+    """
+    weights = RRF_SOURCE_WEIGHTS if weights is None else weights
+    aliases = RRF_ALIASES if aliases is None else aliases
+    scores: Dict[str, float] = {}
+    first_seen: Dict[str, Dict[str, Any]] = {}
+    provenance: Dict[str, Dict[str, int]] = {}
+
+    # Scored in Python on purpose: the pipeline fuses at most CHAT_SESSION_MAX_LISTS short lists, where
+    # NumPy scoring is slower (see benchmarks/rrf_fusion_benchmark.py); it only wins from ~100 results
+    for source, results in rankings.items():
+        if not results:
+            continue
+        weight = weights.get(source, 1.0)
+        for rank, result in enumerate(results, 1):
+            name = result.get("Name")
+            key = normalize(name) if name else f"{source}_{rank}"
+            key = aliases.get(key, key)
+            sources = provenance.get(key)
+            if sources is None:
+                scores[key] = weight / (k + rank)
+                first_seen[key] = result
+                provenance[key] = {source: rank}
+            elif source not in sources:
+                scores[key] += weight / (k + rank)
+                sources[source] = rank
+
+    # Ties keep first-seen order, matching the stable sort used before
+    if top_k is None or top_k >= len(scores):
+        keys = sorted(scores, key=scores.__getitem__, reverse=True)
+    else:
+        order = {key: i for i, key in enumerate(scores)}
+        keys = heapq.nlargest(top_k, scores, key=lambda key: (scores[key], -order[key]))
+    return [FusedResult(first_seen[key], scores[key], provenance[key]) for key in keys]
+
 def combine_and_rank_with_rrf(
-    vector_results: List[Dict[str, Any]], 
-    web_results: List[Dict[str, str]], 
+    vector_results: List[Dict[str, Any]],
+    web_results: List[Dict[str, str]],
     k: float = 60.0
 ) -> List[Dict[str, Any]]:
- 
-    ranked_vector = rank_vector_results(vector_results)
-    ranked_web = rank_web_results(web_results)
-    
-    combined_scores = {}
-    
-    for result, rank in ranked_vector:
-        rrf_score = calculate_rrf_score(rank, k)
-        vector_key = result.get('Name', f'vector_{rank}').lower().replace(' ', '_')
-        
-        combined_scores[vector_key] = {
-            'result': result,
-            'combined_score': rrf_score
-        }
-    
-    for result, rank in ranked_web:
-        rrf_score = calculate_rrf_score(rank, k)
-        web_key = result.get('Name', f'web_{rank}').lower().replace(' ', '_')
-        
-        if web_key in combined_scores:
-            combined_scores[web_key]['combined_score'] += rrf_score
-        else:
-            combined_scores[web_key] = {
-                'result': result,
-                'combined_score': rrf_score
-            }
-    
-    sorted_results = sorted(
-        combined_scores.values(), 
-        key=lambda x: x['combined_score'], 
-        reverse=True
-    )
-    
-    return [item['result'] for item in sorted_results]
+
+    fused = fuse_rankings({"vector": vector_results, "web": web_results}, k=k)
+    return [item.result for item in fused]
 
 def get_top_results(
-    vector_results: List[Dict[str, Any]], 
-    web_results: List[Dict[str, str]], 
+    vector_results: List[Dict[str, Any]],
+    web_results: List[Dict[str, str]],
     top_k: int = 5,
     k: float = 60.0
 ) -> List[Dict[str, Any]]:
 
-    combined_results = combine_and_rank_with_rrf(vector_results, web_results, k)
-    return combined_results[:top_k] 
\ No newline at end of file
+    fused = fuse_rankings({"vector": vector_results, "web": web_results}, k=k, top_k=top_k)
+    return [item.result for item in fused]
@@ -0,0 +1,145 @@
+"""
+Semantic Result Cache
+Reuses retrieval results for queries whose embeddings are near neighbours of a recently answered one
+"""
+
+import random
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import faiss
+import numpy as np
+
+from config.config import (
+    SEMANTIC_CACHE_ENABLED,
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_TTL,
+    SEMANTIC_CACHE_MAX_ENTRIES,
+    SEMANTIC_CACHE_AUDIT_RATE,
+)
+from utils.metrics import metrics
+
+
+@dataclass
+class CacheHit:
+    entry_id: int
+    similarity: float
+    value: Dict[str, Any]
+    audit: bool
+
+
+class _Entry:
+    __slots__ = ("value", "created_at")
+
+    def __init__(self, value: Dict[str, Any], created_at: float):
+        self.value = value
+        self.created_at = created_at
+
+
+def _unit(vector: List[float]) -> np.ndarray:
+    array = np.asarray([vector], dtype="float32")
+    faiss.normalize_L2(array)
+    return array
+
+
+class SemanticCache:
+    """
+    Cosine nearest-neighbour cache over an IndexIDMap(IndexFlatIP) of unit-length query embeddings.
+
+    Entries expire after `ttl` seconds and the least recently used entry is evicted once
+    `max_entries` is reached. A share of hits (`audit_rate`) is flagged for auditing: the caller
+    runs the full pipeline anyway and reports how closely the fresh results match the cached ones.
+    """
+
+    def __init__(
+        self,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        ttl: float = SEMANTIC_CACHE_TTL,
+        max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+        audit_rate: float = SEMANTIC_CACHE_AUDIT_RATE,
+    ):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.audit_rate = audit_rate
+        self.index: Optional[faiss.IndexIDMap] = None
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+        self._hits = metrics.counter("semantic_cache_hits_total")
+        self._misses = metrics.counter("semantic_cache_misses_total")
+        self._evictions = metrics.counter("semantic_cache_evictions_total")
+        self._expired = metrics.counter("semantic_cache_expired_total")
+        self._hit_similarity = metrics.histogram("semantic_cache_hit_similarity")
+        self._miss_similarity = metrics.histogram("semantic_cache_nearest_miss_similarity")
+        self._audit_agreement = metrics.histogram("semantic_cache_audit_agreement")
+        self._size = metrics.gauge("semantic_cache_entries")
+
+    def _remove(self, entry_id: int):
+        del self._entries[entry_id]
+        self.index.remove_ids(np.asarray([entry_id], dtype="int64"))
+
+    def lookup(self, vector: List[float]) -> Optional[CacheHit]:
+        if not len(vector):
+            return None
+        query = _unit(vector)
+        with self._lock:
+            if self.index is None or self.index.ntotal == 0:
+                self._misses.inc()
+                return None
+            similarities, ids = self.index.search(query, 1)
+            similarity, entry_id = float(similarities[0][0]), int(ids[0][0])
+            entry = self._entries.get(entry_id)
+            if entry is not None and time.monotonic() - entry.created_at > self.ttl:
+                self._remove(entry_id)
+                self._expired.inc()
+                self._size.set(len(self._entries))
+                entry = None
+            if entry is None or similarity < self.threshold:
+                self._misses.inc()
+                if entry is not None:
+                    self._miss_similarity.observe(similarity)
+                return None
+            self._entries.move_to_end(entry_id)
+
+        self._hits.inc()
+        self._hit_similarity.observe(similarity)
+        return CacheHit(entry_id, similarity, entry.value, audit=random.random() < self.audit_rate)
+
+    def store(self, vector: List[float], value: Dict[str, Any]):
+        if not len(vector):
+            return
+        key = _unit(vector)
+        with self._lock:
+            if self.index is None:
+                self.index = faiss.IndexIDMap(faiss.IndexFlatIP(key.shape[1]))
+            now = time.monotonic()
+            while self._entries:
+                oldest_id, oldest = next(iter(self._entries.items()))
+                if now - oldest.created_at > self.ttl:
+                    self._expired.inc()
+                elif len(self._entries) >= self.max_entries:
+                    self._evictions.inc()
+                else:
+                    break
+                self._remove(oldest_id)
+
+            entry_id = self._next_id
+            self._next_id += 1
+            self.index.add_with_ids(key, np.asarray([entry_id], dtype="int64"))
+            self._entries[entry_id] = _Entry(value, now)
+            self._size.set(len(self._entries))
+
+    def record_audit(self, hit: CacheHit, fresh_results: List[Dict[str, Any]]):
+        """Compare a hit's cached results with freshly computed ones (Jaccard over condition names)"""
+        cached = {str(r.get("Name", "")).lower() for r in hit.value.get("structured_results", [])}
+        fresh = {str(r.get("Name", "")).lower() for r in fresh_results}
+        agreement = len(cached & fresh) / len(cached | fresh) if cached | fresh else 1.0
+        self._audit_agreement.observe(agreement)
+
+
+semantic_cache = SemanticCache() if SEMANTIC_CACHE_ENABLED else None
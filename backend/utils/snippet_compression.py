@@ -0,0 +1,120 @@
+"""
+Web Snippet Compression
+Removes near-duplicate pages, repeated sentences and off-topic snippets from search results before parsing
+"""
+
+import re
+import zlib
+from typing import List, Set
+
+import numpy as np
+
+from config.config import (
+    SNIPPET_MINHASH_PERMUTATIONS,
+    SNIPPET_NEAR_DUPLICATE_THRESHOLD,
+    SNIPPET_MIN_RELEVANCE,
+)
+from utils.metrics import metrics
+
+SHINGLE_SIZE = 5
+MIN_SENTENCE_WORDS = 4
+# Terms are compared on a short prefix so "treatment"/"treat" and "infections"/"infection" match
+STEM_LENGTH = 5
+# Stems of treatment wording; sentences with one survive the relevance cut, since a treatment snippet
+# often names the drug or therapy without repeating the query's symptom words
+TREATMENT_STEMS = {"treat", "thera", "medic", "antiv", "antib", "remed", "presc", "vacci", "dosag"}
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from", "how",
+    "i", "in", "is", "it", "my", "of", "on", "or", "the", "to", "what", "when", "why", "with",
+}
+
+_WORD = re.compile(r"[a-z0-9]+")
+_SENTENCE = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(])")
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = np.random.RandomState(20240601)
+_PERM_A = _rng.randint(1, 1 << 31, size=SNIPPET_MINHASH_PERMUTATIONS).astype(np.uint64)
+_PERM_B = _rng.randint(0, 1 << 31, size=SNIPPET_MINHASH_PERMUTATIONS).astype(np.uint64)
+
+
+def _words(text: str) -> List[str]:
+    return _WORD.findall(text.lower())
+
+
+def _terms(text: str) -> Set[str]:
+    return {w[:STEM_LENGTH] for w in _words(text) if w not in STOPWORDS and len(w) > 2}
+
+
+def minhash_signature(text: str) -> np.ndarray:
+    """MinHash over word 5-gram shingles, using (a*x + b) mod p permutations of CRC32 shingle hashes"""
+    words = _words(text)
+    if len(words) < SHINGLE_SIZE:
+        shingles = {" ".join(words)}
+    else:
+        shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    hashes = np.fromiter((zlib.crc32(s.encode()) for s in shingles), dtype=np.uint64, count=len(shingles))
+    permuted = (np.outer(hashes, _PERM_A) + _PERM_B) % _MERSENNE_PRIME
+    return permuted.min(axis=0)
+
+
+def estimated_jaccard(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.mean(a == b))
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s.strip() for s in _SENTENCE.split(text) if s.strip()]
+
+
+def compress_snippets(snippets: List[str], query: str) -> List[str]:
+    """
+    Shrink ranked search snippets before they reach the parse LLM
+
+    Args:
+        snippets: Search result texts, best ranked first
+        query: The transformed search query the results were fetched for
+
+    Returns:
+        The surviving snippets in their original order. A snippet is dropped when it is a
+        near duplicate of a higher-ranked one or shares too few terms with the query, except that
+        the treatment sentences of an off-topic snippet are kept; sentences already seen in a
+        higher-ranked snippet and fragments too short to carry facts are removed.
+    """
+    query_terms = _terms(query)
+    kept: List[str] = []
+    signatures: List[np.ndarray] = []
+    seen_sentences: Set[str] = set()
+    near_duplicates = off_topic = 0
+
+    for snippet in snippets:
+        if query_terms and len(_terms(snippet) & query_terms) / len(query_terms) < SNIPPET_MIN_RELEVANCE:
+            treatment = [s for s in split_sentences(snippet) if _terms(s) & TREATMENT_STEMS]
+            if not treatment:
+                off_topic += 1
+                continue
+            snippet = " ".join(treatment)
+
+        signature = minhash_signature(snippet)
+        if any(estimated_jaccard(signature, s) >= SNIPPET_NEAR_DUPLICATE_THRESHOLD for s in signatures):
+            near_duplicates += 1
+            continue
+        signatures.append(signature)
+
+        sentences = []
+        for sentence in split_sentences(snippet):
+            words = _words(sentence)
+            key = " ".join(words)
+            if len(words) < MIN_SENTENCE_WORDS or key in seen_sentences:
+                continue
+            seen_sentences.add(key)
+            sentences.append(sentence)
+        if sentences:
+            kept.append(" ".join(sentences))
+
+    metrics.counter("web_snippets_total").inc(len(snippets))
+    metrics.counter("web_snippets_near_duplicate_total").inc(near_duplicates)
+    metrics.counter("web_snippets_off_topic_total").inc(off_topic)
+    input_chars = sum(len(s) for s in snippets)
+    if input_chars:
+        metrics.histogram("web_snippet_compression_ratio").observe(sum(len(s) for s in kept) / input_chars)
+    return kept
@@ -0,0 +1,276 @@
+"""
+Symptom Extractor
+Word-level trie over the symptom vocabulary and colloquial synonyms, for extracting symptoms without the LLM
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from utils.symptom_vocabulary import SYMPTOM_PHRASES, HEALTH_TERMS, normalize_text
+
+# Everyday wording mapped to the vocabulary term it means
+SYNONYMS = {
+    "dizzy": "dizziness",
+    "lightheaded": "lightheadedness",
+    "light headed": "lightheadedness",
+    "nauseous": "nausea",
+    "nauseated": "nausea",
+    "feel sick": "nausea",
+    "feeling sick": "nausea",
+    "throwing up": "vomiting",
+    "throw up": "vomiting",
+    "threw up": "vomiting",
+    "puking": "vomiting",
+    "tired": "fatigue",
+    "tiredness": "fatigue",
+    "exhausted": "fatigue",
+    "worn out": "fatigue",
+    "feverish": "fever",
+    "temperature": "fever",
+    "high temperature": "high fever",
+    "itchy": "itching",
+    "itches": "itching",
+    "coughing": "cough",
+    "stomach ache": "abdominal pain",
+    "stomachache": "abdominal pain",
+    "stomach pain": "abdominal pain",
+    "tummy ache": "abdominal pain",
+    "belly pain": "abdominal pain",
+    "stomach cramps": "abdominal cramps",
+    "migraine": "headache",
+    "throat hurts": "sore throat",
+    "scratchy throat": "sore throat",
+    "short of breath": "shortness of breath",
+    "out of breath": "shortness of breath",
+    "hard to breathe": "difficulty breathing",
+    "trouble breathing": "difficulty breathing",
+    "can't breathe": "difficulty breathing",
+    "can't sleep": "insomnia",
+    "cannot sleep": "insomnia",
+    "can not sleep": "insomnia",
+    "trouble sleeping": "insomnia",
+    "ringing in my ears": "tinnitus",
+    "ringing in the ears": "tinnitus",
+    "ears are ringing": "tinnitus",
+    "ears ringing": "tinnitus",
+    "stuffy nose": "nasal congestion",
+    "blocked nose": "nasal congestion",
+    "heart racing": "palpitations",
+    "racing heart": "palpitations",
+    "pounding heart": "palpitations",
+    "sweaty": "sweating",
+    "shaky": "trembling",
+    "anxious": "anxiety",
+    "depressed": "depression",
+    "constipated": "constipation",
+    "bloated": "bloating",
+    "swollen": "swelling",
+    "stiff joints": "joint stiffness",
+    "achy joints": "joint pain",
+    "joints hurt": "joint pain",
+    "back hurts": "back pain",
+    "chest hurts": "chest pain",
+    "blurry": "blurred vision",
+    "peeing a lot": "frequent urination",
+    "losing weight": "weight loss",
+    "not hungry": "loss of appetite",
+    "no appetite": "loss of appetite",
+    "fainted": "fainting",
+    "passed out": "fainting",
+}
+
+# "<body part> hurts" and similar are read as "<body part> pain"
+BODY_PARTS = (
+    "head", "chest", "back", "neck", "shoulder", "arm", "elbow", "wrist", "hand", "finger", "hip",
+    "knee", "ankle", "foot", "leg", "joint", "muscle", "ear", "eye", "tooth", "jaw", "throat", "stomach",
+)
+for _part in BODY_PARTS:
+    for _verb in ("hurts", "aches", "is sore", "is painful"):
+        SYNONYMS.setdefault(f"{_part} {_verb}", f"{_part} pain")
+SYNONYMS.update({
+    "head hurts": "headache",
+    "head pain": "headache",
+    "stomach hurts": "abdominal pain",
+    "stomach aches": "abdominal pain",
+})
+
+NEGATIONS = {"no", "not", "without", "never", "denies", "don't", "dont", "haven't", "havent", "isn't", "wasn't"}
+NEGATION_WINDOW = 3
+# A negation reaches back at most NEGATION_WINDOW words and not past a clause break or one of these
+# conjunctions ("no fever, chest pain and cough" negates only the fever). "or"/"nor" are not breaks:
+# "no fever or chills" negates both.
+SCOPE_CONJUNCTIONS = {"and", "but", "so", "yet", "also", "plus", "though", "although", "however"}
+DISJUNCTIONS = {"or", "nor"}
+
+# Clause punctuation is kept as this token in extraction input; normalize_text never produces it
+CLAUSE_BREAK = ","
+_CLAUSE_PUNCTUATION = re.compile(r"[,;:.!?()\[\]]+|\s[-\u2013\u2014]+\s")
+
+# Words that carry no symptom information; excluded when measuring how much of the input was understood
+FILLER_WORDS = {
+    "a", "about", "after", "again", "all", "also", "am", "an", "and", "any", "are", "as", "at", "be",
+    "been", "before", "being", "but", "by", "can", "could", "day", "days", "did", "do", "does", "doing",
+    "for", "from", "feel", "feeling", "feels", "few", "get", "getting", "got", "had", "has", "have",
+    "having", "he", "her", "him", "his", "hours", "how", "i", "i'm", "i've", "im", "in", "is", "it",
+    "it's", "just", "keep", "kind", "last", "lately", "like", "little", "lot", "me", "month", "months",
+    "morning", "my", "night", "now", "of", "on", "or", "really", "recently", "she", "since", "so", "some",
+    "sometimes", "started", "still", "that", "the", "them", "there", "these", "they", "this", "three",
+    "to", "today", "too", "two", "up", "very", "was", "week", "weeks", "what", "when", "which", "while",
+    "with", "yesterday", "you", "bad", "badly", "terrible", "awful", "severe", "mild", "constant",
+    "constantly", "always", "often", "bit", "pretty", "quite", "then", "should", "worried",
+    "help", "please", "hi", "hello", "hey", "think", "know", "ago", "time", "every",
+}
+
+
+def singularize(token: str) -> str:
+    """Crude plural folding, applied identically to vocabulary and input so both sides agree"""
+    if len(token) <= 3 or token.endswith(("ss", "us", "is")):
+        return token
+    if token.endswith("ies"):
+        return token[:-3] + "y"
+    if token.endswith(("shes", "xes", "sses", "zes")):
+        return token[:-2]
+    if token.endswith("s"):
+        return token[:-1]
+    return token
+
+
+def _tokens(text: str) -> List[str]:
+    return normalize_text(text).split()
+
+
+def _input_tokens(text: str) -> List[str]:
+    """Word tokens with a CLAUSE_BREAK token wherever the text had clause punctuation"""
+    tokens: List[str] = []
+    for clause in _CLAUSE_PUNCTUATION.split(text):
+        words = _tokens(clause)
+        if words:
+            if tokens:
+                tokens.append(CLAUSE_BREAK)
+            tokens.extend(words)
+    return tokens
+
+
+def _is_negated(tokens: List[str], start: int, previous: Optional[tuple]) -> bool:
+    """
+    Whether the match starting at `start` falls in a negation's scope. `previous` is the
+    (end, negated) of the match before it: the scope stops there, except that a negated match
+    carries over a disjunction ("no fever or chills").
+    """
+    previous_end = previous[0] if previous else 0
+    for k in range(start - 1, max(previous_end, start - NEGATION_WINDOW) - 1, -1):
+        token = tokens[k]
+        if token == CLAUSE_BREAK or token in SCOPE_CONJUNCTIONS:
+            return False
+        if token in NEGATIONS:
+            return True
+    if previous and previous[1] and start - previous_end <= NEGATION_WINDOW:
+        return any(t in DISJUNCTIONS for t in tokens[previous_end:start])
+    return False
+
+
+class SymptomTrie:
+    """Longest-match, non-overlapping phrase matcher over singularized word tokens"""
+
+    _END = "$"
+
+    def __init__(self):
+        self.root: Dict = {}
+        self.size = 0
+
+    def add(self, phrase: str, canonical: str):
+        node = self.root
+        for token in _tokens(phrase):
+            node = node.setdefault(singularize(token), {})
+        if self._END not in node:
+            node[self._END] = canonical
+            self.size += 1
+
+    def scan(self, tokens: List[str]):
+        """Yield (start, end, canonical) for the longest match at each position, left to right"""
+        keys = [singularize(t) for t in tokens]
+        i = 0
+        while i < len(keys):
+            node, match = self.root, None
+            for j in range(i, len(keys)):
+                node = node.get(keys[j])
+                if node is None:
+                    break
+                if self._END in node:
+                    match = (i, j + 1, node[self._END])
+            if match:
+                yield match
+                i = match[1]
+            else:
+                i += 1
+
+
+def build_trie() -> SymptomTrie:
+    trie = SymptomTrie()
+    # Synonyms first so they win where the vocabulary has the same wording in another form
+    for phrase, canonical in SYNONYMS.items():
+        trie.add(phrase, canonical)
+    for phrase in SYMPTOM_PHRASES:
+        trie.add(phrase, phrase)
+    return trie
+
+
+symptom_trie = build_trie()
+
+
+@dataclass
+class Extraction:
+    symptoms: List[str] = field(default_factory=list)
+    negated: List[str] = field(default_factory=list)
+    coverage: float = 0.0
+    unmatched: List[str] = field(default_factory=list)
+
+
+def extract_symptoms(text: str, trie: Optional[SymptomTrie] = None) -> Extraction:
+    """
+    Extract vocabulary symptoms from free text
+
+    Returns:
+        Extraction with the distinct symptoms in order of mention, symptoms that were negated
+        ("no fever"), and coverage: the share of informative words that belong to a matched symptom
+    """
+    trie = trie or symptom_trie
+    tokens = _input_tokens(text)
+    covered = [False] * len(tokens)
+    symptoms: List[str] = []
+    negated: List[str] = []
+    previous = None
+
+    for start, end, canonical in trie.scan(tokens):
+        for k in range(start, end):
+            covered[k] = True
+        is_negated = _is_negated(tokens, start, previous)
+        previous = (end, is_negated)
+        if is_negated:
+            if canonical not in negated:
+                negated.append(canonical)
+        elif canonical not in symptoms:
+            symptoms.append(canonical)
+
+    informative = [
+        (t, c) for t, c in zip(tokens, covered)
+        if t not in FILLER_WORDS and t not in NEGATIONS and t != CLAUSE_BREAK
+    ]
+    coverage = sum(c for _, c in informative) / len(informative) if informative else 0.0
+    return Extraction(
+        symptoms=symptoms,
+        negated=negated,
+        coverage=coverage,
+        unmatched=[t for t, c in informative if not c],
+    )
+
+
+def build_search_query(symptoms: List[str]) -> str:
+    return f"{' '.join(symptoms)} possible causes and treatments"
+
+
+def lexicon_matches(text: str) -> Tuple[List[str], List[str]]:
+    """Symptoms and everyday health terms the text mentions, and the symptoms it negates ("no fever")"""
+    extraction = extract_symptoms(text)
+    return extraction.symptoms + [t for t in extraction.unmatched if t in HEALTH_TERMS], extraction.negated
@@ -0,0 +1,142 @@
+"""
+Symptom Overlap Reranker
+Reorders fused candidates by IDF-weighted Jaccard overlap between their listed symptoms and the user's
+"""
+
+from typing import Dict, FrozenSet, List, Optional
+
+import numpy as np
+
+from config.config import RERANK_OVERLAP_WEIGHT, RULE_OUT_DENIED_SHARE
+from utils.faiss_index import metadata_df
+from utils.metrics import metrics
+from utils.rrf_ranking import FusedResult
+from utils.symptom_extractor import extract_symptoms
+
+
+class SymptomMatrix:
+    """
+    Binary condition x symptom-term matrix in CSR form (indptr/indices arrays), one row per
+    knowledge-base condition, with columns for the canonical terms the symptom extractor produces.
+    """
+
+    def __init__(self, condition_symptoms: List[List[str]]):
+        vocabulary: Dict[str, int] = {}
+        indptr = [0]
+        indices: List[int] = []
+        for terms in condition_symptoms:
+            columns = sorted({vocabulary.setdefault(term, len(vocabulary)) for term in terms})
+            indices.extend(columns)
+            indptr.append(len(indices))
+
+        self.vocabulary = vocabulary
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        document_frequency = np.bincount(self.indices, minlength=len(vocabulary))
+        n_rows = len(condition_symptoms)
+        self.idf = np.log((n_rows + 1) / (document_frequency + 1)) + 1.0
+        # Total IDF weight of every row, for the union term of the Jaccard score
+        self.row_of_entry = np.repeat(np.arange(n_rows), np.diff(self.indptr))
+        self.row_weight = np.bincount(self.row_of_entry, weights=self.idf[self.indices], minlength=n_rows)
+
+    def query_weights(self, terms: List[str]) -> np.ndarray:
+        """Dense IDF-weighted indicator vector for the user's terms (unknown terms are ignored)"""
+        weights = np.zeros(len(self.vocabulary))
+        for term in terms:
+            column = self.vocabulary.get(term)
+            if column is not None:
+                weights[column] = self.idf[column]
+        return weights
+
+    def overlap(self, rows: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Weighted Jaccard of each row against the query vector"""
+        starts, ends = self.indptr[rows], self.indptr[rows + 1]
+        lengths = ends - starts
+        gathered = np.concatenate([self.indices[s:e] for s, e in zip(starts, ends)] + [np.zeros(0, np.int64)])
+        segment = np.repeat(np.arange(len(rows)), lengths)
+        intersection = np.bincount(segment, weights=query[gathered], minlength=len(rows))
+        union = self.row_weight[rows] + query.sum() - intersection
+        return np.divide(intersection, union, out=np.zeros(len(rows)), where=union > 0)
+
+    def coverage(self, query: np.ndarray) -> np.ndarray:
+        """Share of every row's IDF weight that the query's terms cover"""
+        covered = np.bincount(self.row_of_entry, weights=query[self.indices], minlength=len(self.row_weight))
+        return np.divide(covered, self.row_weight, out=np.zeros(len(covered)), where=self.row_weight > 0)
+
+
+def build_symptom_matrix():
+    condition_symptoms = [
+        extract_symptoms(symptoms).symptoms if isinstance(symptoms, str) else []
+        for symptoms in metadata_df["Symptoms"]
+    ]
+    row_by_code = {code: i for i, code in enumerate(metadata_df["Code"])}
+    return SymptomMatrix(condition_symptoms), row_by_code
+
+
+symptom_matrix, row_by_code = build_symptom_matrix()
+condition_codes = metadata_df["Code"].to_numpy()
+
+
+def ruled_out_codes(denied: List[str], reported: List[str], share: float = RULE_OUT_DENIED_SHARE) -> FrozenSet[int]:
+    """
+    Codes of the conditions a conversation has ruled out: at least `share` of their listed symptoms
+    (IDF-weighted) were denied by the user, and more of them were denied than reported
+    """
+    if not denied:
+        return frozenset()
+    denied_cover = symptom_matrix.coverage(symptom_matrix.query_weights(denied))
+    reported_cover = symptom_matrix.coverage(symptom_matrix.query_weights(reported))
+    ruled_out = (denied_cover >= share) & (denied_cover > reported_cover)
+    return frozenset(int(code) for code in condition_codes[ruled_out])
+
+
+def rerank_candidates(
+    candidates: List[FusedResult],
+    user_symptoms: List[str],
+    top_k: int = 3,
+    overlap_weight: Optional[float] = None,
+) -> List[Dict]:
+    """
+    Rerank fused candidates by symptom overlap and keep the best top_k results
+
+    Args:
+        candidates: fuse_rankings output, best first
+        user_symptoms: Symptoms extracted from the user's input
+        top_k: Number of results to keep
+        overlap_weight: Share of the final score taken from symptom overlap; the rest is the
+            fused RRF score scaled to the best candidate
+
+    Returns:
+        The top_k result dicts, in reranked order
+    """
+    overlap_weight = RERANK_OVERLAP_WEIGHT if overlap_weight is None else overlap_weight
+    terms = extract_symptoms(", ".join(user_symptoms)).symptoms if user_symptoms else []
+    query = symptom_matrix.query_weights(terms)
+    if not candidates or not query.any():
+        return [c.result for c in candidates[:top_k]]
+
+    # Knowledge-base rows come straight from the matrix; web results are indexed on the fly
+    rows, on_the_fly = [], {}
+    for i, candidate in enumerate(candidates):
+        row = row_by_code.get(candidate.result.get("Code"))
+        if row is None:
+            on_the_fly[i] = extract_symptoms(str(candidate.result.get("Symptoms", ""))).symptoms
+        rows.append(row if row is not None else -1)
+
+    overlaps = np.zeros(len(candidates))
+    known = np.asarray([i for i, row in enumerate(rows) if row >= 0], dtype=np.int64)
+    if len(known):
+        overlaps[known] = symptom_matrix.overlap(np.asarray(rows, dtype=np.int64)[known], query)
+    query_weight = query.sum()
+    for i, candidate_terms in on_the_fly.items():
+        columns = {symptom_matrix.vocabulary[t] for t in candidate_terms if t in symptom_matrix.vocabulary}
+        weight = symptom_matrix.idf[list(columns)].sum() if columns else 0.0
+        intersection = query[list(columns)].sum() if columns else 0.0
+        union = weight + query_weight - intersection
+        overlaps[i] = intersection / union if union > 0 else 0.0
+
+    fused = np.asarray([c.score for c in candidates])
+    final = (1 - overlap_weight) * fused / fused.max() + overlap_weight * overlaps
+    order = np.argsort(-final, kind="stable")[:top_k]
+    metrics.counter("rerank_reordered_total").inc(int(any(order != np.arange(len(order)))))
+    return [candidates[i].result for i in order]
@@ -0,0 +1,63 @@
+"""
+Symptom Vocabulary
+Normalized symptom phrases taken from the knowledge base metadata, for local matching without the LLM
+"""
+
+import re
+from typing import List, Set
+
+from utils.faiss_index import metadata_df
+
+# Single words that survive splitting the metadata lists but are fragments, not symptoms
+FRAGMENT_TERMS = {
+    "arm", "black", "brain", "cognitive", "difficulty", "dry", "enlarged", "feet", "gambling",
+    "intercourse", "legs", "motor", "other", "persistent", "raised", "raw", "recurrent", "red",
+    "relaxation", "rough", "sharp", "shoulders", "small", "soles", "sudden", "thick", "warmth", "white",
+}
+
+# Leading words of qualifier fragments ("especially at night", "usually on the lower lip") left
+# behind when a symptom description containing commas is split
+QUALIFIER_STARTS = {
+    "after", "as", "at", "due", "during", "especially", "in", "may", "often", "on", "particularly",
+    "that", "typically", "usually", "when", "which", "with",
+}
+
+# Everyday words people use for being unwell that the metadata does not list as symptoms
+HEALTH_TERMS = {
+    "ache", "aches", "aching", "hurt", "hurts", "hurting", "sick", "ill", "unwell", "sore",
+    "symptom", "symptoms", "doctor", "medicine", "medication", "pill", "pills", "injury",
+    "injured", "infection", "disease", "diagnosis", "pain", "painful", "throbbing", "bleeding",
+}
+
+_PARENTHETICAL = re.compile(r"\([^)]*\)?|^[^(]*\)")
+_NON_WORD = re.compile(r"[^a-z0-9' ]+")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, strip punctuation and collapse whitespace"""
+    return _SPACES.sub(" ", _NON_WORD.sub(" ", text.lower())).strip()
+
+
+def _clean_phrases(raw: str) -> List[str]:
+    phrase = normalize_text(_PARENTHETICAL.sub(" ", raw.lower()))
+    phrase = re.sub(r"^(and|or|such as|including) ", "", phrase)
+    if not phrase:
+        return []
+    # "abdominal or back pain" / "nausea and vomiting" list alternatives in one entry; keep the
+    # whole phrase and each alternative that reads as a symptom on its own
+    parts = [phrase]
+    if " or " in phrase:
+        parts.extend(p.strip() for p in phrase.split(" or "))
+    return [p for p in parts if len(p) >= 4 and p not in FRAGMENT_TERMS and p.split()[0] not in QUALIFIER_STARTS]
+
+
+def load_symptom_phrases() -> List[str]:
+    phrases: Set[str] = set()
+    for symptoms in metadata_df["Symptoms"].dropna():
+        for raw in symptoms.split(","):
+            phrases.update(_clean_phrases(raw))
+    return sorted(phrases)
+
+
+SYMPTOM_PHRASES: List[str] = load_symptom_phrases()
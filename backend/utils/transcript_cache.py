@@ -0,0 +1,175 @@
+"""
+Transcript Cache
+Remembers transcripts by a hash of the audio content and STT configuration, in memory and on disk
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import BinaryIO, Optional
+
+from config.config import (
+    TRANSCRIPT_CACHE_ENABLED,
+    TRANSCRIPT_CACHE_MEMORY_ENTRIES,
+    TRANSCRIPT_CACHE_DIR,
+    TRANSCRIPT_CACHE_TTL,
+    DEMO_AUDIO_DIR,
+)
+from utils.demo_voices import DEMO_VOICES
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+def audio_key(audio: BinaryIO, fingerprint: str) -> str:
+    """
+    sha256 over the STT fingerprint and the file's bytes; the file is rewound afterwards. Normalized
+    audio is encoded deterministically, so keying it as well catches re-encodings of the same recording.
+    """
+    digest = hashlib.sha256(fingerprint.encode())
+    audio.seek(0)
+    while chunk := audio.read(HASH_CHUNK_BYTES):
+        digest.update(chunk)
+    audio.seek(0)
+    return digest.hexdigest()
+
+
+class TranscriptCache:
+    """
+    Two-tier transcript cache: an LRU dict in front of one JSON file per key on disk.
+
+    The disk tier survives restarts and is shared with any other process using the same directory.
+    Files are written to a temporary name and renamed into place, so readers never see partial
+    entries. Both tiers are blocking, so async callers go through a worker thread. Expired files are
+    deleted when a read finds them and by `prune`, which the transcription job manager runs periodically.
+    """
+
+    def __init__(
+        self,
+        memory_entries: int = TRANSCRIPT_CACHE_MEMORY_ENTRIES,
+        directory: Optional[str] = TRANSCRIPT_CACHE_DIR,
+        ttl: float = TRANSCRIPT_CACHE_TTL,
+    ):
+        self.memory_entries = memory_entries
+        self.directory = directory or None
+        self.ttl = ttl
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._size = metrics.gauge("transcript_cache_memory_entries")
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[1] <= self.ttl:
+                self._memory.move_to_end(key)
+                metrics.counter("transcript_cache_hits_total", tier="memory").inc()
+                return entry[0]
+
+        if self.directory:
+            try:
+                with open(self._path(key), "r", encoding="utf-8") as f:
+                    stored = json.load(f)
+                if now - stored["created_at"] <= self.ttl:
+                    self._remember(key, stored["text"], stored["created_at"])
+                    metrics.counter("transcript_cache_hits_total", tier="disk").inc()
+                    return stored["text"]
+                _remove(self._path(key))
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Ignoring unreadable transcript cache entry {key}: {e}")
+        metrics.counter("transcript_cache_misses_total").inc()
+        return None
+
+    def put(self, key: str, text: str):
+        created_at = time.time()
+        self._remember(key, text, created_at)
+        if not self.directory:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"text": text, "created_at": created_at}, f)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write transcript cache entry {key}: {e}")
+
+    def _remember(self, key: str, text: str, created_at: float):
+        with self._lock:
+            self._memory[key] = (text, created_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+            self._size.set(len(self._memory))
+
+    def prune(self) -> int:
+        """Delete disk entries older than the ttl, and temp files left by interrupted writes; returns the count"""
+        if not self.directory:
+            return 0
+        cutoff = time.time() - self.ttl
+        removed = 0
+        try:
+            shards = os.listdir(self.directory)
+        except OSError:
+            return 0
+        for shard in shards:
+            shard_dir = os.path.join(self.directory, shard)
+            try:
+                names = os.listdir(shard_dir)
+            except OSError:
+                continue
+            for name in names:
+                path = os.path.join(shard_dir, name)
+                try:
+                    # Entries are renamed into place right after they are written, so mtime is their age
+                    expired = os.path.getmtime(path) < cutoff
+                except OSError:
+                    continue
+                if expired and _remove(path):
+                    removed += 1
+        if removed:
+            metrics.counter("transcript_cache_pruned_total").inc(removed)
+            logger.info(f"Pruned {removed} expired transcript cache files")
+        return removed
+
+    def preload_demo_transcripts(self, fingerprint: str, directory: str = DEMO_AUDIO_DIR) -> int:
+        """
+        Seed the cache with the scripted transcripts of the demo recordings, so playing a demo clip
+        never reaches the STT provider. Files are matched by name: joe_fever_001 -> joe-fever.mp3.
+        """
+        loaded = 0
+        for voice_id, voice in DEMO_VOICES.items():
+            path = os.path.join(directory, f"{voice_id.rsplit('_', 1)[0].replace('_', '-')}.mp3")
+            try:
+                with open(path, "rb") as f:
+                    key = audio_key(f, fingerprint)
+            except OSError:
+                continue
+            if self.get(key) is None:
+                self.put(key, voice.transcript)
+            loaded += 1
+        logger.info(f"Preloaded {loaded} demo transcripts")
+        return loaded
+
+
+def _remove(path: str) -> bool:
+    try:
+        os.remove(path)
+        return True
+    except OSError:
+        return False
+
+
+transcript_cache = TranscriptCache() if TRANSCRIPT_CACHE_ENABLED else None
@@ -0,0 +1,256 @@
+"""
+Transcription Jobs
+Queues uploaded audio for a bounded pool of speech-to-text workers and tracks each job until it is collected
+"""
+
+import asyncio
+import logging
+import math
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from config.config import (
+    TRANSCRIPTION_WORKERS,
+    TRANSCRIPTION_QUEUE_SIZE,
+    TRANSCRIPTION_JOB_TTL,
+    AUDIO_NORMALIZATION_ENABLED,
+    TRANSCRIPT_CACHE_PRUNE_INTERVAL,
+)
+from stt.backends import AudioSource, STTBackend, Transcript, get_stt_backend
+from utils.audio_normalization import NormalizationReport, normalize_audio
+from utils.concurrency import DependencyBusy
+from utils.metrics import metrics
+from utils.transcript_cache import audio_key, transcript_cache
+
+logger = logging.getLogger(__name__)
+
+FINISHED = ("completed", "failed", "cancelled")
+
+
+@dataclass
+class TranscriptionJob:
+    id: str
+    audio: Optional[AudioSource] = field(repr=False)
+    status: str = "queued"
+    text: Optional[str] = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    normalization: Optional[NormalizationReport] = None
+    cached: bool = False
+    waiters: int = field(default=1, repr=False)
+    cache_keys: List[str] = field(default_factory=list, repr=False)
+    done: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "text": self.text,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "audio": self.normalization.to_dict() if self.normalization else None,
+            "cached": self.cached,
+        }
+
+
+class TranscriptionJobManager:
+    """
+    Async front for a blocking STT backend.
+
+    Jobs wait in a bounded asyncio queue and `workers` tasks each run one transcription at a time in a
+    worker thread, so the event loop never waits on the backend. When the queue is full, submit raises
+    DependencyBusy rather than queueing more work than the workers can clear. Finished jobs stay
+    pollable for `ttl` seconds. A job closes its audio when it finishes if the audio is a file object.
+    Buffered audio is normalized (16 kHz mono, silence trimmed) in the worker thread before it is sent.
+
+    With the transcript cache, audio is looked up by content hash on submit (a hit completes the job
+    at once) and again after normalization; identical audio submitted while a job for it is still
+    pending joins that job instead of starting another. Every submit that joins a job counts as one
+    more waiter, and `cancel` only drops a job once all of its waiters have given up on it.
+    """
+
+    def __init__(
+        self,
+        backend: Optional[STTBackend] = None,
+        workers: int = TRANSCRIPTION_WORKERS,
+        queue_size: int = TRANSCRIPTION_QUEUE_SIZE,
+        ttl: float = TRANSCRIPTION_JOB_TTL,
+    ):
+        self._backend = backend
+        self.workers = workers
+        self.queue_size = queue_size
+        self.ttl = ttl
+        self.jobs: Dict[str, TranscriptionJob] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_tasks: List[asyncio.Task] = []
+        self._prune_task: Optional[asyncio.Task] = None
+        self._pending_by_key: Dict[str, TranscriptionJob] = {}
+        self._queue_depth = metrics.gauge("transcription_queue_depth")
+
+    @property
+    def backend(self) -> STTBackend:
+        if self._backend is None:
+            self._backend = get_stt_backend()
+        return self._backend
+
+    async def start(self):
+        if self._worker_tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._worker_tasks = [
+            asyncio.create_task(self._work(), name=f"transcription-worker-{i}") for i in range(self.workers)
+        ]
+        logger.info(f"Started {self.workers} transcription workers ({self.backend.name} backend)")
+        if transcript_cache:
+            await asyncio.to_thread(transcript_cache.preload_demo_transcripts, self.backend.fingerprint)
+            if transcript_cache.directory:
+                self._prune_task = asyncio.create_task(self._prune_cache(), name="transcript-cache-prune")
+
+    async def stop(self):
+        tasks = self._worker_tasks + ([self._prune_task] if self._prune_task else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._worker_tasks = []
+        self._prune_task = None
+        for job in self.jobs.values():
+            if not job.finished:
+                self._finish(job, "cancelled", error="Transcription service shut down")
+
+    async def submit(self, audio: AudioSource) -> TranscriptionJob:
+        """Queue audio for transcription; raises DependencyBusy when the queue is full"""
+        if not self._worker_tasks:
+            await self.start()
+        self._expire()
+        job = TranscriptionJob(id=uuid.uuid4().hex, audio=audio)
+        if transcript_cache and not isinstance(audio, str):
+            key, text = await asyncio.to_thread(self._lookup, audio)
+            if text is not None:
+                job.cached = True
+                job.started_at = job.created_at
+                self.jobs[job.id] = job
+                self._finish(job, "completed", text=text)
+                return job
+            pending = self._pending_by_key.get(key)
+            if pending is not None:
+                _close(audio)
+                pending.waiters += 1
+                metrics.counter("transcription_jobs_total", status="joined").inc()
+                return pending
+            job.cache_keys.append(key)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            metrics.counter("transcription_jobs_total", status="shed").inc()
+            _close(audio)
+            # Roughly how long until a worker frees up, assuming jobs take a second or two each
+            raise DependencyBusy("transcription", retry_after=max(1, math.ceil(self.queue_size / self.workers)))
+        self.jobs[job.id] = job
+        for key in job.cache_keys:
+            self._pending_by_key[key] = job
+        self._queue_depth.set(self._queue.qsize())
+        return job
+
+    def get(self, job_id: str) -> Optional[TranscriptionJob]:
+        return self.jobs.get(job_id)
+
+    async def wait(self, job: TranscriptionJob, timeout: Optional[float] = None) -> TranscriptionJob:
+        """Wait for a job to finish; raises asyncio.TimeoutError on timeout without cancelling the job"""
+        await asyncio.wait_for(job.done.wait(), timeout)
+        return job
+
+    def cancel(self, job: TranscriptionJob):
+        """
+        Give up on a job for one waiter. A job nobody else is waiting for is dropped if it has not
+        started yet; a running transcription is left to finish.
+        """
+        job.waiters = max(job.waiters - 1, 0)
+        if job.waiters == 0 and job.status == "queued":
+            self._finish(job, "cancelled")
+
+    async def _prune_cache(self):
+        while True:
+            await asyncio.sleep(TRANSCRIPT_CACHE_PRUNE_INTERVAL)
+            try:
+                await asyncio.to_thread(transcript_cache.prune)
+            except Exception as e:
+                logger.warning(f"Transcript cache pruning failed: {e}")
+
+    async def _work(self):
+        while True:
+            job = await self._queue.get()
+            self._queue_depth.set(self._queue.qsize())
+            try:
+                if job.status != "queued":
+                    continue
+                job.status = "running"
+                job.started_at = time.time()
+                metrics.histogram("transcription_queue_seconds").observe(job.started_at - job.created_at)
+                try:
+                    transcript = await asyncio.to_thread(self._transcribe, job)
+                except Exception as e:
+                    logger.error(f"Transcription job {job.id} failed: {e}")
+                    self._finish(job, "failed", error=str(e))
+                    continue
+                if transcript.status == "error":
+                    self._finish(job, "failed", error=transcript.error)
+                else:
+                    if transcript_cache:
+                        for key in job.cache_keys:
+                            await asyncio.to_thread(transcript_cache.put, key, transcript.text)
+                    self._finish(job, "completed", text=transcript.text)
+                metrics.histogram("transcription_seconds", backend=self.backend.name).observe(
+                    job.finished_at - job.started_at
+                )
+            finally:
+                self._queue.task_done()
+
+    def _lookup(self, audio: AudioSource):
+        key = audio_key(audio, self.backend.fingerprint)
+        return key, transcript_cache.get(key)
+
+    def _transcribe(self, job: TranscriptionJob) -> Transcript:
+        audio = job.audio
+        if AUDIO_NORMALIZATION_ENABLED and not isinstance(audio, str):
+            audio, job.normalization = normalize_audio(audio)
+            if transcript_cache and job.normalization:
+                key, text = self._lookup(audio)
+                if text is not None:
+                    job.cached = True
+                    return Transcript(text=text)
+                job.cache_keys.append(key)
+        return self.backend.transcribe(audio)
+
+    def _finish(self, job: TranscriptionJob, status: str, text: Optional[str] = None, error: Optional[str] = None):
+        job.status, job.text, job.error = status, text, error
+        job.finished_at = time.time()
+        _close(job.audio)
+        job.audio = None
+        job.done.set()
+        for key in job.cache_keys:
+            if self._pending_by_key.get(key) is job:
+                del self._pending_by_key[key]
+        metrics.counter("transcription_jobs_total", status=status, cached=str(job.cached).lower()).inc()
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        for job_id in [i for i, job in self.jobs.items() if job.finished and job.finished_at < cutoff]:
+            del self.jobs[job_id]
+
+
+def _close(audio: Optional[AudioSource]):
+    if audio is not None and hasattr(audio, "close"):
+        audio.close()
+
+
+transcription_jobs = TranscriptionJobManager()
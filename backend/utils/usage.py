@@ -0,0 +1,208 @@
+"""
+LLM Usage Accounting
+Records tokens, latency and cost for every LLM call and aggregates them over rolling windows
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque, defaultdict
+from contextvars import ContextVar
+from dataclasses import dataclass, asdict
+from typing import Dict, Any, Optional
+
+from config.config import LLM_PRICING, USAGE_RETENTION_SECONDS, USAGE_SPOOL_PATH, USAGE_SPOOL_MAX_BYTES
+
+current_endpoint: ContextVar[str] = ContextVar("current_endpoint", default="unknown")
+current_session: ContextVar[Optional[str]] = ContextVar("current_session", default=None)
+
+USAGE_WINDOWS = {"1m": 60, "5m": 300, "1h": 3600, "24h": 86400}
+TOP_SESSIONS = 20
+
+
+def set_usage_context(endpoint: str, session_id: Optional[str] = None):
+    """Attribute LLM calls made by the current task (and its threads) to an endpoint and session"""
+    current_endpoint.set(endpoint)
+    current_session.set(session_id)
+
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int) -> float:
+    """Cost in USD from the per-million-token price table; unknown models cost 0"""
+    prices = LLM_PRICING.get(model.split("/")[-1])
+    if not prices:
+        return 0.0
+    return (input_tokens * prices["input"] + output_tokens * prices["output"]) / 1_000_000
+
+
+@dataclass
+class UsageRecord:
+    timestamp: float
+    agent: str
+    model: str
+    endpoint: str
+    session_id: Optional[str]
+    input_tokens: int
+    output_tokens: int
+    latency: float
+    cost: float
+
+
+class UsageTracker:
+    """
+    Keeps usage records in memory for USAGE_RETENTION_SECONDS.
+
+    Processes other than the API server (the voice bot) switch to spool mode and append
+    records to a JSONL file, which the API server picks up whenever usage is queried. Once the
+    spool grows past `spool_max_bytes` the reader moves it aside, ingests the rest and deletes it,
+    so writers start a fresh file.
+    """
+
+    def __init__(
+        self,
+        retention: float = USAGE_RETENTION_SECONDS,
+        spool_path: str = USAGE_SPOOL_PATH,
+        spool_max_bytes: int = USAGE_SPOOL_MAX_BYTES,
+    ):
+        self.retention = retention
+        self.spool_path = spool_path
+        self.spool_max_bytes = spool_max_bytes
+        self.spool_writer = False
+        self._records: deque = deque()
+        self._spool_offset = 0
+        self._lock = threading.Lock()
+
+    def enable_spool_writer(self):
+        """Write records to the shared spool file instead of keeping them in this process"""
+        os.makedirs(os.path.dirname(self.spool_path) or ".", exist_ok=True)
+        self.spool_writer = True
+
+    def record(
+        self,
+        agent: str,
+        model: str,
+        input_tokens: int,
+        output_tokens: int,
+        latency: float,
+        endpoint: Optional[str] = None,
+        session_id: Optional[str] = None,
+    ) -> UsageRecord:
+        record = UsageRecord(
+            timestamp=time.time(),
+            agent=agent,
+            model=model,
+            endpoint=endpoint or current_endpoint.get(),
+            session_id=session_id if session_id is not None else current_session.get(),
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            latency=latency,
+            cost=estimate_cost(model, input_tokens, output_tokens),
+        )
+        if self.spool_writer:
+            with self._lock, open(self.spool_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(asdict(record)) + "\n")
+        else:
+            with self._lock:
+                self._records.append(record)
+        return record
+
+    def _ingest_spool(self):
+        if self.spool_writer or not os.path.exists(self.spool_path):
+            return
+        path = self.spool_path
+        rotate = os.path.getsize(path) > self.spool_max_bytes
+        if rotate:
+            # Writers reopen the spool for every record, so after the rename they start a new file
+            path = f"{self.spool_path}.ingesting"
+            os.replace(self.spool_path, path)
+        with open(path, "r", encoding="utf-8") as f:
+            if os.path.getsize(path) < self._spool_offset:
+                self._spool_offset = 0
+            f.seek(self._spool_offset)
+            lines = f.readlines()
+            self._spool_offset = f.tell()
+        if rotate:
+            os.remove(path)
+            self._spool_offset = 0
+
+        ingested = []
+        for line in lines:
+            try:
+                ingested.append(UsageRecord(**json.loads(line)))
+            except (ValueError, TypeError):
+                continue
+        if not ingested:
+            return
+        # Spooled records arrive late and from several processes; _prune relies on timestamp order
+        latest = self._records[-1].timestamp if self._records else float("-inf")
+        self._records.extend(ingested)
+        if any(r.timestamp < latest for r in ingested) or any(
+            a.timestamp > b.timestamp for a, b in zip(ingested, ingested[1:])
+        ):
+            self._records = deque(sorted(self._records, key=lambda r: r.timestamp))
+
+    def _prune(self, now: float):
+        cutoff = now - self.retention
+        while self._records and self._records[0].timestamp < cutoff:
+            self._records.popleft()
+
+    def summary(self, window: float) -> Dict[str, Any]:
+        """Aggregate usage over the last `window` seconds per agent, endpoint, model and session"""
+        now = time.time()
+        with self._lock:
+            self._ingest_spool()
+            self._prune(now)
+            records = [r for r in self._records if r.timestamp >= now - window]
+
+        totals = _Aggregate()
+        groups = {"by_agent": defaultdict(_Aggregate), "by_endpoint": defaultdict(_Aggregate),
+                  "by_model": defaultdict(_Aggregate), "by_session": defaultdict(_Aggregate)}
+        for r in records:
+            totals.add(r)
+            groups["by_agent"][r.agent].add(r)
+            groups["by_endpoint"][r.endpoint].add(r)
+            groups["by_model"][r.model].add(r)
+            if r.session_id:
+                groups["by_session"][r.session_id].add(r)
+
+        top_sessions = sorted(groups["by_session"].items(), key=lambda item: item[1].cost, reverse=True)
+        groups["by_session"] = dict(top_sessions[:TOP_SESSIONS])
+        return {
+            "window_seconds": window,
+            "totals": totals.to_dict(),
+            **{name: {key: agg.to_dict() for key, agg in group.items()} for name, group in groups.items()},
+        }
+
+
+class _Aggregate:
+    __slots__ = ("calls", "input_tokens", "output_tokens", "latency", "max_latency", "cost")
+
+    def __init__(self):
+        self.calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.latency = 0.0
+        self.max_latency = 0.0
+        self.cost = 0.0
+
+    def add(self, record: UsageRecord):
+        self.calls += 1
+        self.input_tokens += record.input_tokens
+        self.output_tokens += record.output_tokens
+        self.latency += record.latency
+        self.max_latency = max(self.max_latency, record.latency)
+        self.cost += record.cost
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "avg_latency": round(self.latency / self.calls, 4) if self.calls else 0.0,
+            "max_latency": round(self.max_latency, 4),
+            "cost_usd": round(self.cost, 6),
+        }
+
+
+# Global usage tracker instance
+usage_tracker = UsageTracker()
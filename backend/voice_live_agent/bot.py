@@ -11,7 +11,8 @@ from helper import configure
 
 from pipecat.audio.vad.silero import SileroVADAnalyzer
 from pipecat.audio.vad.vad_analyzer import VADParams
-from pipecat.frames.frames import Frame, EndFrame, TranscriptionFrame
+from pipecat.frames.frames import Frame, EndFrame, TranscriptionFrame, MetricsFrame
+from pipecat.metrics.metrics import LLMUsageMetricsData, TTFBMetricsData
 try:
     from pipecat.frames.frames import ServerMessageFrame
     HAS_SERVER_MESSAGE_FRAME = True
@@ -33,12 +34,16 @@ from voice_live_agent.prompts import SYSTEM_INSTRUCTION
 from voice_live_agent.form_tools import AppointmentTools
 from voice_live_agent.form_declarations import function_declarations, open_appointment_decl, update_appointment_field_decl, submit_appointment_decl
 from voice_live_agent.conversation_storage import conversation_storage
+from utils.usage import usage_tracker
 
 load_dotenv(override=True)
 
 logger.remove(0)
 logger.add(sys.stderr, level="DEBUG")
 
+# The bot runs in its own process, so usage goes to the spool the API server reads
+usage_tracker.enable_spool_writer()
+
 # Initialize appointment tools
 appointment_tools = AppointmentTools()
 
@@ -280,6 +285,35 @@ class ConversationProcessor(FrameProcessor):
         await self.push_frame(frame, direction)
 
 
+class UsageMetricsProcessor(FrameProcessor):
+    """Record the live model's token usage from pipecat metrics frames"""
+
+    def __init__(self, session_id: str = None):
+        super().__init__()
+        self.session_id = session_id
+        self.last_ttfb = 0.0
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if isinstance(frame, MetricsFrame):
+            for data in frame.data:
+                if isinstance(data, TTFBMetricsData):
+                    self.last_ttfb = data.value
+                elif isinstance(data, LLMUsageMetricsData):
+                    usage_tracker.record(
+                        agent="voice_bot",
+                        model=data.model or "unknown",
+                        input_tokens=data.value.prompt_tokens,
+                        output_tokens=data.value.completion_tokens,
+                        latency=self.last_ttfb,
+                        endpoint="voice_bot",
+                        session_id=self.session_id,
+                    )
+
+        await self.push_frame(frame, direction)
+
+
 async def main():
     async with aiohttp.ClientSession() as session:
         (room_url, token) = await configure(session)
@@ -361,12 +395,16 @@ async def main():
         # Create conversation processor
         conversation_processor = ConversationProcessor(session_id)
 
+        # Create usage processor to account for live model tokens
+        usage_processor = UsageMetricsProcessor(session_id)
+
         pipeline = Pipeline(
             [
                 transport.input(),
                 rtvi,
                 context_aggregator.user(),
                 llm,
+                usage_processor,  # Record token usage from metrics frames
                 appointment_processor,  # Add appointment processor before filter
                 conversation_processor,  # Add conversation processor
                 transport.output(),
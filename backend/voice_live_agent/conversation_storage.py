@@ -6,7 +6,7 @@ Stores conversation history in local memory for further diagnosis and analysis
 import json
 import os
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, List, Optional, Any
 from dataclasses import dataclass, asdict
 import uuid
 
@@ -44,6 +44,7 @@ class ConversationStorage:
         self.storage_dir = storage_dir
         self.active_sessions: Dict[str, ConversationSession] = {}
         self.conversation_history: List[ConversationSession] = []
+        self.session_listeners: List[Callable[[ConversationSession], None]] = []
         
         # Create storage directory if it doesn't exist
         os.makedirs(storage_dir, exist_ok=True)
@@ -57,13 +58,26 @@ class ConversationStorage:
             for filename in os.listdir(self.storage_dir):
                 if filename.endswith('.json'):
                     filepath = os.path.join(self.storage_dir, filename)
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        session = self._deserialize_session(data)
-                        self.conversation_history.append(session)
+                    self.conversation_history.append(self.load_session_file(filepath))
         except Exception as e:
             print(f"Error loading existing conversations: {e}")
     
+    def load_session_file(self, filepath: str) -> ConversationSession:
+        """Load a saved session from its JSON file"""
+        with open(filepath, 'r', encoding='utf-8') as f:
+            return self._deserialize_session(json.load(f))
+
+    def add_session_listener(self, listener: Callable[[ConversationSession], None]):
+        """Register a callback for sessions that end or get a diagnosis after ending"""
+        self.session_listeners.append(listener)
+
+    def _notify_listeners(self, session: ConversationSession):
+        for listener in self.session_listeners:
+            try:
+                listener(session)
+            except Exception as e:
+                print(f"[CONVERSATION] Session listener error: {e}")
+
     def _deserialize_session(self, data: Dict) -> ConversationSession:
         """Deserialize session data from JSON"""
         messages = []
@@ -118,6 +132,7 @@ class ConversationStorage:
             # Save to file
             self._save_session(session)
             print(f"[CONVERSATION] Ended session: {session_id}")
+            self._notify_listeners(session)
     
     def add_user_message(self, session_id: str, content: str, message_type: str = "transcription", metadata: Optional[Dict] = None):
         """Add a user message to the conversation"""
@@ -211,6 +226,8 @@ class ConversationStorage:
             session.diagnosis_result = result
             self._save_session(session)
             print(f"[CONVERSATION] Diagnosis result set for session: {session_id}")
+            if session.end_time:
+                self._notify_listeners(session)
 
     def get_diagnosis_result(self, session_id: str) -> Optional[str]:
         """Get the diagnosis result for a session (active or from history)"""
@@ -0,0 +1,478 @@
+"""
+Diagnosis Pipeline
+Classification, query transformation, retrieval, web search, ranking and diagnosis run under a request deadline
+"""
+
+import asyncio
+import logging
+from typing import Dict, Any, List, Optional
+
+from agents.diagnosis_agent import DiagnosisAgent, DIAGNOSIS_ERROR_MESSAGE
+from config.config import (
+    DIAGNOSIS_BUDGET_SHARE,
+    RETRIEVAL_BUDGET_SHARE,
+    RERANK_POOL,
+    CASE_INDEX_ENABLED,
+    CASE_CONTEXT_SIMILARITY,
+    CASE_SHORTCUT_SIMILARITY,
+)
+from utils.case_index import case_index, case_text
+from utils.chat_session import ChatSession
+from utils.concurrency import DependencyBusy
+from utils.deadline import Deadline, run_with_deadline
+from utils.diagnosis_cache import diagnosis_cache, diagnosis_signature
+from utils.faiss_index import RetrievalFilter
+from utils.metrics import metrics
+from utils.rrf_ranking import fuse_rankings
+from utils.symptom_extractor import build_search_query, extract_symptoms
+from utils.symptom_reranker import rerank_candidates, ruled_out_codes
+from workflows.proccess_workflow import process_workflow
+from workflows.query_transformation_workflow import query_transformation_workflow
+from utils.semantic_cache import semantic_cache
+from workflows.retrieval_workflow import embedding_workflow, vector_search_workflow
+from workflows.websearch_workflow import websearch_workflow
+
+logger = logging.getLogger(__name__)
+
+diagnosis_agent = DiagnosisAgent()
+
+
+async def classify_input(user_text: str, deadline: Deadline) -> Dict[str, Any]:
+    """Run the classifier workflow; if it overruns, assume the input is health related"""
+    try:
+        return await deadline.run(
+            process_workflow.ainvoke({"text": user_text}),
+            reserve=RETRIEVAL_BUDGET_SHARE + DIAGNOSIS_BUDGET_SHARE,
+        )
+    except asyncio.TimeoutError:
+        logger.warning("Classification overran its budget, proceeding as health related")
+        deadline.degrade("classification_skipped")
+        return {"status": "completed", "message": "Proceeding to diagnosis (classification skipped)."}
+
+
+async def classify_turn(session: ChatSession, user_text: str, deadline: Deadline) -> Dict[str, Any]:
+    """
+    Classify a chat turn that the session already holds
+
+    Until the conversation is about health its turns are classified together, so answers to follow-up
+    questions complete the complaint. After that every turn is classified on its own, and only an LLM
+    verdict of "Not Relevant" counts as off topic: fast-path and fallback verdicts are not reliable on
+    short answers such as "about three days", so those turns continue the complaint. A warning marked
+    `topic_change` is a confirmed change of topic: the second off-topic turn in a row.
+    """
+    if not session.health_related:
+        return await classify_input(session.context_text(), deadline)
+    classification = await classify_input(user_text, deadline)
+    if classification.get("status") != "warning" or classification.get("source") != "llm":
+        session.off_topic_turns = 0
+        return {"status": "completed", "message": "Continuing the conversation."}
+    session.off_topic_turns += 1
+    return {**classification, "topic_change": session.off_topic_turns >= 2}
+
+
+def set_aside_turn(session: ChatSession, classification: Dict[str, Any], source: str):
+    """
+    Handle an unrelated turn. Before the conversation is about health, and on a confirmed change of
+    topic, the complaint is closed; otherwise only the unrelated turn is dropped and the symptoms and
+    results gathered so far are kept.
+    """
+    if not session.health_related or classification.get("topic_change"):
+        close_complaint(session, source)
+    else:
+        session.turns.pop()
+
+
+def close_complaint(session: ChatSession, source: str):
+    """End the session's complaint at an unrelated turn, saving it first if it was diagnosed"""
+    save_case(session.turns[:-1], session.diagnosis, source)
+    session.reset()
+
+
+async def diagnose(
+    user_text: str,
+    symptoms: List[str],
+    structured_results: List[Dict[str, Any]],
+    deadline: Deadline,
+    past_cases: Optional[list] = None,
+) -> str:
+    """Diagnosis LLM stage with the signature cache and the stale-cache and ranked-results fallbacks"""
+    signature = diagnosis_signature(symptoms, structured_results) if diagnosis_cache else None
+    diagnosis = diagnosis_cache.get(signature) if signature else None
+    if diagnosis is not None:
+        return diagnosis
+    try:
+        diagnosis = await deadline.run(
+            asyncio.to_thread(
+                diagnosis_agent.run, user_symptoms=user_text, chunks=structured_results, past_cases=past_cases
+            )
+        )
+        # Past cases change the prompt, so only reference-only diagnoses are stored under the signature
+        if signature and not past_cases and diagnosis != DIAGNOSIS_ERROR_MESSAGE:
+            diagnosis_cache.put(signature, diagnosis)
+        return diagnosis
+    except (asyncio.TimeoutError, DependencyBusy):
+        # An expired diagnosis for the same symptoms and conditions beats the generic fallback
+        stale = diagnosis_cache.get(signature, allow_stale=True) if signature else None
+        deadline.degrade("diagnosis_stale_cache" if stale else "diagnosis_fallback")
+        return stale or fallback_diagnosis(structured_results)
+
+
+async def find_past_cases(case_task: Optional[asyncio.Future], deadline: Deadline) -> list:
+    """Past cases similar enough to the complaint to join the diagnosis context; optional, so never degrades"""
+    if case_task is None:
+        return []
+    try:
+        complaint_embedding = await deadline.run(case_task, reserve=DIAGNOSIS_BUDGET_SHARE)
+    except (asyncio.TimeoutError, DependencyBusy) as e:
+        logger.info(f"Past case lookup skipped: {e!r}")
+        return []
+    return [match for match in case_index.search(complaint_embedding) if match.similarity >= CASE_CONTEXT_SIMILARITY]
+
+
+async def await_vector_results(vector_task: asyncio.Future, deadline: Deadline) -> List[Dict[str, Any]]:
+    """The vector search results, or none if the search overran its budget or was shed"""
+    try:
+        return await deadline.run(vector_task, reserve=DIAGNOSIS_BUDGET_SHARE)
+    except asyncio.TimeoutError:
+        deadline.degrade("vector_search_skipped")
+    except DependencyBusy:
+        deadline.degrade("vector_search_shed")
+    return []
+
+
+def session_filter(session: ChatSession, user_text: str) -> Optional[RetrievalFilter]:
+    """
+    Record the symptoms a chat turn denies and build the retrieval filter for the session: conditions
+    ruled out by everything the user has denied so far are excluded. None when nothing is ruled out,
+    so unfiltered turns can still use the caches.
+    """
+    extraction = extract_symptoms(user_text)
+    session.deny(extraction.negated)
+    codes = ruled_out_codes(session.denied, session.symptoms + extraction.symptoms)
+    if not codes:
+        return None
+    metrics.counter("chat_ruled_out_filters_total").inc()
+    logger.info(f"Ruling out conditions {sorted(codes)} for denied symptoms {session.denied}")
+    return RetrievalFilter(exclude_codes=codes)
+
+
+async def run_diagnosis_pipeline(
+    user_text: str,
+    deadline: Deadline,
+    retrieval_filter: Optional[RetrievalFilter] = None,
+    session: Optional[ChatSession] = None,
+) -> Dict[str, Any]:
+    """
+    Produce a diagnosis for health-related input
+
+    Args:
+        user_text: The user's description of their symptoms
+        deadline: The request deadline that every stage must respect
+        retrieval_filter: Conditions to exclude or restrict to in the vector search
+        session: Chat session to record the symptoms and ranked results in, for later follow-up turns
+
+    Returns:
+        dict with the diagnosis message, query transformation, web and structured results,
+        and the list of degradations applied to stay within the deadline
+    """
+    try:
+        query_transform_result = await deadline.run(
+            query_transformation_workflow.ainvoke({"text": user_text}),
+            reserve=RETRIEVAL_BUDGET_SHARE + DIAGNOSIS_BUDGET_SHARE,
+        )
+        transformed_query = query_transform_result.get("search_query", "")
+        symptoms = query_transform_result.get("symptoms", [])
+    except asyncio.TimeoutError:
+        deadline.degrade("query_transformation_skipped")
+        transformed_query, symptoms = user_text, []
+    logger.info(f"Transformed query: '{transformed_query}', Symptoms: {symptoms}")
+    if session is not None:
+        settle_speculation(session, symptoms)
+        session.add_symptoms(symptoms)
+
+    # Past cases are indexed by the user's own words, not a search query, so the complaint is embedded
+    # the same way alongside the search query
+    case_task = (
+        asyncio.ensure_future(embedding_workflow.ainvoke({"query": case_text([user_text])}))
+        if CASE_INDEX_ENABLED and len(case_index) else None
+    )
+    try:
+        embedding = await deadline.run(
+            embedding_workflow.ainvoke({"query": transformed_query}), reserve=DIAGNOSIS_BUDGET_SHARE
+        )
+    except asyncio.TimeoutError:
+        deadline.degrade("vector_search_skipped")
+        embedding = []
+    except DependencyBusy:
+        deadline.degrade("vector_search_shed")
+        embedding = []
+    except BaseException:
+        if case_task:
+            case_task.cancel()
+        raise
+
+    # Filtered searches answer a narrower question than whatever is cached, so they bypass the cache
+    use_cache = semantic_cache is not None and retrieval_filter is None and len(embedding) > 0
+    cache_hit = semantic_cache.lookup(embedding) if use_cache else None
+    if cache_hit and not cache_hit.audit:
+        logger.info(f"Semantic cache hit (similarity {cache_hit.similarity:.3f})")
+        if case_task:
+            case_task.cancel()
+        # Only the retrieval is reused: ranking and the diagnosis are redone for this user's own words
+        vector_results, web_results = cache_hit.value["vector_results"], cache_hit.value["web_results"]
+        if session is not None:
+            session.record("vector", vector_results, symptoms)
+            session.record("web", web_results, symptoms)
+        candidates = fuse_rankings({"vector": vector_results, "web": web_results}, top_k=RERANK_POOL)
+        structured_results = rerank_candidates(candidates, symptoms or [user_text], top_k=3)
+        diagnosis = await diagnose(user_text, symptoms or [user_text], structured_results, deadline)
+        return {
+            "message": diagnosis,
+            "query_transformation": {
+                "symptoms": symptoms,
+                "search_query": transformed_query
+            },
+            "web_results": web_results,
+            "structured_results": structured_results,
+            "degradations": list(deadline.degradations),
+            "cache": {"similarity": round(cache_hit.similarity, 4)},
+        }
+
+    vector_task = asyncio.ensure_future(
+        vector_search_workflow.ainvoke({"vector": embedding, "filter": retrieval_filter})
+    )
+    # Completed sessions with a near-identical complaint either answer outright or join the context
+    try:
+        past_cases = await find_past_cases(case_task, deadline)
+    except BaseException:
+        vector_task.cancel()
+        raise
+    if past_cases and past_cases[0].similarity >= CASE_SHORTCUT_SIMILARITY and retrieval_filter is None:
+        best = past_cases[0]
+        logger.info(f"Reusing diagnosis of past case {best.case.session_id} (similarity {best.similarity:.3f})")
+        # The reused answer still comes with references from this complaint's own vector search
+        vector_results = await await_vector_results(vector_task, deadline)
+        if session is not None:
+            session.record("vector", vector_results, symptoms if vector_results else [])
+        candidates = fuse_rankings({"vector": vector_results}, top_k=RERANK_POOL)
+        return {
+            "message": best.case.diagnosis,
+            "query_transformation": {
+                "symptoms": symptoms,
+                "search_query": transformed_query
+            },
+            "web_results": [],
+            "structured_results": rerank_candidates(candidates, symptoms or [user_text], top_k=3),
+            "degradations": list(deadline.degradations),
+            "past_case": {"session_id": best.case.session_id, "similarity": round(best.similarity, 4)},
+        }
+
+    # Vector and web search are independent, so run them side by side
+    web_task = asyncio.ensure_future(websearch_workflow.ainvoke({"query": transformed_query}))
+    try:
+        vector_results = await await_vector_results(vector_task, deadline)
+    except BaseException:
+        web_task.cancel()
+        raise
+
+    try:
+        web_results = await deadline.run(web_task, reserve=DIAGNOSIS_BUDGET_SHARE)
+    except asyncio.TimeoutError:
+        deadline.degrade("web_search_skipped")
+        web_results = []
+    except DependencyBusy:
+        deadline.degrade("web_search_shed")
+        web_results = []
+    logger.info(f"Retrieved {len(vector_results)} vector results and {len(web_results)} web results")
+    if session is not None:
+        vector_missing = {"vector_search_skipped", "vector_search_shed"}.intersection(deadline.degradations)
+        searched = symptoms if not vector_missing else []
+        session.record("vector", vector_results, searched)
+        session.record("web", web_results, searched)
+
+    candidates = fuse_rankings({"vector": vector_results, "web": web_results}, top_k=RERANK_POOL)
+    structured_results = rerank_candidates(candidates, symptoms or [user_text], top_k=3)
+
+    diagnosis = await diagnose(user_text, symptoms or [user_text], structured_results, deadline, past_cases)
+
+    if cache_hit:
+        semantic_cache.record_audit(cache_hit, structured_results)
+    elif use_cache and not deadline.degradations:
+        semantic_cache.store(embedding, {
+            "vector_results": vector_results,
+            "web_results": web_results,
+            "structured_results": structured_results,
+        })
+
+    return {
+        "message": diagnosis,
+        "query_transformation": {
+            "symptoms": symptoms,
+            "search_query": transformed_query
+        },
+        "web_results": web_results,
+        "structured_results": structured_results,
+        "degradations": list(deadline.degradations),
+    }
+
+
+async def search_new_symptoms(
+    session: ChatSession,
+    text: str,
+    deadline: Deadline,
+    retrieval_filter: Optional[RetrievalFilter] = None,
+) -> List[str]:
+    """
+    Extract the symptoms in `text` and search for those the session has not searched yet
+
+    The vector search runs within the deadline and its list is recorded in the session; the web
+    search runs in the background and joins the rankings once finished (see ChatSession.harvest_web).
+
+    Returns:
+        The symptoms found in `text`
+    """
+    session.harvest_web()
+    try:
+        query_transform_result = await deadline.run(
+            query_transformation_workflow.ainvoke({"text": text}),
+            reserve=RETRIEVAL_BUDGET_SHARE + DIAGNOSIS_BUDGET_SHARE,
+        )
+        text_symptoms = query_transform_result.get("symptoms", [])
+    except asyncio.TimeoutError:
+        deadline.degrade("query_transformation_skipped")
+        text_symptoms = []
+    if not session.speculating:
+        settle_speculation(session, text_symptoms)
+    new_symptoms = session.add_symptoms(text_symptoms)
+    logger.info(f"Symptoms: {text_symptoms}, not yet searched: {new_symptoms}")
+
+    if new_symptoms:
+        search_query = build_search_query(new_symptoms)
+        # The deferred search outlives this turn, so it runs under a budget of its own
+        web_deadline = Deadline(deadline.budget, f"{deadline.product}_deferred_web")
+        session.defer_web_search(
+            asyncio.ensure_future(
+                run_with_deadline(websearch_workflow.ainvoke({"query": search_query}), web_deadline)
+            ),
+            new_symptoms,
+        )
+        try:
+            embedding = await deadline.run(
+                embedding_workflow.ainvoke({"query": search_query}), reserve=DIAGNOSIS_BUDGET_SHARE
+            )
+            vector_results = await deadline.run(
+                vector_search_workflow.ainvoke({"vector": embedding, "filter": retrieval_filter}),
+                reserve=DIAGNOSIS_BUDGET_SHARE,
+            )
+            session.record("vector", vector_results, new_symptoms)
+        except asyncio.TimeoutError:
+            deadline.degrade("vector_search_skipped")
+        except DependencyBusy:
+            deadline.degrade("vector_search_shed")
+        session.harvest_web()
+    return text_symptoms
+
+
+async def prefetch_retrieval(session: ChatSession, partial_text: str, deadline: Deadline):
+    """
+    Search speculatively for the symptoms in a partial transcript
+
+    The symptoms and lists this adds stay provisional: when the turn itself is diagnosed, those the
+    final text no longer mentions are dropped, and only symptoms still unsearched are looked up.
+    """
+    session.speculating = True
+    try:
+        await search_new_symptoms(session, partial_text, deadline)
+    finally:
+        session.speculating = False
+    metrics.counter("speculative_retrievals_total").inc()
+
+
+def settle_speculation(session: ChatSession, symptoms: List[str]):
+    """Resolve provisional session state against a real turn's symptoms"""
+    # Without the turn's symptoms (query transformation skipped) there is nothing to check against
+    session.settle_provisional(symptoms or list(session.provisional_symptoms))
+
+
+async def run_followup_pipeline(
+    session: ChatSession,
+    user_text: str,
+    deadline: Deadline,
+    retrieval_filter: Optional[RetrievalFilter] = None,
+) -> Dict[str, Any]:
+    """
+    Diagnose a follow-up turn of a chat session incrementally
+
+    Only symptoms the session has not searched for yet are embedded and searched; their ranked lists
+    are fused with every list the session already holds. The web search for them runs in the
+    background and joins the rankings on this turn if it is done by then, otherwise on the next one.
+    The diagnosis itself always sees the whole conversation.
+
+    Args:
+        session: The connection's chat session, with the new turn already added
+        user_text: The new turn
+        deadline: The request deadline that every stage must respect
+        retrieval_filter: Conditions to exclude from the new vector search and from the lists
+            the session already holds
+
+    Returns:
+        dict shaped like run_diagnosis_pipeline's, plus the symptoms this turn added
+    """
+    searched_before = set(session.searched)
+    await search_new_symptoms(session, user_text, deadline, retrieval_filter)
+    new_symptoms = [s for s in session.symptoms if s not in searched_before]
+    metrics.counter("chat_followup_turns_total", searched=str(bool(new_symptoms)).lower()).inc()
+
+    rankings = session.rankings
+    if retrieval_filter is not None:
+        # Lists fetched before a condition was ruled out may still hold it
+        rankings = {
+            key: [r for r in results if r.get("Code") not in retrieval_filter.exclude_codes]
+            for key, results in rankings.items()
+        }
+    candidates = fuse_rankings(rankings, weights=session.weights(), top_k=RERANK_POOL)
+    structured_results = rerank_candidates(candidates, session.symptoms or [user_text], top_k=3)
+    conversation = session.context_text()
+    diagnosis = await diagnose(conversation, session.symptoms or [conversation], structured_results, deadline)
+
+    return {
+        "message": diagnosis,
+        "query_transformation": {
+            "symptoms": session.symptoms,
+            "search_query": build_search_query(session.symptoms) if session.symptoms else conversation
+        },
+        "web_results": session.web_results(),
+        "structured_results": structured_results,
+        "degradations": list(deadline.degradations),
+        "new_symptoms": new_symptoms,
+    }
+
+
+def fresh_diagnosis(result: Dict[str, Any]) -> Optional[str]:
+    """The diagnosis in a pipeline result if it was made for this complaint rather than reused or a fallback"""
+    if "past_case" in result:
+        return None
+    if {"diagnosis_fallback", "diagnosis_stale_cache"}.intersection(result["degradations"]):
+        return None
+    return result["message"]
+
+
+def save_case(user_messages: List[str], diagnosis: Optional[str], source: str):
+    """Add a consultation that ended in a diagnosis to the past case index (in memory only)"""
+    if CASE_INDEX_ENABLED and diagnosis and user_messages:
+        case_index.submit_case(list(user_messages), diagnosis, source)
+
+
+def fallback_diagnosis(structured_results: List[Dict[str, Any]]) -> str:
+    """Build a plain answer straight from the ranked reference results when the LLM is out of time"""
+    if not structured_results:
+        return ("I couldn't finish analysing your symptoms in time. "
+                "Please try again, and consider speaking with a healthcare professional if they persist.")
+
+    lines = ["Based on your symptoms, these conditions may be worth looking into:"]
+    for i, result in enumerate(structured_results, 1):
+        name = result.get("Name", "Unknown condition")
+        treatments = result.get("Treatments")
+        lines.append(f"{i}. {name}" + (f" - commonly managed with {treatments}" if treatments else ""))
+    lines.append("Please consult a healthcare professional for a proper assessment.")
+    return "\n".join(lines)
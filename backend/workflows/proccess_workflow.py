@@ -11,7 +11,11 @@ process_workflow = (
     .pipe(
         RunnableBranch(
             (lambda input: input["classification"]["decision"] == "Not Relevant",
-             RunnableLambda(lambda _: {"status": "warning", "message": "This is not health-related."})),
+             RunnableLambda(lambda input: {
+                 "status": "warning",
+                 "message": "This is not health-related.",
+                 "source": input["classification"].get("source", "llm")
+             })),
 
             (lambda input: input["classification"]["decision"] == "Needs More Context",
              RunnableLambda(lambda input: {
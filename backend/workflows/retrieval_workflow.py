@@ -2,8 +2,14 @@ from langchain_core.runnables import RunnableLambda
 from utils.local_embedder import get_embedding
 from utils.faiss_index import search_faiss
 
-retrieval_workflow = (
-    RunnableLambda(lambda x: get_embedding(x))
-    | RunnableLambda(lambda vec: search_faiss(vec))
+# Split so callers can reuse the query embedding (e.g. for the semantic cache) before searching
+embedding_workflow = RunnableLambda(lambda input: get_embedding(input["query"]))
+
+vector_search_workflow = RunnableLambda(
+    lambda input: search_faiss(input["vector"], retrieval_filter=input.get("filter"))
 )
 
+retrieval_workflow = (
+    RunnableLambda(lambda input: {**input, "vector": embedding_workflow.invoke(input)})
+    | vector_search_workflow
+)
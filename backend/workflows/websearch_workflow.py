@@ -1,5 +1,7 @@
 from langchain_core.runnables import RunnableLambda
 from agents.web_search_agent import WebSearchAgent, WebSearchParseAgent
+from config.config import SNIPPET_COMPRESSION_ENABLED
+from utils.snippet_compression import compress_snippets
 
 web_search_agent = WebSearchAgent()
 web_parse_agent = WebSearchParseAgent()
@@ -7,6 +9,8 @@ web_parse_agent = WebSearchParseAgent()
 def run_websearch(query: str) -> list[dict]:
 
     web_results = web_search_agent.run(query)
+    if SNIPPET_COMPRESSION_ENABLED:
+        web_results = compress_snippets(web_results, query)
     parsed_results = web_parse_agent.parse(web_results)
     
     return parsed_results